@@ -0,0 +1,337 @@
+# -*- coding:utf8 -*-
+r"""Scaling benchmark of the IR, transformers and code generator
+
+Time the graph passes on synthetic graphs (see `graph_gen.py`) of
+increasing sizes, write the results as json and compare them with a
+stored baseline.
+
+`benchmarks/baseline.json` is a reference baseline of sizes up to 5000
+ops, its `meta` records the machine and python it was run on. Timings are only comparable on the
+same machine: `--save-baseline` writes `benchmarks/baseline.local.json`,
+which is compared with instead of the reference once it exists. Save it
+before a change and compare with it after the change.
+
+Cases
+-----
+- `topologic_order_graph`, `Transformer._prune_graph` and `deepcopy`
+- `transformer/<method name>`: each registered transformer, including
+  the topological sort and pruning done by `Transformer.transform`
+- `isomorphic_match`: a MatMul -> Add pattern in a MatMul -> Add chain
+- `CodeGenerator._generate`: with the `refcnt` pipeline only
+
+Once a case takes longer than `--max-seconds`, larger sizes of the case
+are skipped. Errors, such as `RecursionError` of the recursive passes on
+deep graphs, are recorded in the results instead of aborting the run.
+
+Usage
+-----
+    python benchmarks/bench_scaling.py [--sizes 100,1000,10000,50000]
+        [--cases REGEX] [--output results.json]
+        [--baseline BASELINE.json] [--save-baseline]
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import re
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import traceback
+from copy import deepcopy
+
+from graph_gen import make_graph, make_graph_of_size
+
+from utensor_cgen.backend.code_generator import CodeGenerator
+from utensor_cgen.experimental.ugraph_matcher import uGraphMatcher
+from utensor_cgen.logger import logger
+from utensor_cgen.transformer.base import Transformer
+from utensor_cgen.transformer.pipline import TransformerPipeline
+from utensor_cgen.utils import topologic_order_graph
+
+_BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+# reference baseline, committed
+_REFERENCE_BASELINE = os.path.join(_BENCH_DIR, 'baseline.json')
+# baseline of the local machine, written by --save-baseline
+_LOCAL_BASELINE = os.path.join(_BENCH_DIR, 'baseline.local.json')
+# timings shorter than this are too noisy to be compared
+_MIN_COMPARED_SECONDS = 1e-3
+_MATCHER_OP_MIX = ('MatMul', 'Add')
+# meta of the report which makes timings of different runs comparable
+_MACHINE_META_KEYS = ('python', 'platform', 'machine', 'processor', 'cpu_count')
+
+
+def _case_topologic_order(ugraph):
+  def setup():
+    ugraph.topo_order = []
+    return ugraph
+  return setup, topologic_order_graph
+
+
+def _case_prune_graph(ugraph):
+  return lambda: ugraph, Transformer._prune_graph
+
+
+def _case_deepcopy(ugraph):
+  return lambda: ugraph, deepcopy
+
+
+def _make_transformer_case(trans_cls):
+  def case(ugraph):
+    def setup():
+      return deepcopy(ugraph)
+    def run(new_ugraph):
+      return trans_cls().transform(new_ugraph)
+    return setup, run
+  return case
+
+
+def _case_isomorphic_match(ugraph):
+  # the matcher only knows a few op types, match on a MatMul -> Add
+  # chain of the same size instead
+  subject_ugraph = make_graph_of_size(len(ugraph.ops_info), fan_out=1,
+                                      op_mix=_MATCHER_OP_MIX)
+  matcher_ugraph = make_graph(1, fan_out=1, op_mix=_MATCHER_OP_MIX)
+  meta = {'input': ['End', 'Any']}
+  def run(subject_ugraph):
+    return uGraphMatcher().isomorphic_match(subject_ugraph, matcher_ugraph, meta)
+  return lambda: subject_ugraph, run
+
+
+def _case_generate(ugraph):
+  def setup():
+    out_dir = tempfile.mkdtemp()
+    generator = CodeGenerator('synthetic.pb',
+                              idx_dir=os.path.join(out_dir, 'constants'),
+                              embed_data_dir='/fs/constants',
+                              trans_methods=[('refcnt', {})],
+                              output_nodes=ugraph.output_nodes)
+    return generator, os.path.join(out_dir, 'synthetic.cpp'), deepcopy(ugraph)
+  def run(args):
+    generator, src_fname, new_ugraph = args
+    try:
+      generator._generate(src_fname, new_ugraph)
+    finally:
+      shutil.rmtree(os.path.dirname(src_fname))
+  return setup, run
+
+
+def get_cases():
+  """Return the list of (case name, case factory)
+
+  A case factory takes the graph and returns `(setup, run)`, where
+  `run(setup())` is timed
+  """
+  cases = [
+    ('topologic_order_graph', _case_topologic_order),
+    ('_prune_graph', _case_prune_graph),
+    ('deepcopy', _case_deepcopy),
+  ]
+  for method_name, trans_cls in sorted(TransformerPipeline._TRANSFORMER_MAP.items()):
+    cases.append(('transformer/{}'.format(method_name), _make_transformer_case(trans_cls)))
+  cases.append(('isomorphic_match', _case_isomorphic_match))
+  cases.append(('CodeGenerator._generate', _case_generate))
+  return cases
+
+
+def _time_case(case, ugraph, repeat, max_seconds):
+  """Best time of `repeat` runs, slow cases are run once
+  """
+  setup, run = case(ugraph)
+  best = None
+  for _ in range(repeat):
+    args = setup()
+    start = time.perf_counter()
+    run(args)
+    elapsed = time.perf_counter() - start
+    best = elapsed if best is None else min(best, elapsed)
+    if elapsed > max_seconds / repeat:
+      break
+  return best
+
+
+def run_benchmarks(sizes, case_pattern=None, fan_out=4,
+                   op_mix=('MatMul', 'Add', 'Relu'), weight_size=16,
+                   repeat=3, max_seconds=30.0):
+  """Run the benchmarks
+
+  Return
+  ------
+  results : dict
+      case name -> size -> `{"num_ops": int, "seconds": float}`, or
+      `{"error": str}` or `{"skipped": str}`
+  """
+  cases = [(name, case) for name, case in get_cases()
+           if case_pattern is None or re.search(case_pattern, name)]
+  results = dict((name, {}) for name, _ in cases)
+  stopped = {}
+  for size in sorted(sizes):
+    ugraph = make_graph_of_size(size, fan_out=fan_out, op_mix=op_mix,
+                                weight_size=weight_size)
+    num_ops = len(ugraph.ops_info)
+    topo_order = list(ugraph.topo_order)
+    for name, case in cases:
+      key = str(size)
+      if name in stopped:
+        results[name][key] = {'skipped': stopped[name]}
+        continue
+      try:
+        seconds = _time_case(case, ugraph, repeat, max_seconds)
+      except Exception as error:
+        message = '{}: {}'.format(type(error).__name__, error)
+        results[name][key] = {'error': message.splitlines()[0]}
+        stopped[name] = 'error at size {}'.format(size)
+        print('{:<40}{:>8} ops  {}'.format(name, num_ops, results[name][key]['error']))
+        if not isinstance(error, RecursionError):
+          traceback.print_exc()
+        continue
+      finally:
+        # the passes may leave a partial order on error
+        ugraph.topo_order = list(topo_order)
+      results[name][key] = {'num_ops': num_ops, 'seconds': seconds}
+      if seconds > max_seconds:
+        stopped[name] = 'over {}s at size {}'.format(max_seconds, size)
+      print('{:<40}{:>8} ops  {:>10.4f}s'.format(name, num_ops, seconds))
+  return results
+
+
+def compare(results, baseline, threshold):
+  """Compare the results with the baseline
+
+  Return
+  ------
+  regressions : list
+      (case name, size, seconds, baseline seconds) of the cases
+      slower than `threshold` times the baseline
+  """
+  regressions = []
+  print('')
+  print('{:<40}{:>8}{:>12}{:>12}{:>8}'.format('case', 'size', 'baseline', 'current', 'ratio'))
+  for name in sorted(results):
+    for size, value in sorted(results[name].items(), key=lambda item: int(item[0])):
+      base_value = baseline.get(name, {}).get(size, {})
+      if 'seconds' not in value or 'seconds' not in base_value:
+        continue
+      seconds, base_seconds = value['seconds'], base_value['seconds']
+      ratio = seconds / base_seconds if base_seconds > 0 else float('inf')
+      flag = ''
+      if ratio > threshold and base_seconds >= _MIN_COMPARED_SECONDS:
+        regressions.append((name, size, seconds, base_seconds))
+        flag = '  <- slower'
+      print('{:<40}{:>8}{:>12.4f}{:>12.4f}{:>8.2f}{}'.format(
+        name, size, base_seconds, seconds, ratio, flag
+      ))
+  return regressions
+
+
+def main(args):
+  if not args.verbose:
+    logger.setLevel(logging.WARNING)
+  sizes = [int(size) for size in args.sizes.split(',')]
+  op_mix = tuple(args.op_mix.split(','))
+  cwd = os.getcwd()
+  work_dir = tempfile.mkdtemp()
+  # some transformers write files into the working directory
+  os.chdir(work_dir)
+  try:
+    results = run_benchmarks(sizes,
+                             case_pattern=args.cases,
+                             fan_out=args.fan_out,
+                             op_mix=op_mix,
+                             weight_size=args.weight_size,
+                             repeat=args.repeat,
+                             max_seconds=args.max_seconds)
+  finally:
+    os.chdir(cwd)
+    shutil.rmtree(work_dir)
+  report = {
+    'meta': {
+      'python': platform.python_version(),
+      'platform': platform.platform(),
+      'machine': platform.machine(),
+      'processor': platform.processor(),
+      'cpu_count': os.cpu_count(),
+      'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+      'sizes': sizes,
+      'fan_out': args.fan_out,
+      'op_mix': list(op_mix),
+      'weight_size': args.weight_size,
+      'repeat': args.repeat,
+    },
+    'results': results,
+  }
+  if args.output:
+    with open(args.output, 'w') as fid:
+      json.dump(report, fid, indent=2, sort_keys=True)
+    print('results written to {}'.format(args.output))
+  if args.save_baseline:
+    baseline_path = args.baseline or _LOCAL_BASELINE
+    with open(baseline_path, 'w') as fid:
+      json.dump(report, fid, indent=2, sort_keys=True)
+    print('baseline written to {}'.format(baseline_path))
+    return 0
+  baseline_path = args.baseline
+  if baseline_path is None:
+    baseline_path = _LOCAL_BASELINE
+    if not os.path.exists(baseline_path):
+      baseline_path = _REFERENCE_BASELINE
+  if not os.path.exists(baseline_path):
+    print('no baseline found at {}, run with --save-baseline to create one'.format(baseline_path))
+    return 0
+  with open(baseline_path) as fid:
+    baseline = json.load(fid)
+  print('compare with the baseline {}'.format(baseline_path))
+  mismatched = [
+    key for key in _MACHINE_META_KEYS
+    if baseline['meta'].get(key) != report['meta'][key]
+  ]
+  if mismatched:
+    print('the baseline was recorded with a different {}, the timings are only '
+          'indicative: run with --save-baseline on this machine before the '
+          'change to compare with it'.format(', '.join(mismatched)))
+  regressions = compare(results, baseline['results'], args.threshold)
+  if regressions:
+    print('{} case(s) slower than {}x of the baseline'.format(len(regressions), args.threshold))
+    return 1
+  return 0
+
+
+if __name__ == '__main__':
+  parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+  parser.add_argument('--sizes', default='100,1000,10000,50000',
+                      help='comma separated numbers of ops')
+  parser.add_argument('--cases', default=None,
+                      help='only run the cases with names matching the regular expression')
+  parser.add_argument('--fan-out', type=int, default=4)
+  parser.add_argument('--op-mix', default='MatMul,Add,Relu',
+                      help='comma separated op types of each branch')
+  parser.add_argument('--weight-size', type=int, default=16)
+  parser.add_argument('--repeat', type=int, default=3)
+  parser.add_argument('--max-seconds', type=float, default=30.0,
+                      help='skip larger sizes of a case once it takes longer than this')
+  parser.add_argument('--recursion-limit', type=int, default=20000,
+                      help='recursion limit for the recursive graph passes')
+  parser.add_argument('--verbose', action='store_true',
+                      help='show the logs of the transformers')
+  parser.add_argument('--output', default=None, help='write the results to this json file')
+  parser.add_argument('--baseline', default=None,
+                      help=('baseline to write or compare with (default: '
+                            'benchmarks/baseline.local.json, and the reference '
+                            'benchmarks/baseline.json if it does not exist)'))
+  parser.add_argument('--save-baseline', action='store_true',
+                      help='store the results as the baseline instead of comparing')
+  parser.add_argument('--threshold', type=float, default=1.5,
+                      help='report the cases slower than this ratio of the baseline')
+  args = parser.parse_args()
+  # run in a thread with a large stack, so deep recursion raises
+  # RecursionError instead of crashing the interpreter
+  sys.setrecursionlimit(args.recursion_limit)
+  threading.stack_size(512 * 1024 * 1024)
+  exit_code = []
+  worker = threading.Thread(target=lambda: exit_code.append(main(args)))
+  worker.start()
+  worker.join()
+  sys.exit(exit_code[0] if exit_code else 1)
@@ -0,0 +1,74 @@
+# -*- coding:utf8 -*-
+r"""Cold start benchmark of the snippet templates
+
+Time loading all the templates of the snippets in a fresh process, as a
+conversion does on the first render of each snippet, for the ways
+`template_env` can load them:
+
+- `source`: compile from the template sources
+- `bytecode_cache`: from the bytecode cache, filled by a previous process
+
+Usage
+-----
+    python benchmarks/bench_templates.py [--repeat 10]
+"""
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+_TEMPLATE_ENV_PATH = os.path.join(
+  os.path.dirname(os.path.abspath(__file__)),
+  '..', 'utensor_cgen', 'backend', 'snippets', 'template_env.py'
+)
+
+# run in a fresh process, `template_env` is loaded by path so the
+# package (and tensorflow) is not imported
+_CHILD_CODE = r"""
+import importlib.util, sys, time
+start = time.time()
+spec = importlib.util.spec_from_file_location('template_env', sys.argv[1])
+template_env = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(template_env)
+env = template_env._make_env(cache_dir=sys.argv[2])
+names = template_env.FileSystemLoader(template_env._TEMPLATE_DIR).list_templates()
+for name in names:
+  env.get_template(name)
+print(time.time() - start)
+"""
+
+
+def _run_child(cache_dir):
+  output = subprocess.check_output(
+    [sys.executable, '-c', _CHILD_CODE, _TEMPLATE_ENV_PATH, cache_dir or '']
+  )
+  return float(output.decode('utf8').strip() or 0)
+
+
+def main(args):
+  work_dir = tempfile.mkdtemp(prefix='bench-templates-')
+  try:
+    cache_dir = os.path.join(work_dir, 'cache')
+    # fill the cache
+    _run_child(cache_dir)
+    modes = [
+      ('source', None),
+      ('bytecode_cache', cache_dir),
+    ]
+    print('{:<16} {:>10} {:>10}'.format('mode', 'min (ms)', 'mean (ms)'))
+    for mode, mode_cache_dir in modes:
+      timings = [_run_child(mode_cache_dir) for _ in range(args.repeat)]
+      print('{:<16} {:>10.1f} {:>10.1f}'.format(
+        mode, 1000 * min(timings), 1000 * sum(timings) / len(timings)
+      ))
+  finally:
+    shutil.rmtree(work_dir)
+
+
+if __name__ == '__main__':
+  parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+  parser.add_argument('--repeat', type=int, default=10,
+                      help='number of processes of each mode')
+  main(parser.parse_args())
@@ -0,0 +1,168 @@
+# -*- coding:utf8 -*-
+r"""Synthetic uTensorGraph generator
+
+Build large graphs directly with the IR classes, without tensorflow,
+for benchmarking the IR, transformers and code generator.
+
+The graph is a stack of `depth` layers on top of a placeholder. Each
+layer has `fan_out` parallel branches consuming the output of the
+previous layer, each branch being the ops in `op_mix` applied in order,
+and the branches are merged back with a chain of `Add` ops::
+
+                  +-> MatMul -> Add -> Relu -+
+  previous layer -+-> MatMul -> Add -> Relu -+-> Add -> Add -> next layer
+                  +-> MatMul -> Add -> Relu -+
+
+All activations are `[1, weight_size]` float tensors, `MatMul` weights
+are `[weight_size, weight_size]` and `Add`/`BiasAdd` biases are
+`[weight_size]` consts.
+"""
+import numpy as np
+
+from utensor_cgen.ir import OperationInfo, TensorInfo, uTensorGraph
+from utensor_cgen.ir.converter import (AttrValueConverter,
+                                       TensorProtoConverter,
+                                       TensorShapeConverter)
+
+__all__ = ['make_graph', 'make_graph_of_size', 'ops_per_layer', 'SUPPORTED_OP_TYPES']
+
+# op types with a const weight as the second input
+_WEIGHTED_OP_TYPES = ('MatMul', 'Add', 'BiasAdd')
+_UNARY_OP_TYPES = ('Relu', 'Relu6', 'Tanh', 'Sigmoid', 'Identity')
+SUPPORTED_OP_TYPES = _WEIGHTED_OP_TYPES + _UNARY_OP_TYPES
+
+_FLOAT = np.dtype('float32')
+
+
+def ops_per_layer(fan_out, op_mix):
+  """Number of ops in one layer, consts included
+  """
+  num_weights = sum(1 for op_type in op_mix if op_type in _WEIGHTED_OP_TYPES)
+  return fan_out * (len(op_mix) + num_weights) + fan_out - 1
+
+
+def _type_attr(dtype):
+  return AttrValueConverter.GenericType(value_name='type', value=dtype)
+
+
+class _GraphBuilder(object):
+
+  def __init__(self, ugraph, weight_size, rng):
+    self.ugraph = ugraph
+    self.weight_size = weight_size
+    self.rng = rng
+
+  def add_op(self, name, op_type, in_tensors, op_attr, shape):
+    out_tensor = TensorInfo.make_unchecked(name=u'{}:0'.format(name),
+                                           op_name=name,
+                                           dtype=_FLOAT,
+                                           shape=shape,
+                                           ugraph=self.ugraph)
+    OperationInfo.make_unchecked(name=name,
+                                 input_tensors=in_tensors,
+                                 output_tensors=[out_tensor],
+                                 op_type=op_type,
+                                 backend='tensorflow',
+                                 op_attr=op_attr,
+                                 ugraph=self.ugraph)
+    self.ugraph.topo_order.append(name)
+    return out_tensor
+
+  def placeholder(self, name):
+    shape = [1, self.weight_size]
+    return self.add_op(name, 'Placeholder', [], {
+      'dtype': _type_attr(_FLOAT),
+      'shape': AttrValueConverter.GenericType(
+        value_name='shape',
+        value=TensorShapeConverter.__utensor_generic_type__(list_view=shape)
+      ),
+    }, shape)
+
+  def const(self, name, shape):
+    value = self.rng.uniform(-1, 1, size=shape).astype(_FLOAT)
+    return self.add_op(name, 'Const', [], {
+      'dtype': _type_attr(_FLOAT),
+      'value': AttrValueConverter.GenericType(
+        value_name='tensor',
+        value=TensorProtoConverter.__utensor_generic_type__(np_array=value)
+      ),
+    }, list(shape))
+
+  def op(self, name, op_type, in_tensors):
+    op_attr = {'T': _type_attr(_FLOAT)}
+    if op_type == 'MatMul':
+      op_attr['transpose_a'] = AttrValueConverter.GenericType(value_name='b', value=False)
+      op_attr['transpose_b'] = AttrValueConverter.GenericType(value_name='b', value=False)
+    return self.add_op(name, op_type, in_tensors, op_attr, [1, self.weight_size])
+
+  def branch_op(self, prefix, op_type, in_tensor, name=None):
+    weight_prefix = u'{}/{}'.format(prefix, op_type)
+    name = name or weight_prefix
+    if op_type == 'MatMul':
+      weight = self.const(weight_prefix + u'/weight', [self.weight_size, self.weight_size])
+      return self.op(name, op_type, [in_tensor, weight])
+    if op_type in ('Add', 'BiasAdd'):
+      bias = self.const(weight_prefix + u'/bias', [self.weight_size])
+      return self.op(name, op_type, [in_tensor, bias])
+    return self.op(name, op_type, [in_tensor])
+
+
+def make_graph(depth, fan_out=4, op_mix=('MatMul', 'Add', 'Relu'),
+               weight_size=16, seed=0):
+  """Build a synthetic graph, see module docstring for the layout
+
+  Parameters
+  ----------
+  depth : int
+      number of layers
+  fan_out : int
+      number of parallel branches in each layer
+  op_mix : sequence of str
+      op types of each branch, see `SUPPORTED_OP_TYPES`
+  weight_size : int
+      size of the activations and weights
+  seed : int
+      seed of the weight values
+
+  Return
+  ------
+  ugraph : uTensorGraph
+      with the placeholder named `input`, the last op named `output`
+      and the ops in topological order
+  """
+  if depth < 1 or fan_out < 1:
+    raise ValueError('depth and fan_out must be positive: {}, {}'.format(depth, fan_out))
+  for op_type in op_mix:
+    if op_type not in SUPPORTED_OP_TYPES:
+      raise ValueError('unsupported op type: {}'.format(op_type))
+  ugraph = uTensorGraph(output_nodes=[u'output'], backend='tensorflow')
+  builder = _GraphBuilder(ugraph, weight_size, np.random.RandomState(seed))
+  trunk = builder.placeholder(u'input')
+  for layer in range(depth):
+    is_last = layer == depth - 1
+    branches = []
+    for branch in range(fan_out):
+      t_info = trunk
+      prefix = u'layer_{}/branch_{}'.format(layer, branch)
+      for i, op_type in enumerate(op_mix):
+        name = None
+        if is_last and fan_out == 1 and i == len(op_mix) - 1:
+          name = u'output'
+        t_info = builder.branch_op(prefix, op_type, t_info, name=name)
+      branches.append(t_info)
+    trunk = branches[0]
+    for branch, t_info in enumerate(branches[1:], 1):
+      name = u'layer_{}/merge_{}'.format(layer, branch)
+      if is_last and branch == fan_out - 1:
+        name = u'output'
+      trunk = builder.op(name, 'Add', [trunk, t_info])
+  return ugraph
+
+
+def make_graph_of_size(num_ops, fan_out=4, op_mix=('MatMul', 'Add', 'Relu'),
+                       weight_size=16, seed=0):
+  """Build a graph with about `num_ops` ops by choosing the depth
+  """
+  depth = max(1, int(round((num_ops - 1) / float(ops_per_layer(fan_out, op_mix)))))
+  return make_graph(depth, fan_out=fan_out, op_mix=op_mix,
+                    weight_size=weight_size, seed=seed)
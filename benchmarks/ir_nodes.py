@@ -0,0 +1,117 @@
+# -*- coding:utf8 -*-
+r"""Benchmark of the IR node classes
+
+Report per-node memory and construction time of `TensorInfo` and
+`OperationInfo`, comparing the slotted classes with a dict-based layout
+and the validated constructors with the trusted `make_unchecked` path
+
+Usage
+-----
+    python benchmarks/ir_nodes.py [--num-nodes 20000] [--repeat 5]
+"""
+import argparse
+import timeit
+import tracemalloc
+from copy import deepcopy
+
+import attr
+import numpy as np
+
+from utensor_cgen.ir import OperationInfo, TensorInfo, uTensorGraph
+
+# same fields as TensorInfo/OperationInfo, stored in instance __dict__
+_DictTensorInfo = attr.make_class(
+  '_DictTensorInfo', ['name', 'op_name', 'dtype', 'shape', 'ugraph']
+)
+_DictOperationInfo = attr.make_class(
+  '_DictOperationInfo',
+  ['name', 'ugraph', 'input_tensors', 'output_tensors', 'op_type', 'backend', 'op_attr']
+)
+
+
+def _tensor_kwargs(ugraph, i):
+  return dict(name=u'op_{}:0'.format(i),
+              op_name=u'op_{}'.format(i),
+              dtype=np.dtype('float32'),
+              shape=[1, 28, 28, 32],
+              ugraph=ugraph)
+
+
+def _op_kwargs(ugraph, i, out_tensor):
+  return dict(name=u'op_{}'.format(i),
+              input_tensors=[],
+              output_tensors=[out_tensor],
+              op_type='Relu',
+              backend='tensorflow',
+              op_attr={},
+              ugraph=ugraph)
+
+
+def _bytes_per_node(factory, num_nodes):
+  """Average bytes allocated by `factory(i)`, the argument values excluded
+  """
+  ugraph = uTensorGraph(output_nodes=['op_0'])
+  args = [_tensor_kwargs(ugraph, i) for i in range(num_nodes)]
+  tracemalloc.start()
+  before = tracemalloc.get_traced_memory()[0]
+  nodes = [factory(**kwargs) for kwargs in args]
+  after = tracemalloc.get_traced_memory()[0]
+  tracemalloc.stop()
+  # exclude the list holding the nodes
+  return (after - before - 8 * len(nodes)) / float(num_nodes)
+
+
+def _time_per_node(factory, num_nodes, repeat):
+  ugraph = uTensorGraph(output_nodes=['op_0'])
+  args = [_tensor_kwargs(ugraph, i) for i in range(num_nodes)]
+  best = min(timeit.repeat(lambda: [factory(**kwargs) for kwargs in args],
+                           number=1, repeat=repeat))
+  return best / num_nodes * 1e6
+
+
+def _time_op_per_node(make_tensor, make_op, num_nodes, repeat):
+  def build():
+    ugraph = uTensorGraph(output_nodes=['op_0'])
+    for i in range(num_nodes):
+      out_tensor = make_tensor(**_tensor_kwargs(ugraph, i))
+      make_op(**_op_kwargs(ugraph, i, out_tensor))
+    return ugraph
+  best = min(timeit.repeat(build, number=1, repeat=repeat))
+  return best / num_nodes * 1e6, build()
+
+
+def main(num_nodes, repeat):
+  print('nodes: {}, best of {} runs'.format(num_nodes, repeat))
+  print('')
+  print('{:<36}{:>12}'.format('TensorInfo memory', 'bytes/node'))
+  for label, factory in [
+    ('dict-based', _DictTensorInfo),
+    ('slotted', TensorInfo.make_unchecked),
+  ]:
+    print('  {:<34}{:>12.1f}'.format(label, _bytes_per_node(factory, num_nodes)))
+  print('')
+  print('{:<36}{:>12}'.format('TensorInfo construction', 'us/node'))
+  for label, factory in [
+    ('validated', TensorInfo),
+    ('make_unchecked', TensorInfo.make_unchecked),
+  ]:
+    print('  {:<34}{:>12.2f}'.format(label, _time_per_node(factory, num_nodes, repeat)))
+  print('')
+  print('{:<36}{:>12}'.format('TensorInfo + OperationInfo', 'us/node'))
+  t_validated, _ = _time_op_per_node(TensorInfo, OperationInfo, num_nodes, repeat)
+  t_unchecked, ugraph = _time_op_per_node(TensorInfo.make_unchecked,
+                                          OperationInfo.make_unchecked,
+                                          num_nodes, repeat)
+  print('  {:<34}{:>12.2f}'.format('validated', t_validated))
+  print('  {:<34}{:>12.2f}'.format('make_unchecked', t_unchecked))
+  ugraph.topo_order = sorted(ugraph.ops_info)
+  t_copy = min(timeit.repeat(lambda: deepcopy(ugraph), number=1, repeat=repeat))
+  print('  {:<34}{:>12.2f}'.format('deepcopy of uTensorGraph', t_copy / num_nodes * 1e6))
+
+
+if __name__ == '__main__':
+  parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+  parser.add_argument('--num-nodes', type=int, default=20000)
+  parser.add_argument('--repeat', type=int, default=5)
+  args = parser.parse_args()
+  main(args.num_nodes, args.repeat)
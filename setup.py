@@ -22,10 +22,11 @@ setup(
     license=license,
     packages=find_packages(),
     include_package_data=True,
-    package_data={"utensor_cgen": ["backend/snippets/templates/*"]},
+    package_data={"utensor_cgen": ["backend/snippets/templates/*/*"]},
     entry_points={
         "console_scripts": [
-            "utensor-cli=utensor_cgen.cli:cli"
+            "utensor-cli=utensor_cgen.cli:cli",
+            "utensor-client=utensor_cgen.client:main"
         ]},
     install_requires=[
         'Jinja2',
@@ -36,6 +37,7 @@ setup(
         'torch',
         'torchvision',
         'onnx-tf',
+        'PyYAML',
     ],
     extras_require={
         'dev': ['pytest', 'graphviz']
@@ -0,0 +1,19 @@
+from io import StringIO
+
+from utensor_cgen.backend.snippets import (CommentSnippet,
+                                           ContextSnippetsContainer)
+from utensor_cgen.backend.snippets.composer import Composer
+
+
+def test_write_to():
+    container = ContextSnippetsContainer('graph', 'graph.hpp', 'graph_weight.hpp',
+                                         placeholders=['x:0'], ref_counts=[1])
+    for i in range(10):
+        container.add_snippet(CommentSnippet(['op {}'.format(i)]))
+    composer = Composer([container])
+    fp = StringIO()
+    composer.write_to(fp)
+    text = fp.getvalue()
+    assert text == composer.compose()
+    assert text.startswith('#include "graph')
+    assert '// op 9' in text
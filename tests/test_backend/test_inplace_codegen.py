@@ -0,0 +1,36 @@
+import os
+
+import tensorflow as tf
+
+from utensor_cgen.backend import CodeGenerator
+from utensor_cgen.frontend.tensorflow import GraphDefParser
+
+
+def test_inplace_codegen(tmpdir):
+    graph = tf.Graph()
+    with graph.as_default():
+        x = tf.placeholder(dtype=tf.float32, shape=[1, 4], name='x')
+        a = tf.add(x, x, name='a')
+        r1 = tf.nn.relu(a, name='r1')
+        r2 = tf.nn.relu(r1, name='r2')
+        out = tf.add(r2, r2, name='out')
+    ugraph = GraphDefParser.parse(graph.as_graph_def(), output_nodes=[out.op.name])
+    generator = CodeGenerator('inplace.pb',
+                              str(tmpdir.join('idx')),
+                              'constants',
+                              [('refcnt', {}), ('inplace', {})],
+                              [out.op.name])
+    src_fname = str(tmpdir.join('inplace.cpp'))
+    generator._generate(src_fname, ugraph)
+    with open(src_fname) as fid:
+        src = fid.read()
+
+    # r1 and r2 write into a, which lives until out reads r2 twice
+    assert 'ctx.add(new RamTensor<float>(), "a:0", 4);' in src
+    assert '"r1:0", ' not in src
+    assert '"r2:0", ' not in src
+    push_stmts = [' '.join(stmt.split()) for stmt in src.split('ctx.push(')[1:]]
+    assert push_stmts[1].startswith('new ReluOp<float, float>(), { "a:0" }, { "a:0" });')
+    assert push_stmts[2].startswith('new ReluOp<float, float>(), { "a:0" }, { "a:0" });')
+    assert push_stmts[3].startswith('new AddOp<float, float>(), { "a:0", "a:0" }, { "out:0" });')
+    assert os.path.exists(str(tmpdir.join('inplace.hpp')))
@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+
+from utensor_cgen.backend.placement import DEFAULT_SECTION, WeightPlacement
+from utensor_cgen.backend.snippets import WeightIncbinContainer, WeightSnippet
+
+
+def _weight(name, length, ref_count=1):
+    return WeightSnippet(name, np.dtype(np.float32), [length],
+                         np.zeros(length), ref_count=ref_count)
+
+
+def test_weight_placement():
+    snippets = [_weight('inline_conv_w', 1000),
+                _weight('inline_conv_b', 10),
+                _weight('inline_fc_w', 500, ref_count=3),
+                _weight('inline_fc_b', 2000)]
+    placement = WeightPlacement(alignment=16,
+                                sections=['.qspi', 'fc_b=.sram'],
+                                hot_section='.dtcm',
+                                hot_max_bytes=64,
+                                hot_min_refs=2)
+    report = placement.apply(snippets)
+    assert [snippet.template_vars['section'] for snippet in snippets] == \
+        ['.qspi', '.dtcm', '.dtcm', '.sram']
+    assert report == {'.qspi': (1, 4000), '.dtcm': (2, 2040), '.sram': (1, 8000)}
+
+    text = snippets[0].render()
+    assert '[ 1000 ] __attribute__((aligned(16), section(".qspi"))) = {' in text
+    text = WeightIncbinContainer('weights', snippets).render()
+    assert '.section .dtcm, "a", %progbits' in text
+    assert '.balign 16' in text
+
+    report = WeightPlacement().apply(snippets)
+    assert report == {DEFAULT_SECTION: (4, 14040)}
+    assert '__attribute__' not in snippets[0].render()
+
+    placement = WeightPlacement.from_dict({'align': 8, 'sections': {'conv': '.itcm'}})
+    assert placement.section_of('inline_conv_w', 4000) == '.itcm'
+    assert placement.section_of('inline_fc_w', 4000) is None
+
+
+def test_weight_placement_error():
+    with pytest.raises(ValueError):
+        WeightPlacement(alignment=12)
+    with pytest.raises(ValueError):
+        WeightPlacement(hot_section='.dtcm')
+    with pytest.raises(ValueError):
+        WeightPlacement(sections=['(=.bad'])
@@ -0,0 +1,46 @@
+import os
+
+import numpy as np
+import tensorflow as tf
+
+from utensor_cgen.backend import CodeGenerator
+from utensor_cgen.frontend.tensorflow import GraphDefParser
+
+
+def _generate(tmpdir, weight_format):
+    graph = tf.Graph()
+    with graph.as_default():
+        x = tf.placeholder(dtype=tf.float32, shape=[1, 4], name='x')
+        w = tf.constant(np.ones((4, 4)), dtype=tf.float32, name='w')
+        tf.matmul(x, w, name='y')
+    ugraph = GraphDefParser.parse(graph.as_graph_def(), output_nodes=['y'])
+    generator = CodeGenerator('model.pb',
+                              str(tmpdir.join('idx')),
+                              'constants',
+                              [('inline', {}), ('refcnt', {})],
+                              ['y'],
+                              weight_format=weight_format)
+    generator._generate(str(tmpdir.join('model.cpp')), ugraph)
+
+
+def test_stale_weight_files(tmpdir):
+    bin_dir = tmpdir.join('model_weights')
+    bin_dir.mkdir()
+    # a tensor of a previous generation, and a file not generated by us
+    bin_dir.join('inline_old.bin').write_binary(b'\0')
+    bin_dir.join('notes.txt').write('keep')
+    _generate(tmpdir, 'incbin')
+    bin_names = sorted(os.listdir(str(bin_dir)))
+    assert 'inline_old.bin' not in bin_names
+    assert 'notes.txt' in bin_names
+    assert any(name.endswith('.bin') for name in bin_names)
+    assert tmpdir.join('model_weight.S').check()
+
+    _generate(tmpdir, 'c')
+    assert os.listdir(str(bin_dir)) == ['notes.txt']
+    assert not tmpdir.join('model_weight.S').check()
+
+    bin_dir.join('notes.txt').remove()
+    _generate(tmpdir, 'incbin')
+    _generate(tmpdir, 'c')
+    assert not bin_dir.check()
@@ -0,0 +1,15 @@
+from utensor_cgen.backend.snippets import template_env
+
+
+def test_bytecode_cache(tmpdir):
+    cache_dir = tmpdir.join('cache')
+    env = template_env._make_env(cache_dir=str(cache_dir))
+    env.get_template('snippets/comments.cpp')
+    assert cache_dir.listdir()
+    # templates from the cache render as from the sources
+    cached_env = template_env._make_env(cache_dir=str(cache_dir))
+    source_env = template_env._make_env(cache_dir='')
+    context = {'comments': ['a', 'b']}
+    name = 'snippets/comments.cpp'
+    assert cached_env.get_template(name).render(**context) == \
+        source_env.get_template(name).render(**context)
@@ -0,0 +1,25 @@
+from io import BytesIO
+
+import numpy as np
+
+from utensor_cgen.backend.snippets import WeightIncbinContainer, WeightSnippet
+
+
+def test_weight_incbin():
+    value = np.array([1.5, -2.0, 3.25], dtype=np.float32)
+    snippet = WeightSnippet('inline_w', np.dtype(np.float32), [3], value)
+    fid = BytesIO()
+    snippet.write_binary(fid)
+    assert fid.getvalue() == value.astype('<f4').tobytes()
+
+    # int64 tensors are int arrays
+    snippet64 = WeightSnippet('inline_shape', np.dtype(np.int64), [2],
+                              np.array([-1, 10], dtype=np.int64))
+    fid = BytesIO()
+    snippet64.write_binary(fid)
+    assert np.frombuffer(fid.getvalue(), dtype='<i4').tolist() == [-1, 10]
+
+    text = WeightIncbinContainer('mlp_weights', [snippet, snippet64]).render()
+    assert '.global inline_w\n' in text
+    assert '.incbin "mlp_weights/inline_w.bin"' in text
+    assert '.incbin "mlp_weights/inline_shape.bin"' in text
@@ -0,0 +1,34 @@
+import numpy as np
+
+from utensor_cgen.backend.snippets import (ContextGlobalArrayContainer,
+                                           WeightDeclarationContainer,
+                                           WeightShardContainer, WeightSnippet)
+
+
+def test_weight_shards():
+    lengths = [5, 100, 1, 60, 50, 3]
+    container = ContextGlobalArrayContainer()
+    for i, length in enumerate(lengths):
+        container.add_snippet(WeightSnippet('inline_w{}'.format(i),
+                                            np.dtype(np.float32),
+                                            [length],
+                                            np.zeros(length)))
+    shards = container.shard(3)
+    assert len(shards) == 3
+    names = [[snippet.template_vars['inline_name'] for snippet in shard]
+             for shard in shards]
+    # every weight in exactly one shard, in the original order
+    assert sorted(sum(names, [])) == sorted('inline_w{}'.format(i) for i in range(6))
+    for shard_names in names:
+        assert shard_names == sorted(shard_names)
+    assert names[0] == ['inline_w1']
+    assert sorted(sum(snippet.template_vars['length'] for snippet in shard)
+                  for shard in shards) == [59, 60, 100]
+
+    decls = WeightDeclarationContainer('models_mlp', container.snippets).render()
+    assert '#ifndef _MODELS_MLP_WEIGHT_H' in decls
+    assert 'extern const float inline_w1 [ 100 ];' in decls
+    shard = WeightShardContainer('mlp_weight.hpp', shards[0]).render()
+    assert shard.startswith('#include "mlp_weight.hpp"')
+    assert 'const float inline_w1 [ 100 ] = {' in shard
+    assert 'inline_w0' not in shard
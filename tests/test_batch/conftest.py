@@ -0,0 +1,18 @@
+import numpy as np
+import pytest
+import tensorflow as tf
+
+
+@pytest.fixture(scope='session', name='pb_file')
+def pb_file(tmpdir_factory):
+    graph = tf.Graph()
+    with graph.as_default():
+        x = tf.placeholder(dtype=tf.float32, shape=[1, 4], name='x')
+        weight = tf.constant(np.random.randn(4, 3),
+                             dtype=tf.float32,
+                             name='weight')
+        logits = tf.matmul(x, weight, name='logits')
+        tf.nn.relu(logits, name='y')
+    path = tmpdir_factory.mktemp('batch').join('mlp.pb')
+    path.write_binary(graph.as_graph_def().SerializeToString())
+    return str(path)
@@ -0,0 +1,91 @@
+import os
+
+import pytest
+
+from utensor_cgen.batch import (ConvertJob, format_summary, load_manifest,
+                                run_jobs)
+
+
+def _write_manifest(tmpdir, content):
+    path = tmpdir.join('manifest.yaml')
+    path.write(content)
+    return str(path)
+
+
+def test_load_manifest(pb_file, tmpdir):
+    tmpdir.join('sub').mkdir()
+    path = _write_manifest(tmpdir, '\n'.join([
+        'defaults:',
+        '  output_nodes: y',
+        '  transform_methods: dropout|>refcnt',
+        'models:',
+        '  - model: {}'.format(pb_file),
+        '  - model: sub/other.pb',
+        '    output_nodes: [a, b]',
+        '    transform-methods: ["schedule(max_states=100)", refcnt]',
+        '    input_shapes: {x: [1, 4]}',
+        '    output: other_model.cpp',
+    ]))
+    jobs = load_manifest(path)
+    assert len(jobs) == 2
+    assert jobs[0].model_file == pb_file
+    assert jobs[0].output_nodes == ['y']
+    assert jobs[0].transform_methods == [('dropout', {}), ('refcnt', {})]
+    assert jobs[0].model_path == os.path.join('models', 'mlp.cpp')
+    assert jobs[1].model_file == str(tmpdir.join('sub', 'other.pb'))
+    assert jobs[1].output_nodes == ['a', 'b']
+    assert jobs[1].transform_methods == [('schedule', {'max_states': 100}),
+                                         ('refcnt', {})]
+    assert jobs[1].input_shapes == {'x': [1, 4]}
+    assert jobs[1].name == 'other_model'
+    assert jobs[1].data_dir == os.path.join('constants', 'other')
+
+
+def test_load_manifest_error(pb_file, tmpdir):
+    path = _write_manifest(tmpdir, 'models:\n  - model: a.pb\n    output-nodes: y\n    bad_key: 1\n')
+    with pytest.raises(ValueError):
+        load_manifest(path)
+    path = _write_manifest(tmpdir, 'models:\n  - model: a.pb\n')
+    with pytest.raises(ValueError):
+        load_manifest(path)
+    path = _write_manifest(tmpdir, '\n'.join([
+        'defaults: {output_nodes: y}',
+        'models:',
+        '  - model: a/mlp.pb',
+        '  - model: b/mlp.pb',
+    ]))
+    with pytest.raises(ValueError):
+        load_manifest(path)
+    # invalid option values
+    for option in ['input_shapes: x=a', "output_nodes: ''", 'output_nodes: -y',
+                   'weight_placement: {bad_key: 1}']:
+        key = option.split(':')[0]
+        path = _write_manifest(tmpdir, '\n'.join([
+            'defaults: {output_nodes: y}',
+            'models:',
+            '  - model: a.pb',
+            '    {}'.format(option),
+        ]))
+        with pytest.raises(ValueError, match=key):
+            load_manifest(path)
+
+
+def test_run_jobs(pb_file, tmpdir, monkeypatch):
+    monkeypatch.chdir(str(tmpdir))
+    broken_file = tmpdir.join('broken.pb')
+    broken_file.write_binary(b'not a graph')
+    jobs = [
+        ConvertJob(str(broken_file), ['y'], transform_methods=[('refcnt', {})]),
+        ConvertJob(pb_file, ['y'], transform_methods=[('refcnt', {})]),
+    ]
+    done = []
+    results = run_jobs(jobs, num_workers=2, log_dir='logs', callback=done.append)
+    assert [result.name for result in results] == ['broken', 'mlp']
+    assert not results[0].ok
+    assert 'Traceback' in results[0].error
+    assert results[1].ok
+    assert sorted(result.name for result in done) == ['broken', 'mlp']
+    assert tmpdir.join('models', 'mlp.cpp').check()
+    assert tmpdir.join('logs', 'mlp.log').check()
+    summary = format_summary(results, 1.0, 2)
+    assert '2 model(s), 1 ok, 1 failed' in summary
@@ -0,0 +1,17 @@
+import numpy as np
+import pytest
+import tensorflow as tf
+
+
+@pytest.fixture(scope='session', name='pb_file')
+def pb_file(tmpdir_factory):
+    graph = tf.Graph()
+    with graph.as_default():
+        x = tf.placeholder(dtype=tf.float32, shape=[1, 4], name='x')
+        w = tf.constant(np.random.randn(4, 4), dtype=tf.float32, name='w')
+        h1 = tf.nn.relu(tf.matmul(x, w, name='fc1'), name='relu1')
+        h2 = tf.nn.relu(tf.matmul(h1, w, name='fc2'), name='relu2')
+        tf.identity(h2, name='y')
+    path = tmpdir_factory.mktemp('cli').join('model.pb')
+    path.write_binary(graph.as_graph_def().SerializeToString())
+    return str(path)
@@ -0,0 +1,58 @@
+import json
+import subprocess
+import sys
+import textwrap
+
+from click.testing import CliRunner
+
+from utensor_cgen.cli import cli
+
+
+def _show(*args):
+    return CliRunner().invoke(cli, ['show'] + list(args))
+
+
+def test_show_filters(pb_file):
+    result = _show('--format', 'json', '--op-type', 'MatMul,Relu', pb_file)
+    assert result.exit_code == 0, result.output
+    records = [json.loads(line) for line in result.output.splitlines()]
+    assert [record['name'] for record in records] == ['fc1', 'relu1', 'fc2', 'relu2']
+
+    result = _show('--format', 'json', '--name-regex', '^relu', '--limit', '1', pb_file)
+    records = [json.loads(line) for line in result.output.splitlines()]
+    assert [record['name'] for record in records] == ['relu1']
+    assert records[0]['outputs'][0]['shape'] == [1, 4]
+
+
+def test_show_formats(pb_file):
+    result = _show('--format', 'csv', '--stream', '--op-type', 'Relu', pb_file)
+    assert result.exit_code == 0, result.output
+    assert result.output.splitlines() == [
+        'name,op_type,inputs,outputs',
+        'relu1,Relu,fc1,',
+        'relu2,Relu,fc2,',
+    ]
+    result = _show('--oneline', '--name-regex', '^y$', pb_file)
+    assert result.output.startswith('y op_type: Identity')
+
+
+def test_show_unknown_extension(tmpdir):
+    model_file = tmpdir.join('model.onnx')
+    model_file.write('')
+    result = _show(str(model_file))
+    assert result.exit_code == 1
+    assert 'unknown file extension: .onnx' in result.output
+
+
+def test_show_stream_without_tensorflow(pb_file):
+    # tensorflow is already imported by this test session
+    script = textwrap.dedent("""
+        import sys
+        from click.testing import CliRunner
+        from utensor_cgen.cli import cli
+        result = CliRunner().invoke(cli, ['show', '--stream', '--oneline', sys.argv[1]])
+        assert result.exit_code == 0, result.output
+        assert 'fc1 op_type: MatMul' in result.output, result.output
+        assert 'tensorflow' not in sys.modules
+    """)
+    subprocess.check_call([sys.executable, '-c', script, pb_file])
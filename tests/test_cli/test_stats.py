@@ -0,0 +1,16 @@
+import json
+
+from click.testing import CliRunner
+
+from utensor_cgen.cli import cli
+
+
+def test_stats_default_output_nodes(pb_file):
+    result = CliRunner().invoke(cli, ['stats', '--format', 'json', pb_file])
+    assert result.exit_code == 0, result.output
+    # the output may start with warnings of the frontends on stderr
+    stats = json.loads(result.output.splitlines()[-1])
+    # x -> fc1 -> relu1 -> fc2 -> relu2 -> y, 16 bytes each
+    assert stats['activation_bytes'] == 6 * 16
+    # only the input and output of an op are alive at the same time
+    assert stats['peak_activation_bytes'] == 2 * 16
@@ -0,0 +1,21 @@
+import tensorflow as tf
+
+from utensor_cgen.frontend._node_defs import iter_node_defs
+from utensor_cgen.frontend.tensorflow import GraphDefParser
+
+
+def test_iter_node_defs(tmpdir):
+    graph = tf.Graph()
+    with graph.as_default():
+        x = tf.placeholder(dtype=tf.float32, shape=[None, 3], name='x')
+        y = tf.constant([1, 2, 3], dtype=tf.float32, name='y')
+        tf.add(x, y, name='z')
+    graph_def = graph.as_graph_def()
+    pb_file = str(tmpdir.join('graph.pb'))
+    with open(pb_file, 'wb') as fid:
+        fid.write(graph_def.SerializeToString())
+    node_defs = list(GraphDefParser.iter_node_defs(pb_file))
+    assert node_defs == list(graph_def.node)
+    # without tensorflow, the attrs are not decoded
+    assert [(node.name, node.op, list(node.input)) for node in iter_node_defs(pb_file)] == \
+        [(node.name, node.op, list(node.input)) for node in graph_def.node]
@@ -0,0 +1,21 @@
+import numpy as np
+import pytest
+import tensorflow as tf
+
+from utensor_cgen.frontend.tensorflow import GraphDefParser
+
+
+@pytest.fixture(scope='session', name='ugraph')
+def simple_ugraph():
+    graph = tf.Graph()
+    with graph.as_default():
+        x = tf.placeholder(dtype=tf.float32, shape=[None, 3], name='x')
+        weight = tf.constant(np.random.randn(3, 5),
+                             dtype=tf.float32,
+                             name='weight')
+        bias = tf.constant(np.random.randn(5),
+                           dtype=tf.float32,
+                           name='bias')
+        z = tf.add(tf.matmul(x, weight), bias, name='z')
+        tf.nn.relu(z, name='y')
+    return GraphDefParser.parse(graph.as_graph_def(), output_nodes=['y'])
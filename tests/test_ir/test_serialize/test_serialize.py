@@ -0,0 +1,64 @@
+import numpy as np
+import pytest
+
+from utensor_cgen.frontend import FrontendSelector
+from utensor_cgen.ir.serialize import load_graph, load_graph_meta, save_graph
+
+
+def _tensor_key(t_infos):
+    return [(t.name, t.op_name, t.dtype, t.shape) for t in t_infos]
+
+
+def test_round_trip(ugraph, tmpdir):
+    path = str(tmpdir.join('graph.utg'))
+    ugraph.ops_info['y'].op_attr['_utensor_refcnt__ref_counts'] = [1]
+    save_graph(ugraph, path)
+    for mmap_weights in [True, False]:
+        new_ugraph = load_graph(path, mmap_weights=mmap_weights)
+        assert new_ugraph.topo_order == ugraph.topo_order
+        assert new_ugraph.output_nodes == ugraph.output_nodes
+        assert new_ugraph.backend == ugraph.backend
+        assert new_ugraph.graph_def == ugraph.graph_def
+        for op_name in ugraph.topo_order:
+            op_info = ugraph.ops_info[op_name]
+            new_op_info = new_ugraph.ops_info[op_name]
+            assert new_op_info.op_type == op_info.op_type
+            assert _tensor_key(new_op_info.input_tensors) == _tensor_key(op_info.input_tensors)
+            assert _tensor_key(new_op_info.output_tensors) == _tensor_key(op_info.output_tensors)
+        assert new_ugraph.ops_info['y'].op_attr['_utensor_refcnt__ref_counts'] == [1]
+        value = new_ugraph.ops_info['weight'].op_attr['value'].value.np_array
+        assert (value == ugraph.ops_info['weight'].op_attr['value'].value.np_array).all()
+
+
+def test_weights_aligned(ugraph, tmpdir):
+    path = str(tmpdir.join('graph.utg'))
+    save_graph(ugraph, path)
+    new_ugraph = load_graph(path)
+    for name in ['weight', 'bias']:
+        np_array = new_ugraph.ops_info[name].op_attr['value'].value.np_array
+        assert isinstance(np_array, np.memmap)
+        assert np_array.ctypes.data % 64 == 0
+
+
+def test_meta(ugraph, tmpdir):
+    path = str(tmpdir.join('graph.utg'))
+    save_graph(ugraph, path)
+    meta = load_graph_meta(path)
+    assert meta['output_nodes'] == ['y']
+    assert [op['name'] for op in meta['ops']] == ugraph.topo_order
+
+
+def test_parser(ugraph, tmpdir):
+    path = str(tmpdir.join('graph.utg'))
+    save_graph(ugraph, path)
+    parser_cls = FrontendSelector.select_parser('.utg')
+    new_ugraph = parser_cls.parse(path, ['z'])
+    assert new_ugraph.output_nodes == ['z']
+
+
+def test_bad_file(tmpdir):
+    path = str(tmpdir.join('graph.utg'))
+    with open(path, 'wb') as fid:
+        fid.write(b'\x00' * 64)
+    with pytest.raises(ValueError):
+        load_graph(path)
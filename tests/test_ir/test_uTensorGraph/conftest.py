@@ -20,3 +20,16 @@ def simple_graph_and_outputs():
         bias2 = tf.constant(3.69, name='bias2', dtype=tf.float32)
         x3 = tf.multiply(x2, bias2, name='x3')
     return graph.as_graph_def(), [x2.op.name, x3.op.name]
+
+
+@pytest.fixture(scope='session', name='mlp_graph_tuple')
+def mlp_graph_and_outputs():
+    graph = tf.Graph()
+    with graph.as_default():
+        x = tf.placeholder(dtype=tf.float32, shape=None, name='x')
+        # large enough to be quantized
+        w = tf.constant(np.random.randn(64, 32), dtype=tf.float32, name='w')
+        b = tf.constant(np.random.randn(32), dtype=tf.float32, name='b')
+        z = tf.nn.relu(tf.matmul(x, w) + b, name='z')
+        y = tf.reshape(z, [-1], name='y')
+    return graph.as_graph_def(), [y.op.name]
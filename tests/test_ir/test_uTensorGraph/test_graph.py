@@ -1,11 +1,13 @@
+import pickle
 from copy import deepcopy
 
 import numpy as np
 import tensorflow as tf
 
-from utensor_cgen.ir import OperationInfo, uTensorGraph
+from utensor_cgen.ir import OperationInfo, TensorInfo, uTensorGraph
 from utensor_cgen.ir.converter import TensorProtoConverter
 from utensor_cgen.frontend.tensorflow import GraphDefParser
+from utensor_cgen.transformer.pipline import TransformerPipeline
 
 
 def test_ugraph_topo_order(graph_tuple):
@@ -67,3 +69,110 @@ def test_tensor_ops(graph_tuple):
     for op in ugraph.ops_info.values():
         for tensor in op.output_tensors:
             assert tensor.op is op
+
+def test_slotted_nodes(graph_tuple):
+    graph_def, output_nodes = graph_tuple
+    ugraph = GraphDefParser.parse(graph_def, output_nodes)
+    for op in ugraph.ops_info.values():
+        assert not hasattr(op, '__dict__')
+        for tensor in op.input_tensors + op.output_tensors:
+            assert not hasattr(tensor, '__dict__')
+
+def test_make_unchecked():
+    np_array = np.array([1, 2, 3], dtype=np.float32)
+    t_proto = tf.make_tensor_proto(np_array, dtype=np.float32)
+    ugraph = uTensorGraph(output_nodes=['dummy'])
+    out_tensor = TensorInfo.make_unchecked(name='testing_op:0',
+                                           op_name='testing_op',
+                                           dtype=np.dtype('float32'),
+                                           shape=[3],
+                                           ugraph=ugraph)
+    op_info = OperationInfo.make_unchecked(name='testing_op',
+                                           input_tensors=[],
+                                           output_tensors=[out_tensor],
+                                           op_type='Const',
+                                           backend='tensorflow',
+                                           op_attr={'value': t_proto},
+                                           ugraph=ugraph)
+    assert ugraph.ops_info['testing_op'] is op_info
+    assert out_tensor.op is op_info
+    assert (op_info.op_attr['value'].np_array == np_array).all()
+    assert out_tensor == TensorInfo(name='testing_op:0',
+                                    op_name='testing_op',
+                                    dtype=np.dtype('float32'),
+                                    shape=[3],
+                                    ugraph=ugraph)
+
+def test_lazy_op_attr(graph_tuple):
+    graph_def, output_nodes = graph_tuple
+    ugraph = GraphDefParser.parse(graph_def, output_nodes)
+    op_attr = ugraph.ops_info['weight'].op_attr
+    assert not op_attr.is_converted('value')
+    value = op_attr['value']
+    assert op_attr.is_converted('value')
+    assert op_attr['value'] is value
+    assert value.value.np_array.shape == (3, 3)
+
+    # copies share the raw values until they are read
+    op_attr = ugraph.ops_info['bias'].op_attr
+    new_attr = deepcopy(ugraph).ops_info['bias'].op_attr
+    assert not new_attr.is_converted('value')
+    assert new_attr == op_attr
+    assert pickle.loads(pickle.dumps(op_attr)) == op_attr
+
+def test_graph_def_cache(graph_tuple):
+    graph_def, output_nodes = graph_tuple
+    ugraph = GraphDefParser.parse(graph_def, output_nodes)
+    graph_def_1 = ugraph.graph_def
+    cached = dict((name, entry[-1])
+                  for name, entry in ugraph._node_def_cache.items())
+    assert ugraph.graph_def == graph_def_1
+    for name, entry in ugraph._node_def_cache.items():
+        assert entry[-1] is cached[name]
+    # raw attributes are exported without conversion
+    assert not ugraph.ops_info['weight'].op_attr.is_converted('value')
+
+    # only the modified ops are exported again
+    x3 = ugraph.ops_info['x3']
+    x3.op_type = 'Sub'
+    x2 = ugraph.ops_info['x2']
+    x2.op_attr['T'] = x2.op_attr['T']
+    new_graph_def = ugraph.graph_def
+    for name, entry in ugraph._node_def_cache.items():
+        if name in ['x2', 'x3']:
+            assert entry[-1] is not cached[name]
+        else:
+            assert entry[-1] is cached[name]
+    assert [node.op for node in new_graph_def.node if node.name == 'x3'] == ['Sub']
+
+    ugraph.mark_dirty('weight')
+    assert 'weight' not in ugraph._node_def_cache
+    ugraph.mark_dirty()
+    assert not ugraph._node_def_cache
+    assert ugraph.graph_def == new_graph_def
+
+
+def test_graph_def_cache_transformers(mlp_graph_tuple):
+    # transformers have to replace the attribute values, or call
+    # mark_dirty, when they modify them
+    graph_def, output_nodes = mlp_graph_tuple
+    ugraph = GraphDefParser.parse(graph_def, output_nodes)
+    methods = [
+        ('infer_shape', {'input_shapes': {'x': [1, 64]}}),
+        ('dropout', {}),
+        ('quantize', {'per_channel': True}),
+        ('quant_peephole', {}),
+        ('biasAdd', {}),
+        ('remove_id_op', {}),
+        ('dedup_weights', {}),
+        ('schedule', {}),
+        ('refcnt', {}),
+        ('inplace', {}),
+        ('inline', {}),
+    ]
+    for method, kwargs in methods:
+        ugraph.graph_def
+        ugraph = TransformerPipeline([(method, kwargs)]).transform(ugraph)
+        cached_graph_def = ugraph.graph_def
+        ugraph.mark_dirty()
+        assert cached_graph_def == ugraph.graph_def, method
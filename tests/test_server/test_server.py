@@ -0,0 +1,103 @@
+import json
+import os
+import stat
+import threading
+import time
+
+import pytest
+
+from utensor_cgen.client import ConversionClient
+from utensor_cgen.server import ConversionServer
+
+
+def _call(server, method, **params):
+    request = {'jsonrpc': '2.0', 'id': 1, 'method': method, 'params': params}
+    return json.loads(server.handle_line(json.dumps(request)))
+
+
+def test_protocol():
+    server = ConversionServer()
+    assert _call(server, 'ping') == {'jsonrpc': '2.0', 'id': 1, 'result': 'pong'}
+    assert _call(server, 'no_such_method')['error']['code'] == -32601
+    assert _call(server, 'ping', bad_arg=1)['error']['code'] == -32602
+    assert json.loads(server.handle_line('not json'))['error']['code'] == -32700
+    assert json.loads(server.handle_line('{"id": 1}'))['error']['code'] == -32600
+    # notifications have no response
+    assert server.handle_line('{"jsonrpc": "2.0", "method": "ping"}') is None
+    responses = json.loads(server.handle_line(json.dumps([
+        {'jsonrpc': '2.0', 'id': 1, 'method': 'ping'},
+        {'jsonrpc': '2.0', 'method': 'ping'},
+        {'jsonrpc': '2.0', 'id': 2, 'method': 'ping'},
+    ])))
+    assert [response['id'] for response in responses] == [1, 2]
+    # errors raised inside a method are internal errors
+    def type_error():
+        return len(1)
+    server._methods['type_error'] = type_error
+    response = _call(server, 'type_error')
+    assert response['error']['code'] == -32603
+    assert 'Traceback' in response['error']['data']['traceback']
+    server.running = True
+    _call(server, 'shutdown')
+    assert not server.running
+
+
+def test_convert(pb_file, tmpdir):
+    server = ConversionServer()
+    broken_file = tmpdir.join('broken.pb')
+    broken_file.write_binary(b'not a graph')
+    with server._running():
+        response = _call(server, 'convert',
+                         model=pb_file,
+                         output_nodes='y',
+                         transform_methods='refcnt',
+                         cwd=str(tmpdir))
+        result = response['result']
+        assert result['name'] == 'mlp'
+        assert result['model_path'] == str(tmpdir.join('models', 'mlp.cpp'))
+        assert tmpdir.join('models', 'mlp.cpp').check()
+        assert 'log' in result
+
+        response = _call(server, 'convert', model='broken.pb',
+                         output_nodes='y', cwd=str(tmpdir))
+        assert response['error']['code'] == -32000
+        assert 'Traceback' in response['error']['data']['traceback']
+
+        response = _call(server, 'convert', model='mlp.pb', output_nodes='y',
+                         no_such_option=1)
+        assert response['error']['code'] == -32602
+        # malformed options do not take the server down
+        for options in [{'output_nodes': 'y', 'input_shapes': 'x=a'},
+                        {'output_nodes': ''},
+                        {'output_nodes': '-y'}]:
+            response = _call(server, 'convert', model='mlp.pb', **options)
+            assert response['error']['code'] == -32602
+
+
+def test_serve_unix(tmpdir):
+    socket_path = str(tmpdir.join('server.sock'))
+    # a regular file is never removed
+    tmpdir.join('server.sock').write('')
+    with pytest.raises(FileExistsError):
+        ConversionServer().serve_unix(socket_path)
+    assert tmpdir.join('server.sock').read() == ''
+    os.remove(socket_path)
+
+    umask = os.umask(0o002)
+    try:
+        server = ConversionServer()
+        thread = threading.Thread(target=server.serve_unix, args=(socket_path,))
+        thread.start()
+        for _ in range(100):
+            if server.running:
+                break
+            time.sleep(0.1)
+        assert stat.S_IMODE(os.stat(socket_path).st_mode) == 0o600
+        with ConversionClient(socket_path) as client:
+            assert client.call('ping') == 'pong'
+            client.call('shutdown')
+        thread.join(10)
+        assert not thread.is_alive()
+        assert not os.path.exists(socket_path)
+    finally:
+        os.umask(umask)
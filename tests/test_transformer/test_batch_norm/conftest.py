@@ -0,0 +1,63 @@
+import numpy as np
+import pytest
+import tensorflow as tf
+
+
+def _bn_params(n_channels):
+    return dict(
+        mean=np.random.rand(n_channels).astype(np.float32),
+        variance=np.random.rand(n_channels).astype(np.float32) + 0.5,
+        offset=np.random.rand(n_channels).astype(np.float32),
+        scale=np.random.rand(n_channels).astype(np.float32) + 0.5,
+    )
+
+
+@pytest.fixture(scope='session', name='bn_graph_tuple')
+def bn_graph_tuple():
+    graph = tf.Graph()
+    with graph.as_default():
+        x = tf.placeholder(dtype=tf.float32, shape=[1, 8, 8, 3], name='x')
+        # conv -> fused batch norm
+        w = tf.constant(np.random.rand(3, 3, 3, 4), name='w', dtype=tf.float32)
+        conv = tf.nn.conv2d(x, w, strides=[1, 1, 1, 1], padding='SAME', name='conv')
+        with tf.name_scope('conv_bn/BatchNorm'):
+            params = _bn_params(4)
+            conv_bn, _, _ = tf.nn.fused_batch_norm(
+                conv,
+                tf.constant(params['scale'], name='gamma'),
+                tf.constant(params['offset'], name='beta'),
+                mean=tf.constant(params['mean'], name='moving_mean'),
+                variance=tf.constant(params['variance'], name='moving_variance'),
+                is_training=False
+            )
+        relu = tf.nn.relu(conv_bn, name='relu')
+        flat = tf.reshape(relu, [1, 8*8*4], name='flat')
+        # matmul -> bias add -> batch norm
+        w_fc = tf.constant(np.random.rand(8*8*4, 10), name='w_fc', dtype=tf.float32)
+        b_fc = tf.constant(np.random.rand(10), name='b_fc', dtype=tf.float32)
+        fc = tf.nn.bias_add(tf.matmul(flat, w_fc, name='fc_matmul'), b_fc, name='fc')
+        params = _bn_params(10)
+        with tf.name_scope('fc_bn'):
+            fc_bn = tf.nn.batch_normalization(
+                fc,
+                tf.constant(params['mean']),
+                tf.constant(params['variance']),
+                tf.constant(params['offset']),
+                tf.constant(params['scale']),
+                variance_epsilon=0.001
+            )
+        # batch norm without preceding conv/matmul
+        params = _bn_params(10)
+        with tf.name_scope('out_bn'):
+            out_bn = tf.nn.batch_normalization(
+                tf.nn.relu(fc_bn, name='fc_relu'),
+                tf.constant(params['mean']),
+                tf.constant(params['variance']),
+                tf.constant(params['offset']),
+                tf.constant(params['scale']),
+                variance_epsilon=0.001
+            )
+        y = tf.identity(out_bn, name='y')
+    return (graph.as_graph_def(),
+            x.name,
+            [y.op.name])
@@ -0,0 +1,39 @@
+import numpy as np
+import tensorflow as tf
+
+from utensor_cgen.frontend.tensorflow import GraphDefParser
+from utensor_cgen.transformer import BatchNormTransformer
+
+
+def test_batch_norm_fold(bn_graph_tuple):
+    (graph_def, x_name, output_nodes) = bn_graph_tuple
+    ugraph = GraphDefParser.parse(graph_def, output_nodes=output_nodes)
+    transformer = BatchNormTransformer()
+    new_ugraph = transformer.transform(ugraph)
+    for op in new_ugraph.ops_info.values():
+        assert not op.is_dangling
+    assert len(new_ugraph.ops_info) < len(ugraph.ops_info)
+    op_types = [op.op_type for op in new_ugraph.ops_info.values()]
+    assert 'FusedBatchNorm' not in op_types
+    assert 'Rsqrt' not in op_types
+    # folded into conv and matmul, only the last one is left as Mul
+    assert op_types.count('Mul') == 1
+    # the bias add of fc is merged with the folded bias
+    assert 'fc' not in new_ugraph.ops_info
+
+    x_value = np.random.rand(1, 8, 8, 3).astype(np.float32)
+    graph_1 = tf.Graph()
+    graph_2 = tf.Graph()
+    with graph_1.as_default():
+        tf.import_graph_def(graph_def, name='')
+    with graph_2.as_default():
+        tf.import_graph_def(new_ugraph.graph_def, name='')
+    with tf.Session(graph=graph_1) as sess:
+        x = graph_1.get_tensor_by_name(x_name)
+        output = graph_1.get_tensor_by_name(output_nodes[0]+":0")
+        output_1 = output.eval({x: x_value})
+    with tf.Session(graph=graph_2) as sess:
+        x = graph_2.get_tensor_by_name(x_name)
+        output = graph_2.get_tensor_by_name(output_nodes[0]+":0")
+        output_2 = output.eval({x: x_value})
+    assert np.allclose(output_1, output_2, rtol=1e-4, atol=1e-4)
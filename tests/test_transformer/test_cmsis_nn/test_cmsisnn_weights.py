@@ -0,0 +1,63 @@
+import numpy as np
+import tensorflow as tf
+
+from utensor_cgen.experimental.ugraph_builder import transpose_offline
+from utensor_cgen.frontend.tensorflow import GraphDefParser
+from utensor_cgen.transformer import QuantizeTransformer
+from utensor_cgen.transformer.cmsis_nn import (CMSIS_NN_Transformer,
+                                               CMSIS_NN_WeightTransformer,
+                                               _uint8_q7_origin)
+
+
+def _fc_ugraph():
+    graph = tf.Graph()
+    with graph.as_default():
+        x = tf.placeholder(tf.float32, [None, 64], name='x')
+        # quantize_weights only quantizes constants of at least 1024 elements
+        w = tf.constant(np.random.uniform(-1, 1, size=(64, 32)), dtype=tf.float32, name='w')
+        b = tf.constant(np.random.random(32), dtype=tf.float32, name='b')
+        tf.nn.relu(tf.add(tf.matmul(x, w), b), name='act')
+    return GraphDefParser.parse(graph.as_graph_def(), output_nodes=['act'])
+
+
+def test_transpose_offline():
+    ugraph = QuantizeTransformer().transform(_fc_ugraph())
+    op_info = ugraph.ops_info['w_quantized_const']
+    value = op_info.op_attr['value'].value.np_array
+    shape = op_info.output_tensors[0].shape
+    transpose_offline(op_info)
+    assert shape == [64, 32]
+    assert value.shape == (64, 32)
+    assert op_info.output_tensors[0].shape == [32, 64]
+    assert np.array_equal(op_info.op_attr['value'].value.np_array, value.T)
+    for consumer in op_info.output_nodes:
+        for t_info in consumer.input_tensors:
+            if t_info.op_name == op_info.name:
+                assert t_info.shape == [32, 64]
+
+
+def test_cmsisnn_weights():
+    ugraph = QuantizeTransformer().transform(_fc_ugraph())
+    ugraph = CMSIS_NN_Transformer().transform(ugraph)
+    weight_op = ugraph.ops_info['w_quantized_const']
+    expected = _uint8_q7_origin(weight_op.op_attr['value'].value.np_array,
+                                float(ugraph.ops_info['w_quantized_min'].op_attr['value'].value.np_array),
+                                float(ugraph.ops_info['w_quantized_max'].op_attr['value'].value.np_array))
+    ugraph = CMSIS_NN_WeightTransformer().transform(ugraph)
+    q7_ops = [op for op in ugraph.ops_info.values() if op.op_type == 'Uint8Q7OriginOp']
+    # only the activations are converted on the device
+    assert len(q7_ops) == 1
+    assert q7_ops[0].input_tensors[0].op.op_type != 'Const'
+    q7_const = ugraph.ops_info['convert_uint8_q7_w_quantized_const']
+    assert q7_const.op_type == 'Const'
+    assert q7_const.output_tensors[0].dtype == np.dtype('int8')
+    assert np.array_equal(q7_const.op_attr['value'].value.np_array, expected)
+    assert 'w_quantized_const' not in ugraph.ops_info
+
+
+def test_uint8_q7_origin():
+    # real 0 at uint8 128
+    values = np.array([0, 127, 128, 255], dtype=np.uint8)
+    assert _uint8_q7_origin(values, -1.0, 1.0).tolist() == [-128, -1, 0, 127]
+    # saturated
+    assert _uint8_q7_origin(values, 0.0, 1.0).tolist() == [0, 127, 127, 127]
@@ -0,0 +1,28 @@
+import numpy as np
+import pytest
+import tensorflow as tf
+
+
+@pytest.fixture(scope='session', name='const_fold_graph_tuple')
+def const_fold_graph_tuple():
+    graph = tf.Graph()
+    with graph.as_default():
+        x = tf.placeholder(dtype=tf.float32, shape=[1, 784], name='x')
+        # shape computations with static shape of x
+        x_shape = tf.shape(x, name='x_shape')
+        batch = tf.strided_slice(x_shape, [0], [1], [1],
+                                 shrink_axis_mask=1, name='batch')
+        new_shape = tf.stack([batch, -1], name='new_shape')
+        x_flat = tf.reshape(x, new_shape, name='x_flat')
+        # arithmetic on constants
+        a = tf.constant(np.arange(784).reshape(1, 784), name='a', dtype=tf.float32)
+        b = tf.constant(0.5, name='b', dtype=tf.float32)
+        c = tf.multiply(a, b, name='c')
+        y = tf.add(x_flat, c, name='y')
+    folded_ops = [new_shape.op.name, c.op.name]
+    removed_ops = [x_shape.op.name, batch.op.name, a.op.name, b.op.name]
+    return (graph.as_graph_def(),
+            x.name,
+            folded_ops,
+            removed_ops,
+            [y.op.name])
@@ -0,0 +1,43 @@
+import numpy as np
+import tensorflow as tf
+
+from utensor_cgen.frontend.tensorflow import GraphDefParser
+from utensor_cgen.transformer import ConstFoldTransformer
+
+
+def test_const_fold(const_fold_graph_tuple):
+    (graph_def,
+     x_name,
+     folded_ops,
+     removed_ops,
+     output_nodes) = const_fold_graph_tuple
+    ugraph = GraphDefParser.parse(graph_def, output_nodes=output_nodes)
+    transformer = ConstFoldTransformer()
+    new_ugraph = transformer.transform(ugraph)
+    for op in new_ugraph.ops_info.values():
+        assert not op.is_dangling
+    for op_name in folded_ops:
+        op_info = new_ugraph.ops_info[op_name]
+        assert op_info.op_type == 'Const'
+        assert not op_info.input_tensors
+    for op_name in removed_ops:
+        assert op_name not in new_ugraph.ops_info
+    new_shape = new_ugraph.ops_info[folded_ops[0]].op_attr['value'].value.np_array
+    assert new_shape.tolist() == [1, -1]
+
+    x_value = np.random.rand(1, 784).astype(np.float32)
+    graph_1 = tf.Graph()
+    graph_2 = tf.Graph()
+    with graph_1.as_default():
+        tf.import_graph_def(graph_def, name='')
+    with graph_2.as_default():
+        tf.import_graph_def(new_ugraph.graph_def, name='')
+    with tf.Session(graph=graph_1) as sess:
+        x = graph_1.get_tensor_by_name(x_name)
+        output = graph_1.get_tensor_by_name(output_nodes[0]+":0")
+        output_1 = output.eval({x: x_value})
+    with tf.Session(graph=graph_2) as sess:
+        x = graph_2.get_tensor_by_name(x_name)
+        output = graph_2.get_tensor_by_name(output_nodes[0]+":0")
+        output_2 = output.eval({x: x_value})
+    assert np.allclose(output_1, output_2)
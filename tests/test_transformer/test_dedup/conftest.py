@@ -0,0 +1,23 @@
+import numpy as np
+import pytest
+import tensorflow as tf
+
+
+@pytest.fixture(scope='session', name='dedup_graph_tuple')
+def dedup_graph_tuple():
+    graph = tf.Graph()
+    with graph.as_default():
+        x = tf.placeholder(dtype=tf.float32, shape=[1, 3], name='x')
+        a = tf.constant(np.arange(3), name='a', dtype=tf.float32)
+        b = tf.constant(np.arange(3), name='b', dtype=tf.float32)
+        # same bytes with different shape
+        c = tf.constant(np.arange(3).reshape(1, 3), name='c', dtype=tf.float32)
+        d = tf.constant(np.zeros(3), name='d', dtype=tf.float32)
+        y = tf.add(x, a, name='y')
+        z = tf.multiply(y, b, name='z')
+        w = tf.add(z, c, name='w')
+        out = tf.add(w, d, name='out')
+    return (graph.as_graph_def(),
+            x.name,
+            {b.op.name: a.op.name},
+            [out.op.name])
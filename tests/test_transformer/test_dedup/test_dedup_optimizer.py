@@ -0,0 +1,43 @@
+import numpy as np
+import tensorflow as tf
+
+from utensor_cgen.frontend.tensorflow import GraphDefParser
+from utensor_cgen.transformer import InlineTransformer, WeightDedupOptimizer
+
+
+def test_dedup(dedup_graph_tuple):
+    (graph_def, x_name, dup_map, output_nodes) = dedup_graph_tuple
+    ugraph = GraphDefParser.parse(graph_def, output_nodes=output_nodes)
+    new_ugraph = WeightDedupOptimizer().transform(ugraph)
+    for op in new_ugraph.ops_info.values():
+        assert not op.is_dangling
+    for dup_name, name in dup_map.items():
+        assert dup_name not in new_ugraph.ops_info
+        assert name in new_ugraph.ops_info
+    assert 'c' in new_ugraph.ops_info
+    assert 'd' in new_ugraph.ops_info
+    assert [t.op_name for t in new_ugraph.ops_info['z'].input_tensors] == ['y', 'a']
+
+    x_value = np.random.rand(1, 3).astype(np.float32)
+    graph_1 = tf.Graph()
+    graph_2 = tf.Graph()
+    with graph_1.as_default():
+        tf.import_graph_def(graph_def, name='')
+    with graph_2.as_default():
+        tf.import_graph_def(new_ugraph.graph_def, name='')
+    with tf.Session(graph=graph_1) as sess:
+        x = graph_1.get_tensor_by_name(x_name)
+        output_1 = graph_1.get_tensor_by_name(output_nodes[0]+":0").eval({x: x_value})
+    with tf.Session(graph=graph_2) as sess:
+        x = graph_2.get_tensor_by_name(x_name)
+        output_2 = graph_2.get_tensor_by_name(output_nodes[0]+":0").eval({x: x_value})
+    assert np.allclose(output_1, output_2)
+
+
+def test_dedup_inline(dedup_graph_tuple):
+    (graph_def, _, dup_map, output_nodes) = dedup_graph_tuple
+    ugraph = GraphDefParser.parse(graph_def, output_nodes=output_nodes)
+    ugraph = InlineTransformer().transform(ugraph)
+    new_ugraph = WeightDedupOptimizer().transform(ugraph)
+    for dup_name in dup_map:
+        assert dup_name not in new_ugraph.ops_info
@@ -0,0 +1,29 @@
+import numpy as np
+import pytest
+import tensorflow as tf
+
+
+@pytest.fixture(scope='session', name='fusion_graph_tuple')
+def fusion_graph_tuple():
+    graph = tf.Graph()
+    with graph.as_default():
+        x = tf.placeholder(dtype=tf.float32, shape=[1, 8, 8, 3], name='x')
+        w = tf.constant(np.random.rand(3, 3, 3, 4), name='w', dtype=tf.float32)
+        b = tf.constant(np.random.rand(4), name='b', dtype=tf.float32)
+        conv = tf.nn.conv2d(x, w, strides=[1, 1, 1, 1], padding='SAME', name='conv')
+        conv_relu = tf.nn.relu(tf.nn.bias_add(conv, b, name='conv_bias'), name='conv_relu')
+        flat = tf.reshape(conv_relu, [1, 8*8*4], name='flat')
+        w_fc = tf.constant(np.random.rand(8*8*4, 10), name='w_fc', dtype=tf.float32)
+        b_fc = tf.constant(np.random.rand(10), name='b_fc', dtype=tf.float32)
+        fc = tf.matmul(flat, w_fc, name='fc')
+        fc_relu = tf.nn.relu(tf.add(fc, b_fc, name='fc_bias'), name='fc_relu')
+        # relu -> add -> relu should not be fused
+        y = tf.nn.relu(tf.add(fc_relu, b_fc, name='y_add'), name='y')
+    fused_ops = {
+        conv_relu.op.name: 'FusedConv2DBiasRelu',
+        fc_relu.op.name: 'FusedMatMulBiasRelu',
+    }
+    return (graph.as_graph_def(),
+            x.name,
+            fused_ops,
+            [y.op.name])
@@ -0,0 +1,53 @@
+from utensor_cgen.backend.operators import OperatorFactory
+from utensor_cgen.frontend.tensorflow import GraphDefParser
+from utensor_cgen.transformer import (FusionTransformer, QuantizeTransformer,
+                                      RefCntOptimizer)
+
+
+def test_fusion(fusion_graph_tuple):
+    (graph_def, _, fused_ops, output_nodes) = fusion_graph_tuple
+    ugraph = GraphDefParser.parse(graph_def, output_nodes=output_nodes)
+    transformer = FusionTransformer()
+    new_ugraph = transformer.transform(ugraph)
+    for op in new_ugraph.ops_info.values():
+        assert not op.is_dangling
+    for op_name, op_type in fused_ops.items():
+        op_info = new_ugraph.ops_info[op_name]
+        assert op_info.op_type == op_type
+        assert len(op_info.input_tensors) == 3
+    op_types = [op.op_type for op in new_ugraph.ops_info.values()]
+    assert 'Conv2D' not in op_types
+    assert 'MatMul' not in op_types
+    assert 'BiasAdd' not in op_types
+    assert new_ugraph.ops_info['y'].op_type == 'Relu'
+    assert new_ugraph.ops_info['y_add'].op_type == 'Add'
+
+
+def test_quantized_fusion(fusion_graph_tuple):
+    (graph_def, _, fused_ops, output_nodes) = fusion_graph_tuple
+    ugraph = GraphDefParser.parse(graph_def, output_nodes=output_nodes)
+    quant_ugraph = QuantizeTransformer().transform(ugraph)
+    # QuantizedMatMul -> QuantizedAdd -> QuantizedRelu
+    fc_relu = [
+        op for op in quant_ugraph.ops_info.values()
+        if op.op_type == 'QuantizedRelu' and op.name.startswith('fc_relu')
+    ]
+    assert fc_relu
+    # the quantized patterns are opt-in
+    new_ugraph = FusionTransformer().transform(quant_ugraph)
+    assert new_ugraph.ops_info[fc_relu[0].name].op_type == 'QuantizedRelu'
+    new_ugraph = FusionTransformer(quantized=True).transform(quant_ugraph)
+    for op in new_ugraph.ops_info.values():
+        assert not op.is_dangling
+    fused_op = new_ugraph.ops_info[fc_relu[0].name]
+    assert fused_op.op_type == 'QuantizedFusedMatMulBiasRelu'
+    assert len(fused_op.input_tensors) == 9
+    assert len(fused_op.output_tensors) == 3
+    bias_tensors = fused_op.input_tensors[6:]
+    assert [t.op.op_type for t in bias_tensors] == ['QuantizeV2'] * 3
+    assert [t.name.split(':')[1] for t in bias_tensors] == ['0', '1', '2']
+    refcnt_ugraph = RefCntOptimizer().transform(new_ugraph)
+    snippet = OperatorFactory().createOperatorSnippet(
+        refcnt_ugraph.ops_info[fused_op.name]
+    )
+    assert 'QntFusedMatMulBiasReluOp' in snippet.render()
@@ -0,0 +1,23 @@
+import pytest
+import tensorflow as tf
+
+
+@pytest.fixture(scope='session', name='inplace_graph_tuple')
+def inplace_graph():
+    graph = tf.Graph()
+    with graph.as_default():
+        x = tf.placeholder(dtype=tf.float32, shape=[1, 4], name='x')
+        a = tf.add(x, 1.0, name='a')
+        r1 = tf.nn.relu(a, name='r1')
+        r2 = tf.nn.relu(r1, name='r2')
+        # the output of a reshape has another shape, never in-place
+        s = tf.reshape(r2, [4], name='s')
+        m = tf.multiply(s, 2.0, name='m')
+        # m is read again after n
+        n = tf.nn.relu(m, name='n')
+        k = tf.add(n, m, name='k')
+        out = tf.nn.relu(k, name='out')
+    inplace_ops = [r1.op.name, r2.op.name]
+    # a is read by r1 and, through the aliases, by the readers of r1 and r2
+    refcnt_ans = {a.op.name: [3]}
+    return graph.as_graph_def(), inplace_ops, refcnt_ans, [out.op.name]
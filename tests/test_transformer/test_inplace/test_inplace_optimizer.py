@@ -0,0 +1,23 @@
+from utensor_cgen.frontend.tensorflow import GraphDefParser
+from utensor_cgen.transformer import InPlaceOptimizer, RefCntOptimizer
+
+
+def test_inplace_optimizer(inplace_graph_tuple):
+    (graph_def, inplace_ops, refcnt_ans, output_nodes) = inplace_graph_tuple
+    ugraph = GraphDefParser.parse(graph_def, output_nodes=output_nodes)
+    ugraph = RefCntOptimizer().transform(ugraph)
+    ugraph = InPlaceOptimizer().transform(ugraph)
+    inplace_key = '%s__inplace' % InPlaceOptimizer.KWARGS_NAMESCOPE
+    for op_name, op_info in ugraph.ops_info.items():
+        assert op_info.op_attr.get(inplace_key, False) == (op_name in inplace_ops)
+    refcnt_key = '%s__ref_counts' % RefCntOptimizer.KWARGS_NAMESCOPE
+    for op_name, refcnts in refcnt_ans.items():
+        assert ugraph.ops_info[op_name].op_attr[refcnt_key] == refcnts
+
+
+def test_inplace_without_refcnt(inplace_graph_tuple):
+    (graph_def, _, _, output_nodes) = inplace_graph_tuple
+    ugraph = GraphDefParser.parse(graph_def, output_nodes=output_nodes)
+    ugraph = InPlaceOptimizer().transform(ugraph)
+    inplace_key = '%s__inplace' % InPlaceOptimizer.KWARGS_NAMESCOPE
+    assert not any(inplace_key in op_info.op_attr for op_info in ugraph.ops_info.values())
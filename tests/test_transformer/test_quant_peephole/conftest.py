@@ -0,0 +1,49 @@
+import pytest
+import tensorflow as tf
+from tensorflow.python.ops import gen_math_ops
+
+
+@pytest.fixture(scope='session', name='round_trip_graph_tuple')
+def round_trip_graph():
+    graph = tf.Graph()
+    with graph.as_default():
+        x = tf.placeholder(dtype=tf.float32, shape=[1, 8], name='x')
+        q = tf.quantize(x, -1.0, 1.0, tf.quint8, name='q')
+        d = tf.dequantize(q.output, q.output_min, q.output_max, name='d')
+        # as the quantize_nodes transform does
+        d_flat = tf.reshape(d, [-1], name='d_flat')
+        d_min = tf.reduce_min(d_flat, 0, name='d_min')
+        d_max = tf.reduce_max(d_flat, 0, name='d_max')
+        q2 = tf.quantize(d, d_min, d_max, tf.quint8, name='q2')
+        out = tf.dequantize(q2.output, q2.output_min, q2.output_max, name='out')
+    # q2 and its range
+    removed_ops = [q2.output.op.name, d.op.name, d_flat.op.name, d_min.op.name, d_max.op.name]
+    return graph.as_graph_def(), x.name, removed_ops, [out.op.name]
+
+
+@pytest.fixture(scope='session', name='requant_chain_graph_tuple')
+def requant_chain_graph():
+    graph = tf.Graph()
+    with graph.as_default():
+        x = tf.placeholder(dtype=tf.float32, shape=[1, 8], name='x')
+        q = tf.quantize(x, -1.0, 1.0, tf.qint32, name='q')
+        range_1 = gen_math_ops.requantization_range(q.output, q.output_min, q.output_max,
+                                                    name='range_1')
+        requant_1 = gen_math_ops.requantize(q.output, q.output_min, q.output_max,
+                                            range_1.output_min, range_1.output_max,
+                                            out_type=tf.qint32, name='requant_1')
+        range_2 = gen_math_ops.requantization_range(requant_1.output,
+                                                    requant_1.output_min,
+                                                    requant_1.output_max,
+                                                    name='range_2')
+        requant_2 = gen_math_ops.requantize(requant_1.output,
+                                            requant_1.output_min,
+                                            requant_1.output_max,
+                                            range_2.output_min, range_2.output_max,
+                                            out_type=tf.quint8, name='requant_2')
+        out = tf.dequantize(requant_2.output, requant_2.output_min, requant_2.output_max,
+                            name='out')
+    return (graph.as_graph_def(),
+            [requant_1.output.op.name, range_2.output_min.op.name],
+            requant_2.output.op.name,
+            [out.op.name])
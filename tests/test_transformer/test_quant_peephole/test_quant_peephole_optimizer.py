@@ -0,0 +1,36 @@
+import numpy as np
+import tensorflow as tf
+
+from utensor_cgen.frontend.tensorflow import GraphDefParser
+from utensor_cgen.transformer import QuantizePeepholeOptimizer
+
+
+def test_round_trip(round_trip_graph_tuple):
+    (graph_def, x_name, removed_ops, output_nodes) = round_trip_graph_tuple
+    ugraph = GraphDefParser.parse(graph_def, output_nodes=output_nodes)
+    new_ugraph = QuantizePeepholeOptimizer().transform(ugraph)
+    for op_name in removed_ops:
+        assert op_name not in new_ugraph.ops_info
+    assert [t.op_name for t in new_ugraph.ops_info['out'].input_tensors] == ['q'] * 3
+
+    x_value = np.random.uniform(-1, 1, size=(1, 8)).astype(np.float32)
+    outputs = []
+    for out_graph_def in [graph_def, new_ugraph.graph_def]:
+        graph = tf.Graph()
+        with graph.as_default():
+            tf.import_graph_def(out_graph_def, name='')
+        with tf.Session(graph=graph):
+            x = graph.get_tensor_by_name(x_name)
+            outputs.append(graph.get_tensor_by_name(output_nodes[0] + ':0').eval({x: x_value}))
+    # within one quantization step of the round trip
+    assert np.allclose(outputs[0], outputs[1], atol=2.0 / 255)
+
+
+def test_requant_chain(requant_chain_graph_tuple):
+    (graph_def, removed_ops, requant_name, output_nodes) = requant_chain_graph_tuple
+    ugraph = GraphDefParser.parse(graph_def, output_nodes=output_nodes)
+    new_ugraph = QuantizePeepholeOptimizer().transform(ugraph)
+    for op_name in removed_ops:
+        assert op_name not in new_ugraph.ops_info
+    requant_info = new_ugraph.ops_info[requant_name]
+    assert [t.op_name for t in requant_info.input_tensors] == ['q'] * 3 + ['range_1'] * 2
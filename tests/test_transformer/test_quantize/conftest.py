@@ -0,0 +1,17 @@
+import numpy as np
+import pytest
+import tensorflow as tf
+
+
+@pytest.fixture(scope='session', name='fc_graph_tuple')
+def fc_graph():
+    np.random.seed(4)
+    # quantize_weights only quantizes constants of at least 1024 elements
+    # channels of very different scales
+    w_values = np.random.randn(64, 32) * np.logspace(-2, 0, 32)
+    graph = tf.Graph()
+    with graph.as_default():
+        x = tf.placeholder(dtype=tf.float32, shape=[1, 64], name='x')
+        w = tf.constant(w_values, dtype=tf.float32, name='w')
+        out = tf.matmul(x, w, name='out')
+    return graph.as_graph_def(), w_values.astype(np.float32), [out.op.name]
@@ -0,0 +1,47 @@
+import numpy as np
+from tensorflow.tools.graph_transforms import TransformGraph
+
+from utensor_cgen.frontend.tensorflow import GraphDefParser
+from utensor_cgen.transformer.quantize import (QuantizeTransformer,
+                                               dequantize_weights,
+                                               quantize_weights)
+
+
+def test_quantize_weights_as_tf(fc_graph_tuple):
+    graph_def, w_values, output_nodes = fc_graph_tuple
+    quant_graph_def = TransformGraph(input_graph_def=graph_def,
+                                     inputs=[],
+                                     outputs=output_nodes,
+                                     transforms=['quantize_weights'])
+    ugraph = GraphDefParser.parse(quant_graph_def, output_nodes=output_nodes)
+    tf_values = ugraph.ops_info['w_quantized_const'].op_attr['value'].value.np_array
+    tf_min = ugraph.ops_info['w_quantized_min'].op_attr['value'].value.np_array
+    tf_max = ugraph.ops_info['w_quantized_max'].op_attr['value'].value.np_array
+    quantized, min_value, max_value = quantize_weights(w_values)
+    assert (quantized == tf_values).all()
+    assert min_value == tf_min and max_value == tf_max
+
+
+def test_per_channel_error(fc_graph_tuple):
+    _, w_values, _ = fc_graph_tuple
+    quantized, min_value, max_value = quantize_weights(w_values)
+    tensor_error = np.abs(dequantize_weights(quantized, min_value, max_value) - w_values)
+    quantized, min_values, max_values = quantize_weights(w_values, axis=1)
+    assert min_values.shape == max_values.shape == (32,)
+    channel_error = np.abs(dequantize_weights(quantized, min_values, max_values, axis=1) - w_values)
+    # at most half a step of the channel
+    assert (channel_error <= (max_values - min_values) / 255 * 0.5 + 1e-6).all()
+    assert np.sqrt(np.mean(channel_error**2)) < 0.5 * np.sqrt(np.mean(tensor_error**2))
+
+
+def test_per_channel_transformer(fc_graph_tuple):
+    graph_def, w_values, output_nodes = fc_graph_tuple
+    ugraph = GraphDefParser.parse(graph_def, output_nodes=output_nodes)
+    quant_ugraph = QuantizeTransformer(per_channel=True).transform(ugraph)
+    matmul_op = [op_info for op_info in quant_ugraph.ops_info.values()
+                 if op_info.op_type == 'QuantizedMatMul'][0]
+    assert matmul_op.op_attr['_quantize__per_channel']
+    assert matmul_op.input_tensors[4].shape == [32]
+    assert matmul_op.input_tensors[5].shape == [32]
+    min_values = quant_ugraph.ops_info['w_quantized_min'].op_attr['value'].value.np_array
+    assert min_values.shape == (32,)
@@ -0,0 +1,29 @@
+import pytest
+import tensorflow as tf
+
+
+@pytest.fixture(scope='session', name='schedule_graph_tuple')
+def schedule_graph_tuple():
+    graph = tf.Graph()
+    with graph.as_default():
+        x = tf.placeholder(dtype=tf.float32, shape=[1, 1000], name='x')
+        # small tensor which stays alive until z is evaluated
+        m = tf.multiply(x, 2.0, name='m')
+        # large intermediate tensor reduced to a scalar
+        big = tf.tile(x, [100, 1], name='big')
+        s = tf.reduce_sum(big, name='s')
+        z = tf.add(m, s, name='z')
+    return (graph.as_graph_def(),
+            (m.op.name, big.op.name),
+            [z.op.name])
+
+
+@pytest.fixture(scope='session', name='chain_graph_tuple')
+def chain_graph_tuple():
+    graph = tf.Graph()
+    with graph.as_default():
+        x = tf.placeholder(dtype=tf.float32, shape=[1, 10], name='x')
+        y = x
+        for i in range(500):
+            y = tf.multiply(y, 2.0, name='mul_{}'.format(i))
+    return graph.as_graph_def(), [y.op.name]
@@ -0,0 +1,53 @@
+from utensor_cgen.frontend.tensorflow import GraphDefParser
+from utensor_cgen.transformer import (MemoryScheduleTransformer,
+                                      RefCntOptimizer, peak_memory)
+
+
+def _check_topo_order(ugraph):
+    visited = set()
+    for op_name in ugraph.topo_order:
+        op_info = ugraph.ops_info[op_name]
+        for in_op in op_info.input_nodes:
+            assert in_op.name in visited
+        visited.add(op_name)
+    assert visited == set(ugraph.ops_info.keys())
+
+
+def test_schedule(schedule_graph_tuple):
+    (graph_def, (m_name, big_name), output_nodes) = schedule_graph_tuple
+    ugraph = GraphDefParser.parse(graph_def, output_nodes=output_nodes)
+    ori_peak = peak_memory(ugraph)
+    # x, m and big are alive at the same time
+    assert ori_peak == 4000 + 4000 + 400000
+    transformer = MemoryScheduleTransformer()
+    new_ugraph = transformer.transform(ugraph)
+    _check_topo_order(new_ugraph)
+    assert peak_memory(new_ugraph) == 4000 + 400000 + 4
+    topo_order = new_ugraph.topo_order
+    assert topo_order.index(big_name) < topo_order.index(m_name)
+    # the order is kept by later transformers
+    refcnt_ugraph = RefCntOptimizer().transform(new_ugraph)
+    assert refcnt_ugraph.topo_order == topo_order
+
+
+def test_schedule_greedy(schedule_graph_tuple):
+    (graph_def, _, output_nodes) = schedule_graph_tuple
+    ugraph = GraphDefParser.parse(graph_def, output_nodes=output_nodes)
+    ori_peak = peak_memory(ugraph)
+    # too few states for dynamic programming
+    transformer = MemoryScheduleTransformer(max_states=1)
+    new_ugraph = transformer.transform(ugraph)
+    _check_topo_order(new_ugraph)
+    assert peak_memory(new_ugraph) <= ori_peak
+
+
+def test_schedule_chain(chain_graph_tuple):
+    (graph_def, output_nodes) = chain_graph_tuple
+    ugraph = GraphDefParser.parse(graph_def, output_nodes=output_nodes)
+    ori_peak = peak_memory(ugraph)
+    # one state for each number of scheduled ops, too many for 500 states
+    new_ugraph = MemoryScheduleTransformer(max_states=500).transform(ugraph)
+    _check_topo_order(new_ugraph)
+    assert peak_memory(new_ugraph) == ori_peak
+    # the input and output of a mul are alive at the same time
+    assert ori_peak == 40 + 40
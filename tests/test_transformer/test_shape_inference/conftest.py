@@ -0,0 +1,36 @@
+import numpy as np
+import pytest
+import tensorflow as tf
+
+
+def _build_graph(x_shape):
+    graph = tf.Graph()
+    with graph.as_default():
+        x = tf.placeholder(dtype=tf.float32, shape=x_shape, name='x')
+        w = tf.constant(np.random.rand(3, 3, 1, 4), name='w', dtype=tf.float32)
+        conv = tf.nn.conv2d(x, w, strides=[1, 2, 2, 1], padding='SAME', name='conv')
+        relu = tf.nn.relu(conv, name='relu')
+        pool = tf.nn.max_pool(relu, ksize=[1, 2, 2, 1], strides=[1, 2, 2, 1],
+                              padding='VALID', name='pool')
+        flat = tf.reshape(pool, [-1, 7*7*4], name='flat')
+        w_fc = tf.constant(np.random.rand(7*7*4, 10), name='w_fc', dtype=tf.float32)
+        logits = tf.matmul(flat, w_fc, name='logits')
+        pred = tf.argmax(logits, axis=1, name='pred')
+    return graph, [pred.op.name]
+
+
+@pytest.fixture(scope='session', name='shape_graph_tuple')
+def shape_graph_tuple():
+    # no shape information for the input
+    graph, output_nodes = _build_graph(None)
+    # tensorflow inferred shapes with known input shape
+    ref_graph, _ = _build_graph([1, 28, 28, 1])
+    ref_shapes = dict(
+        (tensor.name, tensor.shape.as_list())
+        for op in ref_graph.get_operations()
+        for tensor in op.outputs
+    )
+    return (graph.as_graph_def(),
+            {'x': [1, 28, 28, 1]},
+            ref_shapes,
+            output_nodes)
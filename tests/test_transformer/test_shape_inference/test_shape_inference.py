@@ -0,0 +1,29 @@
+from utensor_cgen.frontend.tensorflow import GraphDefParser
+from utensor_cgen.transformer import ShapeInferenceTransformer
+
+
+def test_shape_inference(shape_graph_tuple):
+    (graph_def, input_shapes, ref_shapes, output_nodes) = shape_graph_tuple
+    ugraph = GraphDefParser.parse(graph_def, output_nodes=output_nodes)
+    assert None in ugraph.ops_info['relu'].output_tensors[0].shape
+    transformer = ShapeInferenceTransformer(input_shapes=input_shapes)
+    new_ugraph = transformer.transform(ugraph)
+    for op_info in new_ugraph.ops_info.values():
+        for t_info in op_info.output_tensors:
+            assert t_info.shape == ref_shapes[t_info.name]
+        # consumers are in sync with the producers
+        for t_info in op_info.input_tensors:
+            assert t_info.shape == ref_shapes[t_info.name]
+    x_op = new_ugraph.ops_info['x']
+    assert x_op.op_attr['shape'].value.list_view == input_shapes['x']
+
+
+def test_shape_inference_graph_def(shape_graph_tuple):
+    (graph_def, input_shapes, _, output_nodes) = shape_graph_tuple
+    ugraph = GraphDefParser.parse(graph_def, output_nodes=output_nodes)
+    # cache the NodeDefs before the transform
+    x_node = [node for node in ugraph.graph_def.node if node.name == 'x'][0]
+    assert x_node.attr['shape'].shape.unknown_rank
+    new_ugraph = ShapeInferenceTransformer(input_shapes=input_shapes).transform(ugraph)
+    x_node = [node for node in new_ugraph.graph_def.node if node.name == 'x'][0]
+    assert [dim.size for dim in x_node.attr['shape'].shape.dim] == input_shapes['x']
@@ -0,0 +1,22 @@
+import numpy as np
+import pytest
+import tensorflow as tf
+
+
+@pytest.fixture(scope='session', name='stats_graph_tuple')
+def stats_graph_tuple():
+    graph = tf.Graph()
+    with graph.as_default():
+        x = tf.placeholder(dtype=tf.float32, shape=[1, 8, 8, 3], name='x')
+        kernel = tf.constant(np.random.randn(3, 3, 3, 4),
+                             dtype=tf.float32,
+                             name='kernel')
+        conv = tf.nn.conv2d(x, kernel, strides=[1, 1, 1, 1],
+                            padding='SAME', name='conv')
+        flat = tf.reshape(conv, [1, 256], name='flat')
+        weight = tf.constant(np.random.randn(256, 10),
+                             dtype=tf.float32,
+                             name='weight')
+        logits = tf.matmul(flat, weight, name='logits')
+        y = tf.nn.relu(logits, name='y')
+    return graph.as_graph_def(), [y.op.name]
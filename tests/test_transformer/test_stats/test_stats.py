@@ -0,0 +1,33 @@
+from utensor_cgen.frontend.tensorflow import GraphDefParser
+from utensor_cgen.transformer.stats import (StatsTransformer, format_stats,
+                                            graph_stats)
+
+
+def test_graph_stats(stats_graph_tuple):
+    graph_def, output_nodes = stats_graph_tuple
+    ugraph = GraphDefParser.parse(graph_def, output_nodes=output_nodes)
+    stats = graph_stats(ugraph)
+    op_stats = dict((op.name, op) for op in stats.ops)
+
+    conv_macs = 8 * 8 * 4 * 3 * 3 * 3
+    assert op_stats['conv'].macs == conv_macs
+    assert op_stats['conv'].flops == 2 * conv_macs
+    assert op_stats['conv'].activation_bytes == 8 * 8 * 4 * 4
+    assert op_stats['logits'].macs == 256 * 10
+    assert op_stats['y'].flops == 10
+    assert op_stats['kernel'].param_bytes == {'float': 3 * 3 * 3 * 4 * 4}
+    assert op_stats['kernel'].activation_bytes == 0
+
+    assert stats.macs == conv_macs + 256 * 10
+    assert stats.param_bytes['float'] == (3 * 3 * 3 * 4 + 256 * 10) * 4
+    assert stats.peak_activation_bytes > 0
+    assert 'MACs: {}'.format(stats.macs) in format_stats(stats, per_op=True)
+
+
+def test_stats_transformer(stats_graph_tuple):
+    graph_def, output_nodes = stats_graph_tuple
+    ugraph = GraphDefParser.parse(graph_def, output_nodes=output_nodes)
+    topo_order = list(ugraph.topo_order)
+    new_ugraph = StatsTransformer(label='test').transform(ugraph)
+    assert new_ugraph is ugraph
+    assert new_ugraph.topo_order == topo_order
@@ -0,0 +1,33 @@
+import os
+
+from utensor_cgen.utils import OutputFile
+
+
+def test_output_file(tmpdir):
+    path = str(tmpdir.join('model.cpp'))
+    output = OutputFile(path)
+    with output as fid:
+        fid.write('int x;\n')
+    assert output.changed
+    os.utime(path, (0, 0))
+
+    output = OutputFile(path)
+    with output as fid:
+        fid.write('int x;\n')
+    assert not output.changed
+    assert os.stat(path).st_mtime == 0
+
+    output = OutputFile(path)
+    with output as fid:
+        fid.write('int y;\n')
+    assert output.changed
+    assert tmpdir.join('model.cpp').read() == 'int y;\n'
+
+    try:
+        with OutputFile(path) as fid:
+            fid.write('broken')
+            raise RuntimeError('failed')
+    except RuntimeError:
+        pass
+    assert tmpdir.join('model.cpp').read() == 'int y;\n'
+    assert tmpdir.listdir() == [tmpdir.join('model.cpp')]
@@ -1,7 +1,8 @@
 # -*- coding:utf8 -*-
 import logging
 import os
-import pickle
+import re
+from collections import OrderedDict
 from tempfile import NamedTemporaryFile
 
 import numpy as np
@@ -9,29 +10,42 @@ import tensorflow as tf
 from tensorflow.core.framework.graph_pb2 import GraphDef
 from tensorflow.tools.graph_transforms import TransformGraph
 
-from utensor_cgen.ir import uTensorGraph
+from utensor_cgen.ir import TensorInfo, uTensorGraph
+from utensor_cgen.ir.serialize import save_graph
 from utensor_cgen.frontend import FrontendSelector
-from utensor_cgen.transformer.optimizer import RefCntOptimizer
+from utensor_cgen.transformer.optimizer import InPlaceOptimizer, RefCntOptimizer
 from utensor_cgen.transformer.pipline import TransformerPipeline
-from utensor_cgen.utils import NamescopedKWArgsParser
+from utensor_cgen.transformer.shape_inference import ShapeInferenceTransformer
+from utensor_cgen.transformer.stats import StatsTransformer
+from utensor_cgen.utils import NamescopedKWArgsParser, OutputFile
 
 from .operators import OperatorFactory
+from .placement import WeightPlacement
 from .snippets import (CommentSnippet, ContextGlobalArrayContainer,
                        ContextHeaderSnippet, ContextSnippetsContainer,
-                       CreateTensorBinarySnippet, CreateTensorIdxSnippet)
+                       CreateTensorBinarySnippet, CreateTensorIdxSnippet,
+                       WeightDeclarationContainer, WeightIncbinContainer,
+                       WeightShardContainer)
 from .snippets.composer import Composer
 
 __all__ = ["CodeGenerator"]
 _logger = logging.getLogger('utensor-cli')
 
 class CodeGenerator(object):
+  WEIGHT_FORMATS = ('c', 'incbin')
+
   def __init__(self, model_file,
                idx_dir,
                embed_data_dir,
                trans_methods, # [(trans_name, kwargs),...]
                output_nodes,
                save_graph=False,
-               debug_cmt=False):
+               debug_cmt=False,
+               input_shapes=None,
+               log_stats=False,
+               weight_shards=None,
+               weight_format='c',
+               weight_placement=None):
     self.model_file = model_file
     if not os.path.exists(idx_dir):
       os.makedirs(idx_dir)
@@ -41,6 +55,23 @@ class CodeGenerator(object):
     self.output_nodes = output_nodes
     self.save_graph = save_graph
     self.debug_cmt = debug_cmt
+    self.input_shapes = input_shapes
+    # number of .cpp files to define the inline weights in, if given
+    self.weight_shards = weight_shards
+    # 'c': initializer lists, 'incbin': raw data files with an assembly stub
+    if weight_format not in self.WEIGHT_FORMATS:
+      raise ValueError('unknown weight format: {}'.format(weight_format))
+    self.weight_format = weight_format
+    # alignment and sections of the inline weights, see `WeightPlacement`
+    self.weight_placement = weight_placement
+    if input_shapes:
+      self.trans_methods = self._with_input_shapes(self.trans_methods, input_shapes)
+    if log_stats:
+      self.trans_methods = self._with_stats(self.trans_methods)
+    # path -> whether the file is changed, of the last generation
+    self.output_files = OrderedDict()
+    # section -> (number of tensors, bytes) of the inline weights, of the last generation
+    self.weight_sections = OrderedDict()
 
   def generate(self, src_fname):
     _, ext = os.path.splitext(self.model_file)
@@ -64,6 +95,7 @@ class CodeGenerator(object):
     container = ContextSnippetsContainer(graph_name, header_name, weightheader_name)
 
     opFactory = OperatorFactory()
+    self.output_files = OrderedDict()
 
     self._check_non_quantized(ugraph)
     _logger.info("Transforming graph: %s", self.model_file)
@@ -85,11 +117,12 @@ class CodeGenerator(object):
 
     if self.save_graph:
       _logger.info('Saving transformed graph')
-      pkl_fname = "quant_{}.pkl".format(graph_name)
-      with open(pkl_fname, 'wb') as fid:
-        pickle.dump(quant_ugraph, fid)
-      _logger.info('{} saved'.format(pkl_fname))
+      utg_fname = "quant_{}.utg".format(graph_name)
+      save_graph(quant_ugraph, utg_fname)
+      _logger.info('{} saved'.format(utg_fname))
 
+    # tensor name -> name of the tensor whose buffer is reused in-place
+    aliases = {}
     for op_id, op_name in enumerate(quant_ugraph.topo_order):
       op_info = quant_ugraph.ops_info[op_name]
       op_type = op_info.op_type
@@ -105,11 +138,23 @@ class CodeGenerator(object):
       else:
         # TODO: the operator may correspond to multiple snippets (such as InlinTensor)
         # weight_container is passed to function for workaround
-        snippet = opFactory.createOperatorSnippet(op_info,
-                                                  idx_dir=self.idx_dir,
-                                                  embed_data_dir=self.embed_data_dir,
-                                                  weight_container=weight_container)
+        in_tensors = op_info.input_tensors
+        if aliases:
+          op_info.input_tensors = [self._alias_tensor(t_info, aliases) for t_info in in_tensors]
+        try:
+          snippet = opFactory.createOperatorSnippet(op_info,
+                                                    idx_dir=self.idx_dir,
+                                                    embed_data_dir=self.embed_data_dir,
+                                                    weight_container=weight_container,
+                                                    output_files=self.output_files)
+        finally:
+          op_info.input_tensors = in_tensors
         container.add_snippet(snippet)
+        inplace_parser = NamescopedKWArgsParser(InPlaceOptimizer.KWARGS_NAMESCOPE,
+                                                op_info.op_attr)
+        if inplace_parser.get('inplace', False):
+          in_tname = in_tensors[0].name
+          aliases[op_info.output_tensors[0].name] = aliases.get(in_tname, in_tname)
 
       if self.debug_cmt:
         comments = ["<<< Operation id {}: {}".format(op_id, op_name),
@@ -118,22 +163,128 @@ class CodeGenerator(object):
         container.add_snippet(cmt_snippet)
     composer.add_snippet(container)
 
-    if 'inline' in self.trans_methods:
-      _logger.info("Generate weight file: %s", weightheader_fname)
-      with open(weightheader_fname, "w") as wf:
-        wf.write('// Auto generated by utensor-cli\n\n')
-        wf.write(weight_container.render())
+    if 'inline' in [name for name, _ in self.trans_methods]:
+      self._place_weights(weight_container)
+      if self.weight_format == 'incbin':
+        if self.weight_shards:
+          _logger.warning("weight shards are ignored with incbin weight format")
+        self._write_weight_incbin(fname, guard_name, weightheader_fname, weight_container)
+      elif self.weight_shards:
+        self._write_weight_shards(fname, guard_name, weightheader_fname, weight_container)
+      else:
+        _logger.info("Generate weight file: %s", weightheader_fname)
+        self._write_output(weightheader_fname, weight_container)
     else:
       container.remove_header('"{}"'.format(weightheader_name))
+    self._remove_stale_weight_files(fname)
       
     _logger.info("Generate header file: %s", header_fname)
-    with open(header_fname, "w") as wf:
-      wf.write('// Auto generated by utensor-cli\n\n')
-      wf.write(header_snippet.render())
+    self._write_output(header_fname, header_snippet)
     _logger.info("Generate source file: %s", src_fname)
-    with open(src_fname, "w") as wf:
+    self._write_output(src_fname, composer)
+    changed_files = [path for path, changed in self.output_files.items() if changed]
+    _logger.info("%d of %d output files changed", len(changed_files), len(self.output_files))
+    for path in changed_files:
+      _logger.info("changed: %s", path)
+
+  def _place_weights(self, weight_container):
+    placement = self.weight_placement or WeightPlacement()
+    self.weight_sections = placement.apply(weight_container.snippets)
+    _logger.info("Weight placement:")
+    for section, (num_tensors, nbytes) in self.weight_sections.items():
+      _logger.info("  %s: %d tensor(s), %d bytes", section, num_tensors, nbytes)
+
+  def _write_weight_shards(self, fname, guard_name, weightheader_fname, weight_container):
+    """Define the weights in `weight_shards` source files of roughly equal
+    size, declared in the weight header, so they can be compiled in parallel
+    """
+    _logger.info("Generate weight declarations: %s", weightheader_fname)
+    self._write_output(weightheader_fname,
+                       WeightDeclarationContainer(guard_name, weight_container.snippets))
+    weightheader_name = os.path.basename(weightheader_fname)
+    for shard_idx, snippets in enumerate(weight_container.shard(self.weight_shards)):
+      shard_fname = self._weight_shard_fname(fname, shard_idx)
+      _logger.info("Generate weight shard: %s", shard_fname)
+      self._write_output(shard_fname, WeightShardContainer(weightheader_name, snippets))
+
+  def _write_weight_incbin(self, fname, guard_name, weightheader_fname, weight_container):
+    """Write the weights as raw data files, included by an assembly
+    source with `.incbin` and declared in the weight header
+    """
+    bin_dir = '{}_weights'.format(fname)
+    if not os.path.exists(bin_dir):
+      os.makedirs(bin_dir)
+    _logger.info("Generate weight data files: %s", bin_dir)
+    for snippet in weight_container.snippets:
+      bin_fname = os.path.join(bin_dir, '{}.bin'.format(snippet.template_vars['inline_name']))
+      output = OutputFile(bin_fname, 'wb')
+      with output as fid:
+        snippet.write_binary(fid)
+      self.output_files[bin_fname] = output.changed
+    _logger.info("Generate weight declarations: %s", weightheader_fname)
+    self._write_output(weightheader_fname,
+                       WeightDeclarationContainer(guard_name, weight_container.snippets))
+    incbin_fname = self._weight_incbin_fname(fname)
+    _logger.info("Generate weight assembly: %s", incbin_fname)
+    self._write_output(incbin_fname,
+                       WeightIncbinContainer(os.path.basename(bin_dir), weight_container.snippets))
+
+  def _remove_stale_weight_files(self, fname):
+    """Remove the weight sources (shards and assembly) and the weight data
+    files of a previous generation which are not generated this time, they
+    would define the weights twice or be picked up by the build system
+
+    Only the files matching the generated names are removed, the data
+    directory only if it is left empty
+    """
+    out_dir = os.path.dirname(fname) or '.'
+    pattern = re.compile(r'^{}_weight(_\d+\.cpp|\.S)$'.format(re.escape(os.path.basename(fname))))
+    for weight_fname in sorted(os.listdir(out_dir)):
+      weight_path = os.path.join(os.path.dirname(fname), weight_fname)
+      if pattern.match(weight_fname) and weight_path not in self.output_files:
+        _logger.info("Remove stale weight source: %s", weight_path)
+        os.remove(weight_path)
+    bin_dir = '{}_weights'.format(fname)
+    if not os.path.isdir(bin_dir):
+      return
+    for bin_fname in sorted(os.listdir(bin_dir)):
+      bin_path = os.path.join(bin_dir, bin_fname)
+      if bin_fname.endswith('.bin') and os.path.isfile(bin_path) \
+        and bin_path not in self.output_files:
+        _logger.info("Remove stale weight data file: %s", bin_path)
+        os.remove(bin_path)
+    if not os.listdir(bin_dir):
+      _logger.info("Remove empty weight data directory: %s", bin_dir)
+      os.rmdir(bin_dir)
+
+  @staticmethod
+  def _alias_tensor(t_info, aliases):
+    """The tensor read instead of `t_info` if it is written in-place
+    """
+    if t_info.name not in aliases:
+      return t_info
+    return TensorInfo.make_unchecked(name=aliases[t_info.name],
+                                     op_name=t_info.op_name,
+                                     dtype=t_info.dtype,
+                                     shape=t_info.shape,
+                                     ugraph=t_info.ugraph)
+
+  @staticmethod
+  def _weight_shard_fname(fname, shard_idx):
+    return '{}_weight_{}.cpp'.format(fname, shard_idx)
+
+  @staticmethod
+  def _weight_incbin_fname(fname):
+    return '{}_weight.S'.format(fname)
+
+  def _write_output(self, fname, snippet):
+    """Write the snippet (or composer) to the file if its content changes
+    """
+    output = OutputFile(fname)
+    with output as wf:
       wf.write('// Auto generated by utensor-cli\n\n')
-      wf.write(composer.compose())
+      snippet.write_to(wf)
+    self.output_files[fname] = output.changed
   
   @classmethod
   def _check_non_quantized(cls, ugraph):
@@ -154,6 +305,34 @@ class CodeGenerator(object):
       _logger.warning(("Expecting non-quantized graph, "
                         "graph transformation/optimization might not work properly"))
 
+  @staticmethod
+  def _with_input_shapes(trans_methods, input_shapes):
+    """Pass the input shapes to shape inference, which is
+    added to the head of the pipeline if not present
+    """
+    infer_name = ShapeInferenceTransformer.METHOD_NAME
+    new_methods = []
+    for name, kwargs in trans_methods:
+      if name == infer_name:
+        kwargs = dict(kwargs)
+        kwargs.setdefault('input_shapes', input_shapes)
+      new_methods.append((name, kwargs))
+    if infer_name not in [name for name, _ in trans_methods]:
+      new_methods.insert(0, (infer_name, {'input_shapes': input_shapes}))
+    return new_methods
+
+  @staticmethod
+  def _with_stats(trans_methods):
+    """Log the graph statistics before and after each transformation
+    """
+    stats_name = StatsTransformer.METHOD_NAME
+    new_methods = [(stats_name, {'label': 'original graph'})]
+    for name, kwargs in trans_methods:
+      new_methods.append((name, kwargs))
+      if name != stats_name:
+        new_methods.append((stats_name, {'label': 'after {}'.format(name)}))
+    return new_methods
+
   def _transform_graph(self, ugraph, methods):
     pipeline = TransformerPipeline(methods)
     return pipeline.transform(ugraph)
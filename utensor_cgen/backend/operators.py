@@ -5,8 +5,9 @@ import idx2numpy as idx2np
 import numpy as np
 
 from utensor_cgen.logger import logger
-from utensor_cgen.transformer.optimizer import RefCntOptimizer
-from utensor_cgen.utils import NamescopedKWArgsParser
+from utensor_cgen.transformer.optimizer import InPlaceOptimizer, RefCntOptimizer
+from utensor_cgen.transformer.quantize import QuantizeTransformer
+from utensor_cgen.utils import NamescopedKWArgsParser, OutputFile
 
 from .snippets import *  # pylint: disable=W0401,W0614
 
@@ -239,9 +240,11 @@ class _QuantizedMatMulOperator(_Operator):
                                     op_info.op_attr)
     ref_counts = parser.get('ref_counts', [])
     to_eval = parser.get('to_eval', False)
+    per_channel = NamescopedKWArgsParser(QuantizeTransformer.KWARGS_NAMESCOPE,
+                                         op_info.op_attr).get('per_channel', False)
     self._snippet = QuantizedMatMulOpSnippet(inputs, outputs,
                                              x_dtype, w_dtype, out_dtype, 
-                                             ref_counts, to_eval)
+                                             ref_counts, to_eval, per_channel)
 
 @OperatorFactory.register
 class _ReluOperator(_Operator):
@@ -259,9 +262,11 @@ class _ReluOperator(_Operator):
                                     op_info.op_attr)
     ref_count = parser.get('ref_counts', [0])[0]
     to_eval = parser.get('to_eval', False)
+    inplace = NamescopedKWArgsParser(InPlaceOptimizer.KWARGS_NAMESCOPE,
+                                     op_info.op_attr).get('inplace', False)
     self._snippet = ReluOpSnippet(inputs, output, in_dtype,
                                            out_dtype,
-                                           ref_count, to_eval)
+                                           ref_count, to_eval, inplace)
 
 
 @OperatorFactory.register
@@ -281,9 +286,11 @@ class _QuantizedReluOperator(_Operator):
                                     op_info.op_attr)
     ref_counts = parser.get('ref_counts', [])
     to_eval = parser.get('to_eval', False)
+    inplace = NamescopedKWArgsParser(InPlaceOptimizer.KWARGS_NAMESCOPE,
+                                     op_info.op_attr).get('inplace', False)
     self._snippet = QuantizedReluOpSnippet(inputs, outputs, in_dtype,
                                            out_dtypes, qout_dtype, 
-                                           ref_counts, to_eval)
+                                           ref_counts, to_eval, inplace)
 
 
 @OperatorFactory.register
@@ -444,9 +451,109 @@ class _Conv2DQuantOperator(_Operator):
                                     op_info.op_attr)
     ref_counts = parser.get('ref_counts', [])
     to_eval = parser.get('to_eval', False)
+    per_channel = NamescopedKWArgsParser(QuantizeTransformer.KWARGS_NAMESCOPE,
+                                         op_info.op_attr).get('per_channel', False)
     self._snippet = Conv2DQuantOpSnippent(inputs, outputs, strides, padding,
                                      in_dtype=in_dtype, filter_dtype=filter_dtype, out_dtypes=out_dtypes,
-                                     ref_counts=ref_counts, to_eval=to_eval)
+                                     ref_counts=ref_counts, to_eval=to_eval,
+                                     per_channel=per_channel)
+@OperatorFactory.register
+class _FusedConv2DBiasReluOperator(_Operator):
+
+  op_type = "FusedConv2DBiasRelu"
+
+  def __init__(self, op_info, **kwargs):
+    _Operator.__init__(self)
+    inputs = [tensor_info.name for tensor_info in op_info.input_tensors]
+    output = op_info.output_tensors[0].name
+    in_dtype, filter_dtype, bias_dtype = (op_info.input_tensors[0].dtype,
+                                          op_info.input_tensors[1].dtype,
+                                          op_info.input_tensors[2].dtype)
+    out_dtype = op_info.output_tensors[0].dtype
+    strides = op_info.op_attr["strides"].value.ints_value
+    padding = op_info.op_attr["padding"].value.decode('utf8')
+    parser = NamescopedKWArgsParser(RefCntOptimizer.KWARGS_NAMESCOPE,
+                                    op_info.op_attr)
+    ref_count = parser.get('ref_counts', [0])[0]
+    to_eval = parser.get('to_eval', False)
+    self._snippet = FusedConv2DBiasReluOpSnippet(inputs, output, strides, padding,
+                                                 in_dtype=in_dtype, filter_dtype=filter_dtype,
+                                                 bias_dtype=bias_dtype, out_dtype=out_dtype,
+                                                 ref_count=ref_count, to_eval=to_eval)
+
+@OperatorFactory.register
+class _FusedMatMulBiasReluOperator(_Operator):
+
+  op_type = "FusedMatMulBiasRelu"
+
+  def __init__(self, op_info, **kwargs):
+    _Operator.__init__(self)
+    inputs = [tensor_info.name for tensor_info in op_info.input_tensors]
+    output = op_info.output_tensors[0].name
+    x_dtype, w_dtype, bias_dtype = (op_info.input_tensors[0].dtype,
+                                    op_info.input_tensors[1].dtype,
+                                    op_info.input_tensors[2].dtype)
+    out_dtype = op_info.output_tensors[0].dtype
+    parser = NamescopedKWArgsParser(RefCntOptimizer.KWARGS_NAMESCOPE,
+                                    op_info.op_attr)
+    ref_count = parser.get('ref_counts', [0])[0]
+    to_eval = parser.get('to_eval', False)
+    self._snippet = FusedMatMulBiasReluOpSnippet(inputs, output,
+                                                 x_dtype, w_dtype, bias_dtype, out_dtype,
+                                                 ref_count, to_eval)
+
+@OperatorFactory.register
+class _QuantizedFusedConv2DBiasReluOperator(_Operator):
+
+  op_type = "QuantizedFusedConv2DBiasRelu"
+
+  def __init__(self, op_info, **kwargs):
+    _Operator.__init__(self)
+    # input, filter, min/max of input, min/max of filter, bias, min/max of bias
+    inputs = [tensor_info.name for tensor_info in op_info.input_tensors]
+    outputs = [tensor_info.name for tensor_info in op_info.output_tensors]
+    in_dtype, filter_dtype, bias_dtype = (op_info.input_tensors[0].dtype,
+                                          op_info.input_tensors[1].dtype,
+                                          op_info.input_tensors[6].dtype)
+    out_dtypes = [tensor_info.dtype for tensor_info in op_info.output_tensors]
+    strides = op_info.op_attr["strides"].value.ints_value
+    padding = op_info.op_attr["padding"].value.decode('utf8')
+    parser = NamescopedKWArgsParser(RefCntOptimizer.KWARGS_NAMESCOPE,
+                                    op_info.op_attr)
+    ref_counts = parser.get('ref_counts', [])
+    to_eval = parser.get('to_eval', False)
+    per_channel = NamescopedKWArgsParser(QuantizeTransformer.KWARGS_NAMESCOPE,
+                                         op_info.op_attr).get('per_channel', False)
+    self._snippet = QuantizedFusedConv2DBiasReluOpSnippet(inputs, outputs, strides, padding,
+                                                          in_dtype=in_dtype, filter_dtype=filter_dtype,
+                                                          bias_dtype=bias_dtype, out_dtypes=out_dtypes,
+                                                          ref_counts=ref_counts, to_eval=to_eval,
+                                                          per_channel=per_channel)
+
+@OperatorFactory.register
+class _QuantizedFusedMatMulBiasReluOperator(_Operator):
+
+  op_type = "QuantizedFusedMatMulBiasRelu"
+
+  def __init__(self, op_info, **kwargs):
+    _Operator.__init__(self)
+    # x, w, min/max of x, min/max of w, bias, min/max of bias
+    inputs = [tensor_info.name for tensor_info in op_info.input_tensors]
+    outputs = [tensor_info.name for tensor_info in op_info.output_tensors]
+    x_dtype, w_dtype, bias_dtype = (op_info.input_tensors[0].dtype,
+                                    op_info.input_tensors[1].dtype,
+                                    op_info.input_tensors[6].dtype)
+    out_dtypes = [tensor_info.dtype for tensor_info in op_info.output_tensors]
+    parser = NamescopedKWArgsParser(RefCntOptimizer.KWARGS_NAMESCOPE,
+                                    op_info.op_attr)
+    ref_counts = parser.get('ref_counts', [])
+    to_eval = parser.get('to_eval', False)
+    per_channel = NamescopedKWArgsParser(QuantizeTransformer.KWARGS_NAMESCOPE,
+                                         op_info.op_attr).get('per_channel', False)
+    self._snippet = QuantizedFusedMatMulBiasReluOpSnippet(inputs, outputs,
+                                                          x_dtype, w_dtype, bias_dtype, out_dtypes,
+                                                          ref_counts, to_eval, per_channel)
+
 @OperatorFactory.register
 class _Uint8Q7OriginOperator(_Operator):
 
@@ -508,7 +615,8 @@ class _InlineOperator(_Operator):
     weight_snippet = WeightSnippet(inline_tname,
                                   out_dtype,
                                   tensor_shape,
-                                  value)
+                                  value,
+                                  ref_count=ref_count)
     weight_container = kwargs['weight_container']                             
     weight_container.add_snippet(weight_snippet)
 
@@ -544,7 +652,10 @@ class _ConstOperator(_Operator):
                                            ref_count=ref_count)
     idx_path = os.path.join(idx_dir, idx_fname)
     value = op_info.op_attr['value'].value
-    self._tf_save_data(idx_path, value)
+    changed = self._tf_save_data(idx_path, value)
+    output_files = kwargs.get('output_files', None)
+    if output_files is not None:
+      output_files[idx_path] = changed
 
   def _tf_prepare_tensor_name(self, tensor_name):
     """Replace all ':' and '/' with '_' in a given tensor name
@@ -556,9 +667,14 @@ class _ConstOperator(_Operator):
     np_array = value.np_array
     if np_array.shape == ():
       np_array = np.array([np_array])
-    with open(path, "wb") as fid:
+    output = OutputFile(path, "wb")
+    with output as fid:
       idx2np.convert_to_file(fid, np_array)
-    logger.info("saving %s", path)
+    if output.changed:
+      logger.info("saving %s", path)
+    else:
+      logger.debug("%s unchanged", path)
+    return output.changed
 
 @OperatorFactory.register
 class _RamOperator(_Operator):
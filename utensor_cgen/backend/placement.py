@@ -0,0 +1,135 @@
+# -*- coding:utf8 -*-
+r"""Placement of the Inline Weights
+
+A `WeightPlacement` sets the alignment and the linker section of each
+inline weight array. The section of a tensor is, in order of precedence
+
+1. the section of the first rule whose pattern matches the tensor name
+2. the hot section, if the tensor is hot: not larger than
+   `hot_max_bytes` or read by at least `hot_min_refs` ops
+3. the default section (the rule without pattern), if any
+
+For example, with a tightly coupled memory for small or frequently used
+tensors and the rest in external flash::
+
+  WeightPlacement(alignment=16,
+                  sections=['.qspi_rodata'],
+                  hot_section='.dtcm_rodata',
+                  hot_max_bytes=4096)
+"""
+import re
+from collections import OrderedDict
+
+import attr
+
+from .snippets._types import TENSOR_TYPE_NP_DTYPES
+
+__all__ = ['WeightPlacement', 'DEFAULT_SECTION']
+
+# name of the section in the report if no section is set
+DEFAULT_SECTION = '(default)'
+
+
+def _parse_section_rule(rule):
+  """`'[PATTERN=]SECTION'` or `(PATTERN, SECTION)` -> (regex or None, section)
+  """
+  if isinstance(rule, (list, tuple)):
+    pattern, section = rule
+  elif '=' in rule:
+    pattern, section = rule.rsplit('=', 1)
+  else:
+    pattern, section = None, rule
+  if not section:
+    raise ValueError('empty section name: {!r}'.format(rule))
+  if pattern is not None:
+    try:
+      pattern = re.compile(pattern)
+    except re.error as error:
+      raise ValueError('invalid pattern {!r}: {}'.format(pattern, error))
+  return pattern, section
+
+
+def _parse_section_rules(rules):
+  if rules is None:
+    return []
+  if isinstance(rules, str):
+    rules = [rules]
+  elif isinstance(rules, dict):
+    rules = list(rules.items())
+  return [_parse_section_rule(rule) for rule in rules]
+
+
+@attr.s
+class WeightPlacement(object):
+  """
+  alignment : int, power of 2, alignment of the arrays in bytes
+  sections : list of `'[PATTERN=]SECTION'` rules (or a dict of pattern
+      to section), the rule without pattern sets the default section
+  hot_section : str, section of the hot tensors
+  hot_max_bytes : int, tensors of at most this size are hot
+  hot_min_refs : int, tensors read by at least this number of ops are hot
+  """
+  alignment = attr.ib(default=None)
+  sections = attr.ib(default=None, converter=_parse_section_rules)
+  hot_section = attr.ib(default=None)
+  hot_max_bytes = attr.ib(default=None)
+  hot_min_refs = attr.ib(default=None)
+
+  def __attrs_post_init__(self):
+    if self.alignment is not None:
+      if self.alignment <= 0 or self.alignment & (self.alignment - 1):
+        raise ValueError('alignment should be a power of 2, get {}'.format(self.alignment))
+    if self.hot_section is not None and \
+      self.hot_max_bytes is None and self.hot_min_refs is None:
+      raise ValueError('hot section without hot_max_bytes or hot_min_refs')
+
+  @classmethod
+  def from_dict(cls, config):
+    """Make the placement from a dict, such as a model in the manifest of
+    `utensor-cli convert-batch`, where `align` is the alignment
+    """
+    config = dict(config)
+    if 'align' in config:
+      config['alignment'] = config.pop('align')
+    return cls(**config)
+
+  def is_hot(self, nbytes, ref_count=0):
+    if self.hot_max_bytes is not None and nbytes <= self.hot_max_bytes:
+      return True
+    if self.hot_min_refs is not None and ref_count >= self.hot_min_refs:
+      return True
+    return False
+
+  def section_of(self, name, nbytes, ref_count=0):
+    """The section of the tensor, None for the default of the compiler
+    """
+    default_section = None
+    for pattern, section in self.sections:
+      if pattern is None:
+        if default_section is None:
+          default_section = section
+      elif pattern.search(name):
+        return section
+    if self.hot_section is not None and self.is_hot(nbytes, ref_count):
+      return self.hot_section
+    return default_section
+
+  def apply(self, weight_snippets):
+    """Set the alignment and section of the weight snippets
+
+    Return
+    ------
+    report : OrderedDict, section -> (number of tensors, bytes)
+    """
+    report = OrderedDict()
+    for snippet in weight_snippets:
+      template_vars = snippet.template_vars
+      nbytes = template_vars['length'] * TENSOR_TYPE_NP_DTYPES[template_vars['type']].itemsize
+      section = self.section_of(template_vars['inline_name'],
+                                nbytes,
+                                template_vars.get('ref_count', 0))
+      template_vars['alignment'] = self.alignment
+      template_vars['section'] = section
+      num_tensors, total_bytes = report.get(section or DEFAULT_SECTION, (0, 0))
+      report[section or DEFAULT_SECTION] = (num_tensors + 1, total_bytes + nbytes)
+    return report
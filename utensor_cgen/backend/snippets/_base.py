@@ -43,12 +43,22 @@ class SnippetBase(object):
   def remove_header(self, header):
     self.__headers__.remove(header)
 
+  def write_to(self, fp):
+    """Render the snippet and write it to the file object `fp` piece by
+    piece, without building the whole text in memory
+    """
+    for chunk in self.generate():
+      fp.write(chunk)
+
 
 class Snippet(SnippetBase):  # pylint: W0223
 
   def render(self):
     return self.template.render(**self.template_vars)
 
+  def generate(self):
+    return self.template.generate(**self.template_vars)
+
 
 class SnippetContainerBase(SnippetBase):
 
@@ -61,6 +71,10 @@ class SnippetContainerBase(SnippetBase):
     for snp in self._snippets:
       self.__headers__.update(snp.headers)
 
+  @property
+  def snippets(self):
+    return list(self._snippets)
+
   def add_snippet(self, snippet):
     """Add snippet into containers
     """
@@ -72,3 +86,9 @@ class SnippetContainerBase(SnippetBase):
 
   def render(self):
     return self.template.render(snippets=self._snippets, **self.template_vars)
+
+  def generate(self):
+    """Render the container lazily, each snippet is rendered when its
+    text is reached
+    """
+    return self.template.generate(snippets=self._snippets, **self.template_vars)
@@ -2,7 +2,7 @@
 import numpy as np
 
 from ._base import Snippet, SnippetContainerBase  # pylint: disable=W0611
-from ._types import NP_TYPES_MAP
+from ._types import NP_TYPES_MAP, TENSOR_TYPE_NP_DTYPES
 
 __all__ = ["Snippet", "SnippetContainerBase",
            "CreateTensorIdxSnippet", "CreateTensorNewSnippet",
@@ -18,8 +18,13 @@ __all__ = ["Snippet", "SnippetContainerBase",
            "CommentSnippet", "ContextHeaderSnippet",
            "ContextSnippetsContainer", "QuantizedAddOpSnippet",
            "CreateTensorBinarySnippet", "WeightSnippet",
-           "ContextGlobalArrayContainer", "QuantRangeForMultiplicationSnippet",
-           "CreateTensorRamSnippet", "Uint8Q7OriginSnippet"]
+           "ContextGlobalArrayContainer", "WeightDeclarationContainer",
+           "WeightShardContainer", "WeightIncbinContainer",
+           "QuantRangeForMultiplicationSnippet",
+           "CreateTensorRamSnippet", "Uint8Q7OriginSnippet",
+           "FusedConv2DBiasReluOpSnippet", "FusedMatMulBiasReluOpSnippet",
+           "QuantizedFusedConv2DBiasReluOpSnippet",
+           "QuantizedFusedMatMulBiasReluOpSnippet"]
 
 # TODO: Better abstraction, i.e a better backend for code generation
 class CreateTensorIdxSnippet(Snippet):
@@ -327,7 +332,8 @@ class QuantizedMatMulOpSnippet(Snippet):
 
   def __init__(self, inputs, outputs, x_dtype, w_dtype, out_dtype,
                ref_counts=None,
-               to_eval=False):
+               to_eval=False,
+               per_channel=False):
     Snippet.__init__(self)
     if ref_counts is None:
       ref_counts = []
@@ -344,6 +350,7 @@ class QuantizedMatMulOpSnippet(Snippet):
     self.template_vars["w_dtype"] = NP_TYPES_MAP[w_dtype].tensor_type_str
     self.template_vars["out_dtype"] = NP_TYPES_MAP[out_dtype].tensor_type_str
     self.template_vars["to_eval"] = to_eval
+    self.template_vars["per_channel"] = per_channel
 
 
 class QuantizedAddOpSnippet(Snippet):
@@ -399,7 +406,8 @@ class ReluOpSnippet(Snippet):
 
   def __init__(self, inputs, output, in_dtype, out_dtype,
                ref_count=0,
-               to_eval=False):
+               to_eval=False,
+               inplace=False):
     Snippet.__init__(self)
     if ref_count:
       self.template_vars["ref_count"] = ref_count
@@ -408,6 +416,7 @@ class ReluOpSnippet(Snippet):
     self.template_vars["in_dtype"] = NP_TYPES_MAP[in_dtype].tensor_type_str
     self.template_vars["out_dtype"] = NP_TYPES_MAP[out_dtype].tensor_type_str
     self.template_vars["to_eval"] = to_eval
+    self.template_vars["inplace"] = inplace
 
 class QuantizedReluOpSnippet(Snippet):
   __template_name__ = "snippets/qrelu_op.cpp"
@@ -415,7 +424,8 @@ class QuantizedReluOpSnippet(Snippet):
 
   def __init__(self, inputs, outputs, in_dtype, out_dtypes, qout_dtype,
                ref_counts=None,
-               to_eval=False):
+               to_eval=False,
+               inplace=False):
     Snippet.__init__(self)
     if ref_counts is None:
       ref_counts = []
@@ -430,6 +440,7 @@ class QuantizedReluOpSnippet(Snippet):
     self.template_vars["qout_dtype"] = NP_TYPES_MAP[qout_dtype].tensor_type_str
     self.template_vars["ref_counts"] = ref_counts
     self.template_vars["to_eval"] = to_eval
+    self.template_vars["inplace"] = inplace
 
 
 class RequantizationRangeOpSnippet(Snippet):
@@ -623,8 +634,77 @@ class Conv2DQuantOpSnippent(Snippet):
   def __init__(self, inputs, outputs, strides, padding,
                in_dtype, filter_dtype, out_dtypes,
                ref_counts=None,
+               to_eval=False,
+               per_channel=False):
+    Snippet.__init__(self)
+    if ref_counts is None:
+      ref_counts = []
+    if ref_counts:
+      err_msg = ("incorrect number of ref_counts and outputs: {}, {}"
+                 .format(ref_counts, outputs))
+      assert len(ref_counts) == len(outputs), err_msg
+    self.template_vars["inputs"] = inputs
+    self.template_vars["outputs"] = outputs
+    self.template_vars["in_dtype"] = NP_TYPES_MAP[in_dtype].tensor_type_str
+    self.template_vars["filter_dtype"] = NP_TYPES_MAP[filter_dtype].tensor_type_str
+    self.template_vars["out_dtypes"] = [NP_TYPES_MAP[out_dtype].tensor_type_str for out_dtype in out_dtypes]
+    self.template_vars["strides"] = strides
+    self.template_vars["padding"] = padding
+    self.template_vars["ref_counts"] = ref_counts
+    self.template_vars["to_eval"] = to_eval
+    self.template_vars["per_channel"] = per_channel
+
+class FusedConv2DBiasReluOpSnippet(Snippet):
+  __template_name__ = "snippets/fused_conv2d_bias_relu_op.cpp"
+  __headers__ = set(['"uTensor/ops/FusedOps.hpp"'])
+
+  def __init__(self, inputs, output, strides, padding,
+               in_dtype, filter_dtype, bias_dtype, out_dtype,
+               ref_count=0,
                to_eval=False):
     Snippet.__init__(self)
+    if ref_count:
+      self.template_vars["ref_count"] = ref_count
+    self.template_vars["inputs"] = inputs
+    self.template_vars["output"] = output
+    self.template_vars["in_dtype"] = NP_TYPES_MAP[in_dtype].tensor_type_str
+    self.template_vars["filter_dtype"] = NP_TYPES_MAP[filter_dtype].tensor_type_str
+    self.template_vars["bias_dtype"] = NP_TYPES_MAP[bias_dtype].tensor_type_str
+    self.template_vars["out_dtype"] = NP_TYPES_MAP[out_dtype].tensor_type_str
+    self.template_vars["strides"] = strides
+    self.template_vars["padding"] = padding
+    self.template_vars["to_eval"] = to_eval
+
+
+class FusedMatMulBiasReluOpSnippet(Snippet):
+  __template_name__ = "snippets/fused_matmul_bias_relu_op.cpp"
+  __headers__ = set(['"uTensor/ops/FusedOps.hpp"'])
+
+  def __init__(self, inputs, output, x_dtype, w_dtype, bias_dtype, out_dtype,
+               ref_count=0,
+               to_eval=False):
+    Snippet.__init__(self)
+    if ref_count:
+      self.template_vars['ref_count'] = ref_count
+    self.template_vars["inputs"] = inputs
+    self.template_vars["output"] = output
+    self.template_vars["x_dtype"] = NP_TYPES_MAP[x_dtype].tensor_type_str
+    self.template_vars["w_dtype"] = NP_TYPES_MAP[w_dtype].tensor_type_str
+    self.template_vars["bias_dtype"] = NP_TYPES_MAP[bias_dtype].tensor_type_str
+    self.template_vars["out_dtype"] = NP_TYPES_MAP[out_dtype].tensor_type_str
+    self.template_vars["to_eval"] = to_eval
+
+
+class QuantizedFusedConv2DBiasReluOpSnippet(Snippet):
+  __template_name__ = "snippets/qfused_conv2d_bias_relu_op.cpp"
+  __headers__ = set(['"uTensor/ops/FusedOps.hpp"'])
+
+  def __init__(self, inputs, outputs, strides, padding,
+               in_dtype, filter_dtype, bias_dtype, out_dtypes,
+               ref_counts=None,
+               to_eval=False,
+               per_channel=False):
+    Snippet.__init__(self)
     if ref_counts is None:
       ref_counts = []
     if ref_counts:
@@ -635,11 +715,42 @@ class Conv2DQuantOpSnippent(Snippet):
     self.template_vars["outputs"] = outputs
     self.template_vars["in_dtype"] = NP_TYPES_MAP[in_dtype].tensor_type_str
     self.template_vars["filter_dtype"] = NP_TYPES_MAP[filter_dtype].tensor_type_str
+    self.template_vars["bias_dtype"] = NP_TYPES_MAP[bias_dtype].tensor_type_str
     self.template_vars["out_dtypes"] = [NP_TYPES_MAP[out_dtype].tensor_type_str for out_dtype in out_dtypes]
     self.template_vars["strides"] = strides
     self.template_vars["padding"] = padding
     self.template_vars["ref_counts"] = ref_counts
     self.template_vars["to_eval"] = to_eval
+    self.template_vars["per_channel"] = per_channel
+
+
+class QuantizedFusedMatMulBiasReluOpSnippet(Snippet):
+  __template_name__ = "snippets/qfused_matmul_bias_relu_op.cpp"
+  __headers__ = set(['"uTensor/ops/FusedOps.hpp"'])
+
+  def __init__(self, inputs, outputs, x_dtype, w_dtype, bias_dtype, out_dtypes,
+               ref_counts=None,
+               to_eval=False,
+               per_channel=False):
+    Snippet.__init__(self)
+    if ref_counts is None:
+      ref_counts = []
+    # hack on different arguments order between tensorflow and uTensor
+    inputs = _permute_args(inputs, [0, 2, 3, 1, 4, 5, 6, 7, 8])
+    if ref_counts:
+      err_msg = ("incorrect number of ref_counts and outputs: {}, {}"
+                 .format(ref_counts, outputs))
+      assert len(ref_counts) == len(outputs), err_msg
+      self.template_vars['ref_counts'] = ref_counts
+    self.template_vars["inputs"] = inputs
+    self.template_vars["outputs"] = outputs
+    self.template_vars["x_dtype"] = NP_TYPES_MAP[x_dtype].tensor_type_str
+    self.template_vars["w_dtype"] = NP_TYPES_MAP[w_dtype].tensor_type_str
+    self.template_vars["bias_dtype"] = NP_TYPES_MAP[bias_dtype].tensor_type_str
+    self.template_vars["out_dtypes"] = [NP_TYPES_MAP[out_dtype].tensor_type_str for out_dtype in out_dtypes]
+    self.template_vars["to_eval"] = to_eval
+    self.template_vars["per_channel"] = per_channel
+
 
 class Uint8Q7OriginSnippet(Snippet):
   __template_name__ = "snippets/cmsis_uint8q7origin_op.cpp"
@@ -700,13 +811,28 @@ class WeightSnippet(Snippet):
   __template_name__ = "snippets/weight_snippet.hpp"
   __headers__ = set([])
 
-  def __init__(self, inline_name, type, shape, value):
+  def __init__(self, inline_name, type, shape, value, ref_count=0):
       Snippet.__init__(self)
       length = np.prod(shape)
       self.template_vars['type'] =  NP_TYPES_MAP[type].tensor_type_str 
       self.template_vars['value'] = value
       self.template_vars['length'] = int(length) 
       self.template_vars['inline_name'] = inline_name 
+      # number of ops reading the tensor
+      self.template_vars['ref_count'] = ref_count
+      # set by `utensor_cgen.backend.placement.WeightPlacement`
+      self.template_vars['alignment'] = None
+      self.template_vars['section'] = None
+
+  def write_binary(self, fp):
+    """Write the values as raw little-endian data of the tensor type
+    """
+    value = np.asarray(self.template_vars['value'])
+    if value.dtype.names:
+      # the quantized types of tensorflow are structured dtypes
+      value = value.view(value.dtype[0])
+    np_dtype = TENSOR_TYPE_NP_DTYPES[self.template_vars['type']]
+    fp.write(value.astype(np_dtype).tobytes())
 
 
 class ContextGlobalArrayContainer(SnippetContainerBase):
@@ -716,6 +842,62 @@ class ContextGlobalArrayContainer(SnippetContainerBase):
   def __init__(self, snippets=None):
     SnippetContainerBase.__init__(self, snippets)
 
+  def shard(self, num_shards):
+    """Split the weight snippets into `num_shards` lists of roughly equal
+    total length
+
+    The largest arrays are assigned first, each to the shard with the
+    least total length, and every shard keeps the order of the snippets
+    """
+    shards = [[] for _ in range(num_shards)]
+    lengths = [0] * num_shards
+    by_length = sorted(enumerate(self._snippets),
+                       key=lambda t: (-t[1].template_vars['length'], t[0]))
+    for idx, snippet in by_length:
+      shard_idx = lengths.index(min(lengths))
+      shards[shard_idx].append((idx, snippet))
+      lengths[shard_idx] += snippet.template_vars['length']
+    return [[snippet for _, snippet in sorted(shard, key=lambda t: t[0])]
+            for shard in shards]
+
+
+class WeightDeclarationContainer(SnippetContainerBase):
+  """`extern const` declarations of the weight arrays, which are defined
+  in the weight shards (see `WeightShardContainer`)
+  """
+  __template_name__ = "containers/weight_decls.hpp"
+  __headers__ = set([])
+
+  def __init__(self, guard_name, snippets=None):
+    SnippetContainerBase.__init__(self, snippets)
+    self.template_vars["header_guard"] = "_{}_WEIGHT_H".format(guard_name.upper())
+
+
+class WeightShardContainer(SnippetContainerBase):
+  """Definitions of a part of the weight arrays, as a translation unit
+  """
+  __template_name__ = "containers/weight_shard.cpp"
+  __headers__ = set([])
+
+  def __init__(self, weight_header_name, snippets=None):
+    SnippetContainerBase.__init__(self, snippets)
+    self.template_vars["weight_header"] = weight_header_name
+
+
+class WeightIncbinContainer(SnippetContainerBase):
+  """Assembly source defining the weight arrays with `.incbin` of the
+  raw data files written by `WeightSnippet.write_binary`
+
+  The files are at `bin_dir/<inline name>.bin`, relative to the include
+  path of the assembler
+  """
+  __template_name__ = "containers/weight_incbin.S"
+  __headers__ = set([])
+
+  def __init__(self, bin_dir, snippets=None):
+    SnippetContainerBase.__init__(self, snippets)
+    self.template_vars["bin_dir"] = bin_dir
+
 
 class ContextSnippetsContainer(SnippetContainerBase):
   __template_name__ = "containers/get_ctx.cpp"
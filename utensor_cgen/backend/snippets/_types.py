@@ -25,3 +25,12 @@ NP_TYPES_MAP = {
                                                       tensor_type_str="q7_t"),
 }
 del _TYPE_MAP_VALUE
+
+# numpy dtypes of the raw (little-endian) data of each tensor type
+TENSOR_TYPE_NP_DTYPES = {
+  "float": np.dtype('<f4'),
+  "int": np.dtype('<i4'),
+  "uint8_t": np.dtype('u1'),
+  "uint16_t": np.dtype('<u2'),
+  "q7_t": np.dtype('i1'),
+}
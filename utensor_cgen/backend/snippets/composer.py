@@ -1,5 +1,6 @@
 # -*- coding:utf8 -*-
 import re
+from io import StringIO
 
 from ._snippets import Snippet, SnippetContainerBase
 
@@ -21,13 +22,22 @@ class Composer(object):
 
   def compose(self):
     if not self._cached:
-      self._text = ""
-      self._compose_header()
-      for snippet in self._snippets:
-        self._text += snippet.render()
+      text = StringIO()
+      self.write_to(text)
+      self._text = text.getvalue()
       self._cached = True
     return self._text
 
+  def write_to(self, fp):
+    """Write the composed text to the file object `fp`
+
+    The snippets are rendered and written one by one, so the memory
+    usage does not grow with the size of the output
+    """
+    self._compose_header(fp)
+    for snippet in self._snippets:
+      snippet.write_to(fp)
+
   def add_snippet(self, snippet):
     if not isinstance(snippet, (Snippet, SnippetContainerBase)):
       msg = "expecting Snippet/SnippetContainerBase object, get {}".format(type(snippet))
@@ -35,12 +45,12 @@ class Composer(object):
     self._cached = False
     self._snippets.append(snippet)
 
-  def _compose_header(self):
+  def _compose_header(self, fp):
     unique_headers = set([])
     for snp in self._snippets:
       unique_headers.update(snp.headers)
     headers = [(header, 0) if _STD_PATTERN.match(header) else (header, 1) for header in unique_headers]
     headers = [t[0] for t in sorted(headers, key=lambda t: t[1], reverse=True)]
     for header in headers:
-      self._text += "#include {}\n".format(header)
-    self._text += "\n\n"
+      fp.write("#include {}\n".format(header))
+    fp.write("\n\n")
@@ -1,12 +1,45 @@
 # -*- coding:utf8 -*-
-from jinja2 import Environment, PackageLoader
+r"""Jinja Environment of the Snippets
 
-_loader = PackageLoader('utensor_cgen', 'backend/snippets/templates')
+The templates are loaded from the template sources, with the compiled
+bytecode cached on disk across processes.
 
-env = Environment(loader=_loader, trim_blocks=True, lstrip_blocks=True)
-env.globals.update(zip=zip)
+Set `UTENSOR_TEMPLATE_CACHE_DIR` to change the directory of the bytecode
+cache, or to an empty string to disable it.
+"""
+import os
 
-del _loader
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader
+
+__all__ = ['env']
+
+_TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'templates')
+_ENV_OPTIONS = dict(trim_blocks=True, lstrip_blocks=True)
+
+
+def _make_bytecode_cache(cache_dir):
+  if cache_dir == '':
+    return None
+  try:
+    if cache_dir is None:
+      # a private directory in the temporary directory
+      return FileSystemBytecodeCache()
+    if not os.path.exists(cache_dir):
+      os.makedirs(cache_dir)
+    return FileSystemBytecodeCache(cache_dir)
+  except (OSError, RuntimeError):
+    return None
+
+
+def _make_env(cache_dir=None):
+  new_env = Environment(loader=FileSystemLoader(_TEMPLATE_DIR),
+                        bytecode_cache=_make_bytecode_cache(cache_dir),
+                        **_ENV_OPTIONS)
+  new_env.globals.update(zip=zip)
+  return new_env
+
+
+env = _make_env(cache_dir=os.environ.get('UTENSOR_TEMPLATE_CACHE_DIR', None))
 
 # useful references
 # - https://gist.github.com/wrunk/1317933/d204be62e6001ea21e99ca0a90594200ade2511e
@@ -0,0 +1,17 @@
+#ifndef {{header_guard}}
+#define {{header_guard}}
+#include <stdint.h>
+
+#ifdef __cplusplus
+extern "C" {
+#endif
+
+{% for snippet in snippets %}
+extern const {{snippet.template_vars.type}} {{snippet.template_vars.inline_name}} [ {{snippet.template_vars.length}} ];
+{% endfor %}
+
+#ifdef __cplusplus
+}
+#endif
+
+#endif // {{header_guard}}
@@ -0,0 +1,5 @@
+#include "{{weight_header}}"
+
+{% for snippet in snippets %}
+{{snippet.render()}}
+{% endfor %}
@@ -0,0 +1,13 @@
+{
+    {% if ref_count %}
+    ctx.add(new RamTensor<{{out_dtype}}>(), "{{output}}", {{ref_count}});
+    {% else %}
+    ctx.add(new RamTensor<{{out_dtype}}>(), "{{output}}");
+    {% endif %}
+    ctx.push(new FusedMatMulBiasReluOp<{{x_dtype}}, {{w_dtype}}, {{bias_dtype}}, {{out_dtype}}>(),
+             { {%for tname in inputs[:-1] %}"{{tname}}", {% endfor %} "{{inputs[-1]}}" },
+             { "{{output}}" });
+    {% if to_eval %}
+    ctx.eval();
+    {% endif %}
+}
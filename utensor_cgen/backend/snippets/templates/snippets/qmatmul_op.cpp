@@ -11,7 +11,7 @@ S_TENSOR {%for sptr_name in sptr_names[:-1]%}{{sptr_name}}, {%endfor%} {{sptr_na
     ctx.add(new RamTensor<float>({1}), "{{outputs[1]}}");
     ctx.add(new RamTensor<float>({1}), "{{outputs[2]}}");
     {% endif %}
-    ctx.push(new QntMatMulOp<{{x_dtype}}, {{w_dtype}}, {{out_dtype}}>(), 
+    ctx.push(new {% if per_channel %}QntMatMulPerChannelOp{% else %}QntMatMulOp{% endif %}<{{x_dtype}}, {{w_dtype}}, {{out_dtype}}>(), 
              { {%for tname in inputs[:-1] %}"{{tname}}", {% endfor %} "{{inputs[-1]}}" },
              { {%for tname in outputs[:-1] %}"{{tname}}", {% endfor %} "{{outputs[-1]}}" });
     {% for sptr_name, output in zip(sptr_names, outputs) %}
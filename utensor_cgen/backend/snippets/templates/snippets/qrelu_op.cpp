@@ -2,18 +2,23 @@
 S_TENSOR {%for sptr_name in sptr_names[:-1]%}{{sptr_name}}, {%endfor%} {{sptr_names[-1]}};
 {% endif %}
 {
-    {%if ref_counts%}
+    {%if inplace%}
+    // in-place: {{outputs[0]}} is written into {{inputs[0]}}
+    {%elif ref_counts%}
     ctx.add(new RamTensor<{{qout_dtype}}>(), "{{outputs[0]}}", {{ref_counts[0]}});
+    {%else%}
+    ctx.add(new RamTensor<{{qout_dtype}}>(), "{{outputs[0]}}");
+    {%endif%}
+    {%if ref_counts%}
     ctx.add(new RamTensor<{{out_dtypes[0]}}>({1}), "{{outputs[1]}}", {{ref_counts[1]}});
     ctx.add(new RamTensor<{{out_dtypes[1]}}>({1}), "{{outputs[2]}}", {{ref_counts[2]}});
     {%else%}
-    ctx.add(new RamTensor<{{qout_dtype}}>(), "{{outputs[0]}}");
     ctx.add(new RamTensor<{{out_dtypes[0]}}>({1}), "{{outputs[1]}}");
     ctx.add(new RamTensor<{{out_dtypes[1]}}>({1}), "{{outputs[2]}}");
     {%endif%}
     ctx.push(new QuantizedReluOp<{{in_dtype}}, {{out_dtypes[0]}}, {{qout_dtype}}>(), 
              { {% for tname in inputs[:-1]%}"{{tname}}", {% endfor %}"{{inputs[-1]}}" },
-             { {% for tname in outputs[:-1]%}"{{tname}}", {% endfor %}"{{outputs[-1]}}" });
+             { "{% if inplace %}{{inputs[0]}}{% else %}{{outputs[0]}}{% endif %}", {% for tname in outputs[1:-1]%}"{{tname}}", {% endfor %}"{{outputs[-1]}}" });
     {% for sptr_name, output in zip(sptr_names, outputs) %}
     {{sptr_name}} = ctx.get("{{output}}");
     {% endfor %}
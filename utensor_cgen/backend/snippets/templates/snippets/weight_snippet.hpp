@@ -1,3 +1,3 @@
 #include <stdint.h>
 
-const {{ type }} {{ inline_name }} [ {{ length }} ] = { {% for item in value %} {{ item }}, {% endfor %} };
+const {{ type }} {{ inline_name }} [ {{ length }} ]{% if alignment or section %} __attribute__(({% if alignment %}aligned({{ alignment }}){% endif %}{% if alignment and section %}, {% endif %}{% if section %}section("{{ section }}"){% endif %})){% endif %} = { {% for item in value %} {{ item }}, {% endfor %} };
@@ -0,0 +1,354 @@
+# -*- coding:utf8 -*-
+r"""Batch Conversion
+
+Convert the models listed in a manifest file, each in its own worker
+process. The workers are forked from a server process (the `forkserver`
+of multiprocessing) which has the heavy modules (tensorflow, the code
+generator and the frontends) imported once, so they start warm, and a
+failing or crashing model does not affect the others.
+
+Manifest (yaml)::
+
+  defaults:                 # optional, applied to all models
+    transform_methods: dropout|>quantize|>inline|>refcnt
+  models:
+    - model: mlp/simple_mnist.pb
+      output_nodes: y_pred
+    - model: cnn/cifar10_cnn.pb
+      output_nodes: [fully_connect_2/logits]
+      input_shapes: {input_x: [1, 32, 32, 3]}
+      output: cifar.cpp
+
+The keys of a model are the options of `utensor-cli convert`, with
+`model` for the model file, and `cwd` sets the working directory of the
+conversion. The paths of `model` and `cwd` are relative to the manifest
+file, all other paths are relative to the working directory as with
+`utensor-cli convert`.
+"""
+import os
+import sys
+import time
+import traceback
+from collections import deque
+from multiprocessing import (connection, forkserver, get_all_start_methods,
+                             get_context)
+
+import attr
+import click
+
+from utensor_cgen.params import NArgsKwargsParam, NArgsParam, TensorShapesParam
+
+__all__ = ['ConvertJob', 'JobResult', 'DEFAULT_TRANSFORM_METHODS',
+           'make_job', 'load_manifest', 'preload', 'run_jobs', 'format_summary']
+
+DEFAULT_TRANSFORM_METHODS = 'dropout|>quantize|>inline|>biasAdd|>remove_id_op|>dedup_weights|>refcnt'
+
+
+def _model_name(path):
+  return os.path.basename(os.path.splitext(path)[0])
+
+
+@attr.s
+class ConvertJob(object):
+  """Options of converting a model, same as `utensor-cli convert`
+  """
+  model_file = attr.ib()
+  output_nodes = attr.ib()
+  output = attr.ib(default=None)
+  data_dir = attr.ib(default=None)
+  embed_data_dir = attr.ib(default=None)
+  model_dir = attr.ib(default='models')
+  transform_methods = attr.ib(default=None)
+  save_graph = attr.ib(default=False)
+  debug_comment = attr.ib(default=False)
+  input_shapes = attr.ib(default=None)
+  log_stats = attr.ib(default=False)
+  weight_shards = attr.ib(default=None)
+  weight_format = attr.ib(default='c')
+  weight_placement = attr.ib(default=None)
+  # working directory of the conversion, the current one if None
+  cwd = attr.ib(default=None)
+
+  def __attrs_post_init__(self):
+    if self.model_file is None:
+      raise ValueError("No pb file given")
+    if self.data_dir is None:
+      self.data_dir = os.path.join("constants", _model_name(self.model_file))
+    if self.output is None:
+      self.output = "{}.cpp".format(_model_name(self.model_file))
+    if self.embed_data_dir is None:
+      self.embed_data_dir = os.path.join("/fs", self.data_dir)
+    if self.transform_methods is None:
+      self.transform_methods = _parse_transform_methods(DEFAULT_TRANSFORM_METHODS)
+
+  @property
+  def name(self):
+    return _model_name(self.output)
+
+  @property
+  def model_path(self):
+    return os.path.join(self.model_dir, self.output)
+
+  def run(self):
+    from utensor_cgen.backend import CodeGenerator
+
+    if self.cwd is not None:
+      os.chdir(self.cwd)
+    if not os.path.exists(self.model_dir):
+      os.makedirs(self.model_dir)
+    generator = CodeGenerator(self.model_file, self.data_dir, self.embed_data_dir,
+                              self.transform_methods, self.output_nodes,
+                              self.save_graph, self.debug_comment,
+                              input_shapes=self.input_shapes,
+                              log_stats=self.log_stats,
+                              weight_shards=self.weight_shards,
+                              weight_format=self.weight_format,
+                              weight_placement=self.weight_placement)
+    generator.generate(self.model_path)
+
+
+@attr.s
+class JobResult(object):
+  """
+  name : str
+  seconds : float, wall time of the conversion
+  error : str, the traceback if the conversion failed, None otherwise
+  """
+  name = attr.ib()
+  seconds = attr.ib()
+  error = attr.ib(default=None)
+
+  @property
+  def ok(self):
+    return self.error is None
+
+
+def _parse_transform_methods(value):
+  if isinstance(value, (list, tuple)):
+    value = '|>'.join(value)
+  # the option is needed for the `+METHOD`/`-METHOD` syntax
+  option = click.Option(['--transform-methods'], default=DEFAULT_TRANSFORM_METHODS)
+  return NArgsKwargsParam(sep='|>').convert(value, option, None)
+
+
+def _parse_output_nodes(value):
+  if isinstance(value, (list, tuple)):
+    value = ','.join(value)
+  # no default, the `+NODE`/`-NODE` syntax is rejected
+  output_nodes = [node for node in NArgsParam().convert(value, None, None) if node]
+  if not output_nodes:
+    raise ValueError('no output nodes given')
+  return output_nodes
+
+
+def _parse_weight_placement(value):
+  from utensor_cgen.backend.placement import WeightPlacement
+
+  if isinstance(value, WeightPlacement):
+    return value
+  if not isinstance(value, dict):
+    raise ValueError('weight_placement should be a mapping, get {!r}'.format(value))
+  return WeightPlacement.from_dict(value)
+
+
+_OPTION_PARSERS = {
+  'output_nodes': _parse_output_nodes,
+  'transform_methods': _parse_transform_methods,
+  'weight_placement': _parse_weight_placement,
+  'input_shapes': lambda value: TensorShapesParam().convert(value, None, None),
+}
+
+
+_JOB_OPTIONS = set(field.name for field in attr.fields(ConvertJob)) - {'model_file'}
+
+
+def make_job(entry, base_dir):
+  """Make a ConvertJob from a manifest entry
+
+  `model` and `cwd` of the entry are relative to `base_dir`
+  """
+  kwargs = {}
+  for key, value in entry.items():
+    key = key.replace('-', '_')
+    if key == 'model':
+      key = 'model_file'
+      value = os.path.join(base_dir, value)
+    elif key == 'cwd':
+      value = os.path.join(base_dir, value)
+    elif key not in _JOB_OPTIONS:
+      raise ValueError('unknown option: {}'.format(key))
+    if key in _OPTION_PARSERS and value is not None:
+      try:
+        value = _OPTION_PARSERS[key](value)
+      except (ValueError, TypeError, click.BadParameter) as error:
+        raise ValueError('{}: {}'.format(key, error))
+    kwargs[key] = value
+  if 'model_file' not in kwargs:
+    raise ValueError('model file not given')
+  if 'output_nodes' not in kwargs:
+    raise ValueError('output nodes not given: {}'.format(kwargs['model_file']))
+  return ConvertJob(**kwargs)
+
+
+def load_manifest(path):
+  """Read the jobs of the manifest, see the module docstring for the format
+
+  Return
+  ------
+  jobs : list of ConvertJob
+  """
+  import yaml
+
+  with open(path) as fid:
+    manifest = yaml.safe_load(fid) or {}
+  if not isinstance(manifest, dict) or not isinstance(manifest.get('models', None), list):
+    raise ValueError('{}: expecting a mapping with a list of models'.format(path))
+  defaults = manifest.get('defaults', None) or {}
+  manifest_dir = os.path.dirname(os.path.abspath(path))
+  jobs = []
+  for i, model in enumerate(manifest['models']):
+    entry = dict(defaults)
+    entry.update(model)
+    try:
+      jobs.append(make_job(entry, manifest_dir))
+    except ValueError as error:
+      raise ValueError('{}: model #{}: {}'.format(path, i, error))
+  seen = {}
+  for job in jobs:
+    if job.model_path in seen:
+      raise ValueError('{}: {} and {} are both converted to {}'.format(
+        path, seen[job.model_path], job.model_file, job.model_path
+      ))
+    seen[job.model_path] = job.model_file
+  return jobs
+
+
+def _run_job(job):
+  start = time.time()
+  error = None
+  try:
+    job.run()
+  except Exception:
+    error = traceback.format_exc()
+  return JobResult(name=job.name, seconds=time.time() - start, error=error)
+
+
+def _worker(job, conn, log_dir):
+  if log_dir is not None:
+    # redirect at file descriptor level to catch the logs of tensorflow as well
+    sys.stdout.flush()
+    sys.stderr.flush()
+    log_fd = os.open(os.path.join(log_dir, '{}.log'.format(job.name)),
+                     os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    os.dup2(log_fd, 1)
+    os.dup2(log_fd, 2)
+    os.close(log_fd)
+  result = _run_job(job)
+  sys.stdout.flush()
+  sys.stderr.flush()
+  conn.send(result)
+  conn.close()
+
+
+def _get_mp_context():
+  if 'forkserver' not in get_all_start_methods():
+    # the workers import everything themselves
+    return get_context('spawn')
+  from utensor_cgen.frontend import FrontendSelector
+
+  mp_context = get_context('forkserver')
+  mp_context.set_forkserver_preload(
+    ['utensor_cgen.backend', 'utensor_cgen.backend.snippets.template_env'] +
+    FrontendSelector.parser_modules()
+  )
+  return mp_context
+
+
+def preload():
+  """Start the server process of the workers, which imports the code
+  generator and the frontends, so the first job starts warm as well
+
+  It is started by `run_jobs` otherwise
+  """
+  mp_context = _get_mp_context()
+  if mp_context.get_start_method() == 'forkserver':
+    forkserver.ensure_running()
+
+
+def run_jobs(jobs, num_workers=None, log_dir=None, callback=None):
+  """Run the conversion jobs in parallel
+
+  Relative paths of a job without `cwd` are relative to the current
+  working directory.
+
+  Parameters
+  ----------
+  jobs : list of ConvertJob
+  num_workers : int
+      number of worker processes, defaults to the number of cpus
+  log_dir : str
+      if given, the outputs of each job are written to
+      `log_dir/<name>.log` instead of the standard output
+  callback : callable
+      `callback(result)` is called once a job is done
+
+  Return
+  ------
+  results : list of JobResult, in the order of `jobs`
+  """
+  if num_workers is None:
+    num_workers = os.cpu_count() or 1
+  if log_dir is not None and not os.path.exists(log_dir):
+    os.makedirs(log_dir)
+  mp_context = _get_mp_context()
+  pending = deque(enumerate(jobs))
+  running = {}
+  results = [None] * len(jobs)
+  while pending or running:
+    while pending and len(running) < num_workers:
+      idx, job = pending.popleft()
+      if job.cwd is None:
+        job = attr.evolve(job, cwd=os.getcwd())
+      recv_conn, send_conn = mp_context.Pipe(duplex=False)
+      process = mp_context.Process(target=_worker, args=(job, send_conn, log_dir))
+      process.start()
+      send_conn.close()
+      running[recv_conn] = (idx, job, process, time.time())
+    for conn in connection.wait(list(running)):
+      idx, job, process, start = running.pop(conn)
+      try:
+        result = conn.recv()
+      except EOFError:
+        # the worker died without sending the result
+        result = None
+      conn.close()
+      process.join()
+      if result is None:
+        result = JobResult(name=job.name,
+                           seconds=time.time() - start,
+                           error='worker exited with code {}'.format(process.exitcode))
+      results[idx] = result
+      if callback is not None:
+        callback(result)
+  return results
+
+
+def format_summary(results, wall_seconds, num_workers):
+  """Format the results as a text table
+  """
+  tmpl = '{:<40} {:<8} {:>10}'
+  lines = [tmpl.format('model', 'status', 'seconds')]
+  for result in results:
+    lines.append(tmpl.format(result.name,
+                             'ok' if result.ok else 'FAILED',
+                             '{:.2f}'.format(result.seconds)))
+  num_failed = sum(1 for result in results if not result.ok)
+  lines.append('')
+  lines.append(
+    '{} model(s), {} ok, {} failed, {:.2f}s wall time, '
+    '{:.2f}s total conversion time ({} worker(s))'.format(
+      len(results), len(results) - num_failed, num_failed, wall_seconds,
+      sum(result.seconds for result in results), num_workers
+    )
+  )
+  return '\n'.join(lines)
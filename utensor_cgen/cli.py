@@ -5,12 +5,11 @@ import sys
 import click
 import pkg_resources
 
-from .utils import NArgsParam, NArgsKwargsParam
+from .batch import DEFAULT_TRANSFORM_METHODS
+from .client import DEFAULT_SOCKET_PATH
+from .params import NArgsKwargsParam, NArgsParam, TensorShapesParam
 
 
-def _get_pb_model_name(path):
-  return os.path.basename(os.path.splitext(path)[0])
-
 @click.group(name='utensor-cli')
 @click.help_option('-h', '--help')
 @click.version_option((pkg_resources
@@ -46,7 +45,7 @@ def cli():
               help="list of output nodes")
 @click.option("--transform-methods",
               type=NArgsKwargsParam(sep='|>'),
-              default='dropout|>quantize|>inline|>biasAdd|>remove_id_op|>refcnt',
+              default=DEFAULT_TRANSFORM_METHODS,
               help='optimization pipeline',
               metavar='METHOD[|>METHOD|>...]',
               show_default=True)
@@ -57,90 +56,364 @@ def cli():
               show_default=True)
 @click.option("--save-graph",
               is_flag=True,
-              help="save transformed graph")
+              help="save transformed graph as quant_MODEL.utg")
+@click.option("--input-shapes",
+              type=TensorShapesParam(),
+              metavar="NAME=DIM,DIM,...[;NAME=...]",
+              help=("shapes of the input placeholders, "
+                    "shape inference (infer_shape) is run with them if given"))
+@click.option("--log-stats",
+              is_flag=True,
+              help="log the graph statistics before and after each transformation")
+@click.option("--weight-shards",
+              type=click.IntRange(min=1),
+              metavar="N",
+              help=("define the inline weights in N source files (MODEL_weight_<i>.cpp) "
+                    "of roughly equal size, declared in MODEL_weight.hpp, "
+                    "so they can be compiled in parallel"))
+@click.option("--weight-format",
+              type=click.Choice(['c', 'incbin']),
+              default='c',
+              help=("how the inline weights are defined: c initializer lists, "
+                    "or raw data files (MODEL_weights/*.bin) included by "
+                    "an assembly source (MODEL_weight.S) with .incbin"),
+              show_default=True)
+@click.option("--weight-align",
+              type=int,
+              metavar="N",
+              help="alignment of the inline weights in bytes (a power of 2)")
+@click.option("--weight-section", "weight_sections",
+              multiple=True,
+              metavar="[REGEX=]SECTION",
+              help=("linker section of the inline weights with names matching REGEX, "
+                    "or of all the others without REGEX (can be repeated)"))
+@click.option("--hot-weight-section",
+              metavar="SECTION",
+              help=("linker section of the hot inline weights, "
+                    "see --hot-weight-max-bytes and --hot-weight-min-refs"))
+@click.option("--hot-weight-max-bytes",
+              type=int,
+              metavar="N",
+              help="inline weights of at most N bytes are hot")
+@click.option("--hot-weight-min-refs",
+              type=int,
+              metavar="N",
+              help="inline weights read by at least N ops are hot")
 def convert_graph(pb_file, output, data_dir, embed_data_dir, save_graph,
-                  debug_comment, output_nodes, transform_methods, model_dir):
-  from utensor_cgen.backend import CodeGenerator
+                  debug_comment, output_nodes, transform_methods, model_dir,
+                  input_shapes, log_stats, weight_shards, weight_format,
+                  weight_align, weight_sections, hot_weight_section,
+                  hot_weight_max_bytes, hot_weight_min_refs):
+  from utensor_cgen.backend.placement import WeightPlacement
+  from utensor_cgen.batch import ConvertJob
 
-  if pb_file is None:
-    raise ValueError("No pb file given")
+  weight_placement = None
+  if weight_align or weight_sections or hot_weight_section:
+    try:
+      weight_placement = WeightPlacement(alignment=weight_align,
+                                         sections=list(weight_sections),
+                                         hot_section=hot_weight_section,
+                                         hot_max_bytes=hot_weight_max_bytes,
+                                         hot_min_refs=hot_weight_min_refs)
+    except ValueError as error:
+      raise click.UsageError(str(error))
+  # TODO: pass transformation kwargs to codegenerator (better argument parser)
+  job = ConvertJob(pb_file, output_nodes,
+                   output=output,
+                   data_dir=data_dir,
+                   embed_data_dir=embed_data_dir,
+                   model_dir=model_dir,
+                   transform_methods=transform_methods,
+                   save_graph=save_graph,
+                   debug_comment=debug_comment,
+                   input_shapes=input_shapes,
+                   log_stats=log_stats,
+                   weight_shards=weight_shards,
+                   weight_format=weight_format,
+                   weight_placement=weight_placement)
+  job.run()
 
-  if not os.path.exists(model_dir):
-    os.makedirs(model_dir)
-  # MODEL should default to pb_file
-  if data_dir is None:
-    data_dir = os.path.join("constants", _get_pb_model_name(pb_file))
 
-  if output is None:
-    output =  "{}.cpp".format(_get_pb_model_name(pb_file))
-  model_path = os.path.join(model_dir, output)
+@cli.command(name='convert-batch', help='convert the models listed in MANIFEST.yaml in parallel')
+@click.help_option('-h', '--help')
+@click.argument('manifest', required=True, metavar='MANIFEST.yaml')
+@click.option('-j', '--jobs', 'num_workers', type=int, metavar='N',
+              help='number of worker processes (default: number of cpus)')
+@click.option('--log-dir', metavar='DIR',
+              help='write the logs of each model to DIR/MODEL.log')
+def convert_batch(manifest, num_workers, log_dir):
+  import time
+  from utensor_cgen.batch import format_summary, load_manifest, run_jobs
 
-  if embed_data_dir is None:
-    embed_data_dir = os.path.join("/fs", data_dir)
-  # TODO: pass transformation kwargs to codegenerator (better argument parser)
-  generator = CodeGenerator(pb_file, data_dir, embed_data_dir,
-                            transform_methods, output_nodes,
-                            save_graph, debug_comment)
-  generator.generate(model_path)
+  try:
+    jobs = load_manifest(manifest)
+  except ValueError as error:
+    raise click.BadParameter(str(error), param_hint='MANIFEST.yaml')
+  if num_workers is None:
+    num_workers = os.cpu_count() or 1
+  num_done = [0]
+
+  def report(result):
+    num_done[0] += 1
+    click.echo('[{}/{}] {}: {} ({:.2f}s)'.format(
+      num_done[0], len(jobs), result.name,
+      'ok' if result.ok else 'FAILED', result.seconds
+    ))
+
+  start = time.time()
+  results = run_jobs(jobs, num_workers=num_workers, log_dir=log_dir, callback=report)
+  wall_seconds = time.time() - start
+  for result in results:
+    if not result.ok:
+      click.echo('\n{} failed:\n{}'.format(result.name, result.error), err=True)
+  click.echo('')
+  click.echo(format_summary(results, wall_seconds, num_workers))
+  if not all(result.ok for result in results):
+    sys.exit(1)
+
+
+@cli.command(name='serve', help='serve conversion jobs over JSON-RPC, keeping everything loaded')
+@click.help_option('-h', '--help')
+@click.option('--socket', 'socket_path', metavar='PATH',
+              help='path of the unix socket to listen on (default: {})'.format(DEFAULT_SOCKET_PATH))
+@click.option('--stdio', is_flag=True,
+              help='serve on stdin/stdout instead of a unix socket')
+def serve(socket_path, stdio):
+  from utensor_cgen.server import ConversionServer
+
+  server = ConversionServer()
+  if stdio:
+    server.serve_stdio()
+  else:
+    server.serve_unix(socket_path or DEFAULT_SOCKET_PATH)
+
+
+@cli.command(name='stats', help='show MACs/FLOPs, parameter bytes and activation bytes of the graph')
+@click.help_option('-h', '--help')
+@click.argument('model_file', required=True, metavar='MODEL.{pb,utg}')
+@click.option("--output-nodes",
+              type=NArgsParam(),
+              metavar="NODE_NAME,NODE_NAME,...",
+              help="list of output nodes (default: the nodes without consumers)")
+@click.option("--transform-methods",
+              type=NArgsKwargsParam(sep='|>'),
+              metavar='METHOD[|>METHOD|>...]',
+              help='transform the graph before computing the statistics')
+@click.option('--per-op', is_flag=True,
+              help='show the statistics of each op')
+@click.option('--format', 'output_format', default='text',
+              type=click.Choice(['text', 'json']),
+              help='output format',
+              show_default=True)
+def show_stats(model_file, output_nodes, transform_methods, per_op, output_format):
+  import json
+  from utensor_cgen.frontend import FrontendSelector
+  from utensor_cgen.transformer.pipline import TransformerPipeline
+  from utensor_cgen.transformer.stats import format_stats, graph_stats
+
+  _, ext = os.path.splitext(model_file)
+  parser_cls = FrontendSelector.select_parser(ext)
+  ugraph = parser_cls.parse(model_file, output_nodes)
+  if output_nodes is None and set(ugraph.output_nodes) == set(ugraph.ops_info):
+    # the parser made every node an output, whose tensors are never
+    # freed in the peak activation bytes
+    ugraph.output_nodes = _sink_nodes(ugraph)
+  if transform_methods:
+    ugraph = TransformerPipeline(transform_methods).transform(ugraph)
+  stats = graph_stats(ugraph)
+  if output_format == 'json':
+    stats_dict = stats.to_dict()
+    if not per_op:
+      del stats_dict['ops']
+    click.echo(json.dumps(stats_dict))
+  else:
+    click.echo(format_stats(stats, per_op=per_op))
+
+
+def _sink_nodes(ugraph):
+  consumed = set(
+    t_info.op_name
+    for op_info in ugraph.ops_info.values()
+    for t_info in op_info.input_tensors
+  )
+  return [name for name in ugraph.topo_order if name not in consumed]
 
 
 @cli.command(name='show', help='show node names in the pb file')
 @click.help_option('-h', '--help')
 @click.option('--oneline', is_flag=True,
               help='show in oneline format (no detail information)')
-@click.argument('model_file', required=True, metavar='MODEL.{pb,pkl}')
-def show_graph(model_file, **kwargs):
+@click.option('--stream', is_flag=True,
+              help=('read the nodes of the .pb file one by one instead of '
+                    'parsing the whole graph (nodes are shown in file order '
+                    'and output tensors are not available)'))
+@click.option('--op-type', type=NArgsParam(), metavar='OP_TYPE,OP_TYPE,...',
+              help='only show ops of given types')
+@click.option('--name-regex', metavar='REGEX',
+              help='only show ops with name matching the regular expression')
+@click.option('--limit', type=int, metavar='N',
+              help='show at most N ops')
+@click.option('--format', 'output_format', default='text',
+              type=click.Choice(['text', 'json', 'csv']),
+              help='output format, json is one object per line',
+              show_default=True)
+@click.argument('model_file', required=True, metavar='MODEL.{pb,utg,pkl}')
+def show_graph(model_file, oneline, stream, op_type, name_regex, limit, output_format):
   _, ext = os.path.splitext(model_file)
   if ext == '.pb':
-    _show_pb_file(model_file, **kwargs)
+    if stream:
+      records = _iter_pb_records(model_file)
+    else:
+      records = _iter_ugraph_records(_parse_pb_file(model_file))
+  elif ext == '.utg':
+    # read the metadata only, weights are never touched
+    records = _iter_utg_records(model_file)
   elif ext == '.pkl':
     import pickle
     with open(model_file, 'rb') as fid:
       ugraph = pickle.load(fid)
-    _show_ugraph(ugraph, **kwargs)
+    records = _iter_ugraph_records(ugraph)
   else:
     msg = click.style('unknown file extension: {}'.format(ext), fg='red', bold=True)
     click.echo(msg, file=sys.stderr)
+    sys.exit(1)
+  records = _filter_records(records, op_type, name_regex, limit)
+  writer = {
+    'text': _write_text,
+    'json': _write_json,
+    'csv': _write_csv,
+  }[output_format]
+  writer(records, oneline=oneline)
 
-def _show_pb_file(pb_file, **kwargs):
-  import tensorflow as tf
+def _parse_pb_file(pb_file):
   from utensor_cgen.frontend.tensorflow import GraphDefParser
 
-  ugraph = GraphDefParser.parse(pb_file)
-  _show_ugraph(ugraph, **kwargs)
+  return GraphDefParser.parse(pb_file)
+
+def _tensor_record(name, dtype=None, shape=None):
+  return {'name': name, 'dtype': dtype, 'shape': shape}
+
+def _iter_pb_records(pb_file):
+  # protobuf only, tensorflow is not imported
+  from utensor_cgen.frontend._node_defs import iter_node_defs
+
+  for node in iter_node_defs(pb_file):
+    yield {
+      'name': node.name,
+      'op_type': node.op,
+      'inputs': [_tensor_record(name) for name in node.input],
+      'outputs': None,
+    }
+
+def _iter_utg_records(utg_file):
+  import numpy as np
+  from utensor_cgen.ir.serialize import load_graph_meta
+
+  def tensor_record(name, op_name, dtype, shape):
+    if isinstance(dtype, list):
+      # structured dtype
+      dtype = [tuple(field) for field in dtype]
+    return _tensor_record(name, np.dtype(dtype).name, shape)
+
+  for op in load_graph_meta(utg_file)['ops']:
+    yield {
+      'name': op['name'],
+      'op_type': op['op_type'],
+      'inputs': [tensor_record(*tensor) for tensor in op['inputs']],
+      'outputs': [tensor_record(*tensor) for tensor in op['outputs']],
+    }
 
-def _show_ugraph(ugraph, oneline=False):
+def _iter_ugraph_records(ugraph):
+  def tensor_record(t_info):
+    return _tensor_record(t_info.name, t_info.dtype.name, t_info.shape)
+
+  for op_name in ugraph.topo_order:
+    op_info = ugraph.ops_info[op_name]
+    yield {
+      'name': op_name,
+      'op_type': op_info.op_type,
+      'inputs': [tensor_record(t_info) for t_info in op_info.input_tensors],
+      'outputs': [tensor_record(t_info) for t_info in op_info.output_tensors],
+    }
+
+def _filter_records(records, op_types=None, name_regex=None, limit=None):
+  import re
+
+  pattern = re.compile(name_regex) if name_regex else None
+  if limit is not None and limit <= 0:
+    return
+  count = 0
+  for record in records:
+    if op_types and record['op_type'] not in op_types:
+      continue
+    if pattern and not pattern.search(record['name']):
+      continue
+    yield record
+    count += 1
+    if limit is not None and count >= limit:
+      # stop reading the model file
+      return
+
+def _tensor_names(tensors):
+  if tensors is None:
+    return None
+  return [tensor['name'] for tensor in tensors]
+
+def _write_text(records, oneline=False):
   import textwrap
+
   if oneline:
     tmpl = click.style("{op_name} ", fg='yellow', bold=True) + \
       "op_type: {op_type}, inputs: {inputs}, outputs: {outputs}"
-    for op_name in ugraph.topo_order:
-      op_info = ugraph.ops_info[op_name]
-      msg = tmpl.format(op_name=op_name, op_type=op_info.op_type,
-                        inputs=[tensor.name for tensor in op_info.input_tensors],
-                        outputs=[tensor.name for tensor in op_info.output_tensors])
+    for record in records:
+      outputs = _tensor_names(record['outputs'])
+      msg = tmpl.format(op_name=record['name'],
+                        op_type=record['op_type'],
+                        inputs=_tensor_names(record['inputs']),
+                        outputs='unknown' if outputs is None else outputs)
       click.echo(msg)
-  else:
-    tmpl = click.style('op_name: {op_name}\n', fg='yellow', bold=True) + \
-    '''\
-      op_type: {op_type}
-      input(s):
-        {inputs}
-      ouptut(s):
-        {outputs}
-    '''
-    tmpl = textwrap.dedent(tmpl)
-    paragraphs = []
-    for op_name in ugraph.topo_order:
-      op_info = ugraph.ops_info[op_name]
-      op_str = tmpl.format(
-        op_name=op_name,
-        op_type=op_info.op_type,
-        inputs=op_info.input_tensors,
-        outputs=op_info.output_tensors)
-      paragraphs.append(op_str)
-    click.echo('\n'.join(paragraphs))
-  return 0
+    return
+  tmpl = click.style('op_name: {op_name}\n', fg='yellow', bold=True) + \
+  '''\
+    op_type: {op_type}
+    input(s):
+      {inputs}
+    output(s):
+      {outputs}
+  '''
+  tmpl = textwrap.dedent(tmpl)
+  def format_tensors(tensors):
+    if tensors is None:
+      return 'unknown'
+    lines = []
+    for tensor in tensors:
+      if tensor['dtype'] is None:
+        lines.append(tensor['name'])
+      else:
+        lines.append('{name}: {dtype} {shape}'.format(**tensor))
+    return '\n      '.join(lines)
+  for record in records:
+    click.echo(tmpl.format(op_name=record['name'],
+                           op_type=record['op_type'],
+                           inputs=format_tensors(record['inputs']),
+                           outputs=format_tensors(record['outputs'])))
+
+def _write_json(records, **kwargs):
+  import json
+
+  for record in records:
+    click.echo(json.dumps(record))
+
+def _write_csv(records, **kwargs):
+  import csv
+
+  writer = csv.writer(click.get_text_stream('stdout'), lineterminator='\n')
+  writer.writerow(['name', 'op_type', 'inputs', 'outputs'])
+  for record in records:
+    outputs = _tensor_names(record['outputs'])
+    writer.writerow([record['name'], record['op_type'],
+                     ';'.join(_tensor_names(record['inputs'])),
+                     '' if outputs is None else ';'.join(outputs)])
 
 if __name__ == '__main__':
   cli()
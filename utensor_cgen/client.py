@@ -0,0 +1,152 @@
+# -*- coding:utf8 -*-
+r"""Thin Client of the Conversion Server
+
+Send conversion jobs to `utensor-cli serve` over its unix socket. Only
+the standard library is imported, so a conversion takes milliseconds
+once the server is warm.
+
+Usage
+-----
+    utensor-client MODEL.pb --output-nodes NODE[,NODE...] [--socket PATH]
+        [other options of utensor-cli convert]
+
+or from python::
+
+  from utensor_cgen.client import ConversionClient
+  result = ConversionClient().convert('model.pb', output_nodes='y_pred')
+"""
+import argparse
+import itertools
+import json
+import os
+import socket
+import sys
+import tempfile
+
+__all__ = ['ConversionClient', 'RPCError', 'DEFAULT_SOCKET_PATH']
+
+DEFAULT_SOCKET_PATH = os.environ.get(
+  'UTENSOR_SERVER_SOCKET',
+  os.path.join(tempfile.gettempdir(), 'utensor-cli-{}.sock'.format(os.getuid()))
+)
+
+
+class RPCError(Exception):
+  """Error response of the server
+  """
+
+  def __init__(self, code, message, data=None):
+    super(RPCError, self).__init__('{} ({})'.format(message, code))
+    self.code = code
+    self.message = message
+    self.data = data
+
+
+class ConversionClient(object):
+  """JSON-RPC client of `utensor-cli serve`
+  """
+
+  def __init__(self, socket_path=None):
+    self.socket_path = socket_path or DEFAULT_SOCKET_PATH
+    self._ids = itertools.count(1)
+    self._sock = None
+    self._fid = None
+
+  def connect(self):
+    if self._sock is None:
+      self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+      self._sock.connect(self.socket_path)
+      self._fid = self._sock.makefile('rwb')
+    return self
+
+  def close(self):
+    if self._sock is not None:
+      self._fid.close()
+      self._sock.close()
+      self._sock = self._fid = None
+
+  def __enter__(self):
+    return self.connect()
+
+  def __exit__(self, *args):
+    self.close()
+
+  def call(self, method, **params):
+    """Call the method on the server and return the result
+
+    Raise RPCError if the server responds with an error
+    """
+    self.connect()
+    request = {'jsonrpc': '2.0', 'id': next(self._ids), 'method': method, 'params': params}
+    self._fid.write(json.dumps(request).encode('utf8') + b'\n')
+    self._fid.flush()
+    line = self._fid.readline()
+    if not line:
+      raise RPCError(-32000, 'connection closed by the server')
+    response = json.loads(line.decode('utf8'))
+    if 'error' in response:
+      error = response['error']
+      raise RPCError(error['code'], error['message'], error.get('data', None))
+    return response['result']
+
+  def convert(self, model, output_nodes, cwd=None, **options):
+    """Convert the model, see the options of `utensor-cli convert`
+
+    Relative paths are relative to `cwd`, the current working directory
+    of the client by default
+
+    Return
+    ------
+    result : dict
+        with keys `name`, `model_path`, `seconds` and `log`
+    """
+    return self.call('convert',
+                     model=model,
+                     output_nodes=output_nodes,
+                     cwd=cwd or os.getcwd(),
+                     **options)
+
+
+def main(argv=None):
+  parser = argparse.ArgumentParser(description='convert a model with utensor-cli serve')
+  parser.add_argument('model', metavar='MODEL.pb')
+  parser.add_argument('--socket', default=DEFAULT_SOCKET_PATH,
+                      help='socket of the server (default: %(default)s)')
+  parser.add_argument('--output-nodes', required=True, metavar='NODE_NAME,NODE_NAME,...')
+  parser.add_argument('--transform-methods', metavar='METHOD[|>METHOD|>...]')
+  parser.add_argument('-o', '--output', metavar='FILE.cpp')
+  parser.add_argument('-d', '--data-dir', metavar='DIR')
+  parser.add_argument('-D', '--embed-data-dir', metavar='EMBED_DIR')
+  parser.add_argument('-m', '--model-dir', metavar='DIR')
+  parser.add_argument('--input-shapes', metavar='NAME=DIM,DIM,...[;NAME=...]')
+  parser.add_argument('--save-graph', action='store_true')
+  parser.add_argument('--debug-comment', action='store_true')
+  parser.add_argument('--log-stats', action='store_true')
+  parser.add_argument('--weight-shards', type=int, metavar='N')
+  parser.add_argument('--weight-format', choices=['c', 'incbin'])
+  parser.add_argument('-v', '--verbose', action='store_true',
+                      help='print the log of the conversion')
+  args = parser.parse_args(argv)
+  options = dict((key, value) for key, value in vars(args).items()
+                 if value not in (None, False) and
+                 key not in ('model', 'socket', 'output_nodes', 'verbose'))
+  try:
+    with ConversionClient(args.socket) as client:
+      result = client.convert(args.model, args.output_nodes, **options)
+  except RPCError as error:
+    data = error.data or {}
+    sys.stderr.write(data.get('log', ''))
+    sys.stderr.write(data.get('traceback', ''))
+    sys.stderr.write('{}\n'.format(error))
+    return 1
+  except (OSError, socket.error) as error:
+    sys.stderr.write('can not connect to {}: {}\n'.format(args.socket, error))
+    return 1
+  if args.verbose:
+    sys.stderr.write(result['log'])
+  print(result['model_path'])
+  return 0
+
+
+if __name__ == '__main__':
+  sys.exit(main())
@@ -40,13 +40,47 @@ def bs_ops_attr(np_array):
                                          )
   return op_attr
 
-def transpose_offline(op_info):
-  #FIXME: might need to use deep copy on this one
+def transpose_offline(op_info, perm=None):
+  """ Transpose the value of a Const op, reversing the axes by default as numpy
+  does, for example perm=(3, 0, 1, 2) for conv kernels from HWIO to OHWI
+
+  The value and the tensor infos are replaced, not modified in place, so arrays
+  and shape lists shared with other ops or graphs are left untouched
+  """
+  ugraph = op_info.ugraph
+  generic_value = op_info.op_attr['value'].value
+  value = generic_value.np_array
+  if perm is None:
+    perm = tuple(range(value.ndim))[::-1]
+  transposed_value = np.transpose(value, perm)
   out_tensor_info = op_info.output_tensors[0]
-  out_tensor_info.shape.reverse()
-  transposed_value = op_info.op_attr['value'].value.np_array.transpose()
-  op_info.op_attr['value'].value.np_array = transposed_value
-  op_info.output_tensors[0] = out_tensor_info
+  new_shape = None
+  if out_tensor_info.shape is not None:
+    new_shape = [out_tensor_info.shape[axis] for axis in perm]
+  op_info.op_attr['value'] = AttrValueConverter.GenericType(
+    value_name='tensor',
+    value=GenericTensorConverterMixin.GenericType(np_array=transposed_value,
+                                                  dtype=generic_value.dtype)
+  )
+  op_info.output_tensors = [
+    TensorInfo.make_unchecked(name=out_tensor_info.name,
+                              op_name=out_tensor_info.op_name,
+                              dtype=out_tensor_info.dtype,
+                              shape=new_shape,
+                              ugraph=ugraph)
+  ] + op_info.output_tensors[1:]
+  for consumer in op_info.output_nodes:
+    consumer.input_tensors = [
+      TensorInfo.make_unchecked(name=t_info.name,
+                                op_name=t_info.op_name,
+                                dtype=t_info.dtype,
+                                shape=list(new_shape) if new_shape is not None else None,
+                                ugraph=t_info.ugraph)
+      if t_info.name == out_tensor_info.name else t_info
+      for t_info in consumer.input_tensors
+    ]
+    ugraph.mark_dirty(consumer.name)
+  ugraph.mark_dirty(op_info.name)
 
   return op_info
 
@@ -37,11 +37,21 @@ class FrontendSelector(object):
     """
     if cls._setuped:
       return
+    for mod_name in cls.parser_modules():
+      importlib.import_module(mod_name)
+    cls._setuped = True
+
+  @classmethod
+  def parser_modules(cls):
+    """
+    Names of the modules under `utensor_cgen.frontend` with the parsers
+    """
     root_dir = os.path.dirname(__file__)
     _, _, files = next(os.walk(root_dir))
-    for file in files:
+    mod_names = []
+    for file in sorted(files):
       fname, ext = os.path.splitext(file)
-      if fname not in ['__init__', 'base'] and ext == ".py":
-        mod_name = 'utensor_cgen.frontend.%s' % fname
-        importlib.import_module(mod_name)
-    cls._setuped = True
+      # private modules (such as `_node_defs`) have no parsers
+      if not fname.startswith('_') and fname != 'base' and ext == ".py":
+        mod_names.append('utensor_cgen.frontend.%s' % fname)
+    return mod_names
@@ -0,0 +1,100 @@
+r"""Streaming reader of binary GraphDef files
+
+Only protobuf is imported, so the nodes of a model can be listed
+without the import cost of tensorflow (see `utensor-cli show --stream`).
+`GraphDefParser.iter_node_defs` decodes the same records into the
+complete `NodeDef` of tensorflow.
+"""
+import os
+
+from google.protobuf import (descriptor_pb2, descriptor_pool,
+                             message_factory)
+
+__all__ = ['iter_node_def_records', 'iter_node_defs', 'NodeDef']
+
+
+def _make_node_def_cls():
+  """A `NodeDef` with the fields of `tensorflow.NodeDef` up to `device`
+
+  The `attr` map (field 5) and later fields are kept as unknown fields.
+  It lives in its own descriptor pool, so it does not clash with the
+  `tensorflow.NodeDef` registered once tensorflow is imported.
+  """
+  field_proto = descriptor_pb2.FieldDescriptorProto
+  file_proto = descriptor_pb2.FileDescriptorProto(name='utensor_cgen/node_def.proto',
+                                                  package='utensor_cgen',
+                                                  syntax='proto3')
+  msg_proto = file_proto.message_type.add(name='NodeDef')
+  for number, name, label in [(1, 'name', field_proto.LABEL_OPTIONAL),
+                              (2, 'op', field_proto.LABEL_OPTIONAL),
+                              (3, 'input', field_proto.LABEL_REPEATED),
+                              (4, 'device', field_proto.LABEL_OPTIONAL)]:
+    msg_proto.field.add(name=name,
+                        number=number,
+                        type=field_proto.TYPE_STRING,
+                        label=label)
+  pool = descriptor_pool.DescriptorPool()
+  pool.Add(file_proto)
+  msg_desc = pool.FindMessageTypeByName('utensor_cgen.NodeDef')
+  return message_factory.MessageFactory(pool).GetPrototype(msg_desc)
+
+NodeDef = _make_node_def_cls()
+
+
+def iter_node_defs(pb_file):
+  """Iterate the nodes of a binary GraphDef file in file order, as
+  `NodeDef` with the name, op, inputs and device only
+  """
+  for data in iter_node_def_records(pb_file):
+    yield NodeDef.FromString(data)
+
+
+def iter_node_def_records(pb_file):
+  """Iterate the serialized NodeDefs of a binary GraphDef file in file order
+
+  The file is read incrementally, one node at a time, so the whole
+  GraphDef is never loaded into memory. Fields other than `node`
+  (such as `versions` and `library`) are skipped.
+  """
+  with open(pb_file, 'rb') as fid:
+    while True:
+      key = _read_varint(fid)
+      if key is None:
+        return
+      field_number, wire_type = key >> 3, key & 0x7
+      if wire_type == 2:
+        # length-delimited
+        size = _read_varint(fid)
+        if field_number == 1:
+          data = fid.read(size)
+          if len(data) != size:
+            raise ValueError('truncated GraphDef file: %s' % pb_file)
+          yield data
+        else:
+          fid.seek(size, os.SEEK_CUR)
+      elif wire_type == 0:
+        _read_varint(fid)
+      elif wire_type == 1:
+        fid.seek(8, os.SEEK_CUR)
+      elif wire_type == 5:
+        fid.seek(4, os.SEEK_CUR)
+      else:
+        raise ValueError('unsupported wire type %s in %s' % (wire_type, pb_file))
+
+
+def _read_varint(fid):
+  """Read a protobuf varint, return None at the end of file
+  """
+  value = 0
+  shift = 0
+  while True:
+    byte = fid.read(1)
+    if not byte:
+      if shift:
+        raise ValueError('truncated varint')
+      return None
+    byte = ord(byte)
+    value |= (byte & 0x7f) << shift
+    if not byte & 0x80:
+      return value
+    shift += 7
@@ -5,7 +5,9 @@ import six
 import tensorflow as tf
 import numpy as np
 from google.protobuf import text_format
+from tensorflow.core.framework.node_def_pb2 import NodeDef
 
+from utensor_cgen.frontend._node_defs import iter_node_def_records
 from utensor_cgen.frontend.base import Parser
 from utensor_cgen.frontend import FrontendSelector
 from utensor_cgen.ir.base import TensorInfo, OperationInfo, uTensorGraph
@@ -31,32 +33,44 @@ class GraphDefParser(Parser):
                           backend="tensorflow")
     for node in graph_def.node:
       op = graph.get_operation_by_name(node.name)
-      in_tensors = [TensorInfo(name=tensor.name,
-                               ugraph=ugraph,
-                               op_name=tensor.op.name,
-                               dtype=np.dtype(tensor.dtype.as_numpy_dtype),
-                               shape=cls._tf_parse_tshape(tensor.shape))
+      # values from tf.Graph are trusted, skip the validators
+      in_tensors = [TensorInfo.make_unchecked(name=tensor.name,
+                                              ugraph=ugraph,
+                                              op_name=tensor.op.name,
+                                              dtype=np.dtype(tensor.dtype.as_numpy_dtype),
+                                              shape=cls._tf_parse_tshape(tensor.shape))
                     for tensor in op.inputs]
-      out_tensors = [TensorInfo(name=tensor.name,
-                                ugraph=ugraph,
-                                op_name=op.name,
-                                dtype=np.dtype(tensor.dtype.as_numpy_dtype),
-                                shape=cls._tf_parse_tshape(tensor.shape))
+      out_tensors = [TensorInfo.make_unchecked(name=tensor.name,
+                                               ugraph=ugraph,
+                                               op_name=op.name,
+                                               dtype=np.dtype(tensor.dtype.as_numpy_dtype),
+                                               shape=cls._tf_parse_tshape(tensor.shape))
                      for tensor in op.outputs]
       op_type = node.op
       op_attr = node.attr
-      op_info = OperationInfo(name=node.name,
-                              input_tensors=in_tensors,
-                              output_tensors=out_tensors,
-                              op_type=op_type,
-                              backend='tensorflow',
-                              op_attr=op_attr,
-                              ugraph=ugraph)
+      op_info = OperationInfo.make_unchecked(name=node.name,
+                                             input_tensors=in_tensors,
+                                             output_tensors=out_tensors,
+                                             op_type=op_type,
+                                             backend='tensorflow',
+                                             op_attr=op_attr,
+                                             ugraph=ugraph)
       op_info.op_attr['tensorflow__device'] = node.device
       ugraph.ops_info[node.name] = op_info
     topologic_order_graph(ugraph)
     return ugraph
 
+  @classmethod
+  def iter_node_defs(cls, pb_file):
+    """Iterate the NodeDefs of a binary GraphDef file in file order
+
+    The file is read incrementally, one node at a time, so the whole
+    GraphDef is never loaded into memory (see `_node_defs`, which also
+    decodes the nodes without tensorflow)
+    """
+    for data in iter_node_def_records(pb_file):
+      yield NodeDef.FromString(data)
+
   @staticmethod
   def _load_graph_def(pb_file):
     if isinstance(pb_file, tf.GraphDef):
@@ -0,0 +1,16 @@
+from utensor_cgen.frontend import FrontendSelector
+from utensor_cgen.frontend.base import Parser
+from utensor_cgen.ir.serialize import load_graph
+
+
+@FrontendSelector.register(target_exts=['.utg'])
+class UTensorGraphParser(Parser):
+  """Parser of graphs saved by `utensor_cgen.ir.serialize.save_graph`
+  """
+
+  @classmethod
+  def parse(cls, utg_file, output_nodes=None):
+    ugraph = load_graph(utg_file)
+    if output_nodes is not None:
+      ugraph.output_nodes = output_nodes
+    return ugraph
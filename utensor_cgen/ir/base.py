@@ -11,6 +11,7 @@ from attr.validators import instance_of
 from tensorflow.core.framework.attr_value_pb2 import AttrValue as _AttrValue
 from tensorflow.core.framework.attr_value_pb2 import (
     NameAttrList as _NameAttrList)
+from tensorflow.core.framework.node_def_pb2 import NodeDef as _NodeDef
 from tensorflow.core.framework.tensor_pb2 import TensorProto as _TensorProto
 from tensorflow.core.framework.tensor_shape_pb2 import (
     TensorShapeProto as _TensorShapeProto)
@@ -22,26 +23,181 @@ from .converter import AttrValueConverter, ConverterFactory
 
 __all__ = ['TensorInfo', 'OperationInfo', 'uTensorGraph']
 
+# op_attr keys saved as-is without type conversion
+_SKIP_ATTR_PATTERN = re.compile(r'_utensor_[^_]*')
+
+
+class _LazyAttrDict(dict):
+  """Dictionary of op attributes, converted to generic types on first access
+
+  Values of tf protobuf types are saved as-is and converted with
+  `ConverterFactory.get_generic_value` when they are read for the first
+  time. The converted values are memoized. Keys matching
+  `_SKIP_ATTR_PATTERN` and values set after construction are saved
+  without conversion.
+  Modifications of the dictionary, not including the conversions, bump
+  its `_version`.
+  """
+  __slots__ = ('_pending', '_version')
+
+  def __init__(self, values=None):
+    dict.__init__(self)
+    # keys of which the values are not converted yet
+    self._pending = set()
+    self._version = 0
+    if values is None:
+      return
+    if isinstance(values, _LazyAttrDict):
+      dict.update(self, dict.items(values))
+      self._pending.update(values._pending)
+      return
+    for key, value in values.items():
+      value_type = type(value)
+      if _SKIP_ATTR_PATTERN.match(key) or \
+        value_type in ConverterFactory._GENERIC2TF_MAP:
+        dict.__setitem__(self, key, value)
+      elif value_type in ConverterFactory._TF2GENERIC_MAP:
+        dict.__setitem__(self, key, value)
+        self._pending.add(key)
+      else:
+        # raise for unknown types as early as possible
+        dict.__setitem__(self, key, ConverterFactory.get_generic_value(value))
+
+  def _convert(self, key):
+    value = ConverterFactory.get_generic_value(dict.__getitem__(self, key))
+    dict.__setitem__(self, key, value)
+    self._pending.discard(key)
+    return value
+
+  def _convert_all(self):
+    for key in list(self._pending):
+      self._convert(key)
+
+  def is_converted(self, key):
+    return key not in self._pending
+
+  def get_raw(self, key):
+    """Return the value without conversion
+    """
+    return dict.__getitem__(self, key)
+
+  def __getitem__(self, key):
+    if key in self._pending:
+      return self._convert(key)
+    return dict.__getitem__(self, key)
+
+  def __setitem__(self, key, value):
+    self._pending.discard(key)
+    self._version += 1
+    dict.__setitem__(self, key, value)
+
+  def __delitem__(self, key):
+    self._pending.discard(key)
+    self._version += 1
+    dict.__delitem__(self, key)
+
+  def get(self, key, default=None):
+    if key in self:
+      return self[key]
+    return default
+
+  def pop(self, key, *default):
+    if key in self:
+      value = self[key]
+      del self[key]
+      return value
+    return dict.pop(self, key, *default)
+
+  def popitem(self):
+    self._convert_all()
+    self._version += 1
+    return dict.popitem(self)
+
+  def setdefault(self, key, default=None):
+    if key not in self:
+      self[key] = default
+    return self[key]
+
+  def update(self, *args, **kwargs):
+    for key, value in dict(*args, **kwargs).items():
+      self[key] = value
+
+  def values(self):
+    self._convert_all()
+    return dict.values(self)
+
+  def items(self):
+    self._convert_all()
+    return dict.items(self)
+
+  def copy(self):
+    return _LazyAttrDict(self)
+
+  __copy__ = copy
+
+  def __eq__(self, other):
+    self._convert_all()
+    if isinstance(other, _LazyAttrDict):
+      other._convert_all()
+    return dict.__eq__(self, other)
+
+  def __ne__(self, other):
+    return not self == other
+
+  __hash__ = None
+
+  def __repr__(self):
+    self._convert_all()
+    return dict.__repr__(self)
+
+  def __deepcopy__(self, memo):
+    new_dict = _LazyAttrDict()
+    for key in self:
+      value = dict.__getitem__(self, key)
+      if key in self._pending:
+        # raw values are never mutated, safe to share
+        dict.__setitem__(new_dict, key, value)
+      else:
+        dict.__setitem__(new_dict, key, deepcopy(value, memo))
+    new_dict._pending.update(self._pending)
+    return new_dict
+
+  def __reduce__(self):
+    return (_LazyAttrDict, (), (dict(dict.items(self)), set(self._pending)))
+
+  def __setstate__(self, state):
+    values, pending = state
+    dict.update(self, values)
+    self._pending = pending
+    self._version = 0
+
 
 class _NoShallowCopyMixin(object):
+  __slots__ = ()
 
   def __copy__(self):
     raise RuntimeError('shallow copy is not allowed for type %s' % type(self))
 
 
 class IRBase(object):
+  __slots__ = ()
 
   @property
   def all_supported_backends(self):
     return ['tensorflow']
 
 
-@attr.s
+@attr.s(slots=True)
 class TensorInfo(IRBase, _NoShallowCopyMixin):
   """
   name : str
   dtype : numpy.dtype
   shape : list
+
+  Note
+  ====
+  - use `TensorInfo.make_unchecked` to skip the validators when the
+    values are known to be valid, such as in parsers and copy routines
   """
   name = attr.ib(validator=instance_of(six.text_type))
   op_name = attr.ib(validator=instance_of(six.text_type))
@@ -53,7 +209,7 @@ class TensorInfo(IRBase, _NoShallowCopyMixin):
       for v in shape_values:
         assert isinstance(v, (int, type(None))), \
           "shape should be a list of integers"
-  ugraph = attr.ib()
+  ugraph = attr.ib(repr=False)
   @ugraph.validator
   def check(self, attrib, value):
     if not isinstance(value, uTensorGraph):
@@ -70,16 +226,45 @@ class TensorInfo(IRBase, _NoShallowCopyMixin):
       return True
     return op.is_dangling
 
+  @property
+  def size(self):
+    """Number of elements, unknown dimensions are counted as 1
+    """
+    if self.shape is None:
+      return None
+    return int(np.prod([d if d is not None else 1 for d in self.shape]))
+
+  @property
+  def nbytes(self):
+    size = self.size
+    if size is None:
+      return None
+    return size * self.dtype.itemsize
+
+  @classmethod
+  def make_unchecked(cls, name, op_name, dtype, shape, ugraph):
+    """Create a TensorInfo without running the validators
+
+    For trusted inputs only
+    """
+    t_info = object.__new__(cls)
+    t_info.name = name
+    t_info.op_name = op_name
+    t_info.dtype = dtype
+    t_info.shape = shape
+    t_info.ugraph = ugraph
+    return t_info
+
   def __deepcopy__(self, memo):
-    new_tensor = TensorInfo(name=self.name,
-                            ugraph=memo['ugraph'],
-                            op_name=self.op_name,
-                            dtype=self.dtype,
-                            shape=deepcopy(self.shape, memo))
+    new_tensor = TensorInfo.make_unchecked(name=self.name,
+                                           ugraph=memo['ugraph'],
+                                           op_name=self.op_name,
+                                           dtype=self.dtype,
+                                           shape=deepcopy(self.shape, memo))
     return new_tensor
 
 
-@attr.s
+@attr.s(slots=True)
 class OperationInfo(IRBase, _NoShallowCopyMixin):
   """
   name : str
@@ -97,6 +282,10 @@ class OperationInfo(IRBase, _NoShallowCopyMixin):
     types defined in `converter.ConverterFactor.all_generic_types`. The
     only exception is the key which match regex pattern r'_[^_]*'. The 
     values of such keys will be saved as-is without any type conversion.
+    The values are converted on first access, so attributes which are
+    never read are never decoded.
+  - use `OperationInfo.make_unchecked` to skip the validators when the
+    values are known to be valid, such as in parsers and copy routines
   """
   name = attr.ib(type=str)
   ugraph = attr.ib(repr=False)
@@ -126,7 +315,7 @@ class OperationInfo(IRBase, _NoShallowCopyMixin):
     if value not in ['tensorflow']:
       raise ValueError('Unsupported backend: {}'.format(value))
 
-  op_attr = attr.ib(factory=dict, converter=dict)
+  op_attr = attr.ib(factory=dict, converter=_LazyAttrDict)
 
   @property
   def input_nodes(self):
@@ -162,27 +351,38 @@ class OperationInfo(IRBase, _NoShallowCopyMixin):
   def n_outputs(self):
     return len(self.output_tensors)
 
+  @classmethod
+  def make_unchecked(cls, name, input_tensors, output_tensors, op_type,
+                     backend, ugraph, op_attr=None):
+    """Create an OperationInfo without running the validators
+
+    For trusted inputs only. As the normal constructor, the op is
+    registered to `ugraph.ops_info`
+    """
+    op_info = object.__new__(cls)
+    op_info.name = name
+    op_info.ugraph = ugraph
+    op_info.input_tensors = input_tensors
+    op_info.output_tensors = output_tensors
+    op_info.op_type = op_type
+    op_info.backend = backend
+    op_info.op_attr = _LazyAttrDict(op_attr)
+    op_info.__attrs_post_init__()
+    return op_info
+
   def __attrs_post_init__(self):
-    skip_pattern = re.compile(r'_utensor_[^_]*')
-    if self.op_attr:
-      op_attr = {}
-      for k, v in self.op_attr.items():
-        match = skip_pattern.match(k)
-        if match:
-          op_attr[k] = v
-        else:
-          op_attr[k] = ConverterFactory.get_generic_value(v)
-      self.op_attr = op_attr
     self.ugraph.ops_info[self.name] = self
 
   def __deepcopy__(self, memo):
-    op_info = OperationInfo(name=self.name,
-                            input_tensors=deepcopy(self.input_tensors, memo),
-                            output_tensors=deepcopy(self.output_tensors, memo),
-                            op_type=self.op_type,
-                            backend=self.backend,
-                            op_attr=deepcopy(self.op_attr, memo),
-                            ugraph=memo['ugraph'])
+    op_info = OperationInfo.make_unchecked(
+      name=self.name,
+      input_tensors=deepcopy(self.input_tensors, memo),
+      output_tensors=deepcopy(self.output_tensors, memo),
+      op_type=self.op_type,
+      backend=self.backend,
+      op_attr=deepcopy(self.op_attr, memo),
+      ugraph=memo['ugraph']
+    )
     return op_info
 
   def copy_into_graph(self, ugraph):
@@ -198,6 +398,13 @@ class uTensorGraph(IRBase, _NoShallowCopyMixin):
   topo_order : list
   output_nodes : list
   backend : str {"tensorflow", 'pytorch'(future work)}
+
+  Note
+  ====
+  - `graph_def` caches the exported `NodeDef` of each op. An op is
+    exported again if the op is replaced, its op_type, input tensor
+    names or op_attr entries are changed. Call `mark_dirty` after
+    modifying the attribute values in place.
   """
   KWPARSER_PATTERN = re.compile(r'^([^\d\W][\w\d_]*)__([^\d\W][\w\d_]*)')
 
@@ -205,6 +412,8 @@ class uTensorGraph(IRBase, _NoShallowCopyMixin):
   _backend = attr.ib(default='', type=str)
   ops_info = attr.ib(factory=dict)
   topo_order = attr.ib(factory=list, init=False)
+  # op name -> (op_info, op_attr, op_attr version, op_type, input names, NodeDef)
+  _node_def_cache = attr.ib(factory=dict, init=False, repr=False, cmp=False)
 
   def __attrs_post_init__(self):
     if not self.output_nodes:
@@ -216,25 +425,79 @@ class uTensorGraph(IRBase, _NoShallowCopyMixin):
 
   @property
   def graph_def(self):
+    """The graph as `tf.GraphDef`
+
+    The `NodeDef` of each op is cached and reused as long as the op, its
+    type, its input tensor names and its attribute dict are unchanged.
+    Setting or deleting a key of `op_attr` is tracked, but modifying an
+    attribute value in place (such as `op_attr['shape'].value = ...`) is
+    not: replace the value with a new one instead, or call `mark_dirty`
+    with the name of the op.
+    """
     assert self._backend == 'tensorflow', \
       'Convert a uTensorGraph to tf.GraphDef from a non-tf backend'
     graph_def = tf.GraphDef()
+    new_cache = {}
     for node_name in self.topo_order:
       op_info = self.ops_info[node_name]
-      attr = {}
-      for key, obj in op_info.op_attr.items():
-        if self.KWPARSER_PATTERN.match(key):
-          continue
-        value_name = obj.value_name
-        tf_value = ConverterFactory.get_tf_value(obj.value)
-        attr_value = _AttrValue(**{value_name: tf_value})
-        attr[key] = attr_value
-      graph_def.node.add(name=op_info.name,
-                         op=op_info.op_type,
-                         input=[in_tensor.name for in_tensor in op_info.input_tensors],
-                         device=op_info.op_attr.get('tensorflow__device', ''),
-                         attr=attr)
+      op_attr = op_info.op_attr
+      in_names = [in_tensor.name for in_tensor in op_info.input_tensors]
+      cached = self._node_def_cache.get(node_name, None)
+      if cached is not None and \
+        cached[0] is op_info and \
+        cached[1] is op_attr and \
+        cached[2] == op_attr._version and \
+        cached[3] == op_info.op_type and \
+        cached[4] == in_names:
+        node_def = cached[5]
+      else:
+        node_def = self._make_node_def(op_info, in_names)
+        if not isinstance(op_attr, _LazyAttrDict):
+          # no way to track changes of a plain dict
+          cached = None
+        else:
+          cached = (op_info, op_attr, op_attr._version,
+                    op_info.op_type, in_names, node_def)
+      if cached is not None:
+        new_cache[node_name] = cached
+      graph_def.node.add().CopyFrom(node_def)
+    self._node_def_cache = new_cache
     return graph_def
+
+  def _make_node_def(self, op_info, in_names):
+    op_attr = op_info.op_attr
+    attr = {}
+    for key in op_attr:
+      if self.KWPARSER_PATTERN.match(key):
+        continue
+      if isinstance(op_attr, _LazyAttrDict) and not op_attr.is_converted(key):
+        raw_value = op_attr.get_raw(key)
+        if isinstance(raw_value, _AttrValue):
+          # not converted yet, no need to convert it back
+          attr[key] = raw_value
+          continue
+      obj = op_attr[key]
+      value_name = obj.value_name
+      tf_value = ConverterFactory.get_tf_value(obj.value)
+      attr_value = _AttrValue(**{value_name: tf_value})
+      attr[key] = attr_value
+    return _NodeDef(name=op_info.name,
+                    op=op_info.op_type,
+                    input=in_names,
+                    device=op_attr.get('tensorflow__device', ''),
+                    attr=attr)
+
+  def mark_dirty(self, *op_names):
+    """Drop the cached `NodeDef` of given ops, or of all ops if no
+    name is given
+
+    Required only if the attribute values of an op are modified
+    in place
+    """
+    if not op_names:
+      self._node_def_cache.clear()
+    for op_name in op_names:
+      self._node_def_cache.pop(op_name, None)
   
   @property
   def ops(self):
@@ -268,3 +531,13 @@ class uTensorGraph(IRBase, _NoShallowCopyMixin):
     new_graph.topo_order = new_topo_order
     new_graph._backend = self._backend
     return new_graph
+
+  def __getstate__(self):
+    state = dict(self.__dict__)
+    # the cache holds references to the ops and is cheap to rebuild
+    state['_node_def_cache'] = {}
+    return state
+
+  def __setstate__(self, state):
+    state.setdefault('_node_def_cache', {})
+    self.__dict__.update(state)
@@ -0,0 +1,265 @@
+# -*- coding: utf8 -*-
+r"""Binary serialization of uTensorGraph
+
+File layout (all integers are little-endian)::
+
+  +----------------------------+
+  | header (40 bytes)          |  magic, format version, offsets and sizes
+  +----------------------------+
+  | metadata (utf8 json)       |  graph, ops, tensors and attributes
+  +----------------------------+
+  | padding                    |
+  +----------------------------+
+  | weights                    |  raw bytes of tensor attributes, each
+  |                            |  aligned to `ALIGNMENT` bytes
+  +----------------------------+
+
+The metadata can be read without touching the weight section, and the
+weights are memory-mapped when loaded, so they are only read from disk
+once accessed.
+"""
+import base64
+import json
+import struct
+
+import numpy as np
+import six
+from tensorflow.core.framework.attr_value_pb2 import AttrValue as _AttrValue
+
+from .base import OperationInfo, TensorInfo, _LazyAttrDict, uTensorGraph
+from .converter import (AttrValueConverter, ConverterFactory,
+                        TensorProtoConverter)
+
+__all__ = ['save_graph', 'load_graph', 'load_graph_meta', 'FORMAT_VERSION']
+
+MAGIC = b'UTG\x00'
+FORMAT_VERSION = 1
+ALIGNMENT = 64
+# magic, version, metadata offset, metadata size, weights offset, weights size
+_HEADER = struct.Struct('<4sIQQQQ')
+
+
+def _align(offset):
+  return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def _dtype_to_json(dtype):
+  if dtype.fields is None:
+    return dtype.str
+  # structured dtype, such as quantized types
+  return [list(field) for field in dtype.descr]
+
+
+_DTYPE_CACHE = {}
+
+
+def _dtype_from_json(value):
+  if isinstance(value, six.string_types):
+    dtype = _DTYPE_CACHE.get(value, None)
+    if dtype is None:
+      dtype = _DTYPE_CACHE[value] = np.dtype(str(value))
+    return dtype
+  return np.dtype([tuple(str(v) if isinstance(v, six.string_types) else v
+                         for v in field)
+                   for field in value])
+
+
+def _tensor_to_json(t_info):
+  return [t_info.name, t_info.op_name, _dtype_to_json(t_info.dtype), t_info.shape]
+
+
+def _tensor_from_json(value, ugraph):
+  name, op_name, dtype, shape = value
+  return TensorInfo.make_unchecked(name=six.text_type(name),
+                                   op_name=six.text_type(op_name),
+                                   dtype=_dtype_from_json(dtype),
+                                   shape=shape,
+                                   ugraph=ugraph)
+
+
+class _WeightsWriter(object):
+  """Layout of the weight section
+  """
+
+  def __init__(self):
+    self.arrays = []
+    self.nbytes = 0
+
+  def add(self, np_array):
+    np_array = np.ascontiguousarray(np_array)
+    offset = _align(self.nbytes)
+    self.arrays.append((offset, np_array))
+    self.nbytes = offset + np_array.nbytes
+    return offset
+
+  def write(self, fid):
+    pos = 0
+    for offset, np_array in self.arrays:
+      fid.write(b'\x00' * (offset - pos))
+      fid.write(np_array.data)
+      pos = offset + np_array.nbytes
+
+
+def _attr_to_json(op_attr, key, weights):
+  if not op_attr.is_converted(key):
+    raw_value = op_attr.get_raw(key)
+    if isinstance(raw_value, _AttrValue) and raw_value.WhichOneof('value') != 'tensor':
+      # save as-is, no need to convert
+      return ['attr', base64.b64encode(raw_value.SerializeToString()).decode('ascii')]
+  value = op_attr[key]
+  if isinstance(value, AttrValueConverter.__utensor_generic_type__):
+    if value.value_name == 'tensor':
+      tensor = value.value
+      offset = weights.add(tensor.np_array)
+      return ['tensor', {
+        'offset': offset,
+        'shape': list(tensor.np_array.shape),
+        'array_dtype': _dtype_to_json(tensor.np_array.dtype),
+        'dtype': _dtype_to_json(np.dtype(tensor.dtype)),
+      }]
+    attr_value = _AttrValue(**{value.value_name: ConverterFactory.get_tf_value(value.value)})
+    return ['attr', base64.b64encode(attr_value.SerializeToString()).decode('ascii')]
+  try:
+    json.dumps(value)
+  except TypeError:
+    raise ValueError(
+      'can not serialize attribute {} of type {}'.format(key, type(value))
+    )
+  return ['json', value]
+
+
+def _attr_from_json(value, weights):
+  kind, payload = value
+  if kind == 'attr':
+    attr_value = _AttrValue()
+    attr_value.ParseFromString(base64.b64decode(payload))
+    # converted on first access
+    return attr_value
+  if kind == 'tensor':
+    array_dtype = _dtype_from_json(payload['array_dtype'])
+    shape = payload['shape']
+    offset = payload['offset']
+    nbytes = array_dtype.itemsize
+    for dim in shape:
+      nbytes *= dim
+    np_array = weights[offset:offset + nbytes].view(array_dtype).reshape(shape)
+    return AttrValueConverter.GenericType(
+      value_name='tensor',
+      value=TensorProtoConverter.__utensor_generic_type__(
+        np_array=np_array,
+        dtype=_dtype_from_json(payload['dtype'])
+      )
+    )
+  if kind == 'json':
+    return payload
+  raise ValueError('unknown attribute kind: {}'.format(kind))
+
+
+def save_graph(ugraph, path):
+  """Save the graph to `path`
+
+  Attribute values are saved as serialized AttrValue protobuf except
+  tensors, which are saved in the weight section. Values with key
+  matching `_utensor_*` must be json serializable.
+  """
+  weights = _WeightsWriter()
+  ops = []
+  for op_name in ugraph.topo_order:
+    op_info = ugraph.ops_info[op_name]
+    op_attr = op_info.op_attr
+    if not isinstance(op_attr, _LazyAttrDict):
+      op_attr = _LazyAttrDict(op_attr)
+    ops.append({
+      'name': op_info.name,
+      'op_type': op_info.op_type,
+      'backend': op_info.backend,
+      'inputs': [_tensor_to_json(t_info) for t_info in op_info.input_tensors],
+      'outputs': [_tensor_to_json(t_info) for t_info in op_info.output_tensors],
+      'attrs': dict((key, _attr_to_json(op_attr, key, weights)) for key in op_attr),
+    })
+  meta = json.dumps({
+    'output_nodes': list(ugraph.output_nodes),
+    'backend': ugraph.backend,
+    'ops': ops,
+  }, separators=(',', ':')).encode('utf8')
+  meta_offset = _HEADER.size
+  weights_offset = _align(meta_offset + len(meta))
+  with open(path, 'wb') as fid:
+    fid.write(_HEADER.pack(MAGIC, FORMAT_VERSION,
+                           meta_offset, len(meta),
+                           weights_offset, weights.nbytes))
+    fid.write(meta)
+    fid.write(b'\x00' * (weights_offset - meta_offset - len(meta)))
+    weights.write(fid)
+
+
+def _read_header(fid):
+  header = fid.read(_HEADER.size)
+  if len(header) != _HEADER.size:
+    raise ValueError('not a uTensorGraph file: too short')
+  magic, version, meta_offset, meta_size, weights_offset, weights_size = \
+    _HEADER.unpack(header)
+  if magic != MAGIC:
+    raise ValueError('not a uTensorGraph file: bad magic {!r}'.format(magic))
+  if version > FORMAT_VERSION:
+    raise ValueError(
+      'unsupported format version {} (expecting <= {})'.format(version, FORMAT_VERSION)
+    )
+  return meta_offset, meta_size, weights_offset, weights_size
+
+
+def load_graph_meta(path):
+  """Read the metadata of the graph saved by `save_graph`
+
+  The weight section is not read
+
+  Return
+  ------
+  meta : dict
+      with keys `output_nodes`, `backend` and `ops`, ops are
+      in topological order
+  """
+  with open(path, 'rb') as fid:
+    meta_offset, meta_size, _, _ = _read_header(fid)
+    fid.seek(meta_offset)
+    return json.loads(fid.read(meta_size).decode('utf8'))
+
+
+def load_graph(path, mmap_weights=True):
+  """Load the graph saved by `save_graph`
+
+  Parameters
+  ----------
+  path : str
+  mmap_weights : bool
+      if True, tensor attributes are copy-on-write memory-mapped views of
+      the file, read from disk on access. Otherwise, the weights are read
+      into memory
+  """
+  with open(path, 'rb') as fid:
+    meta_offset, meta_size, weights_offset, weights_size = _read_header(fid)
+    fid.seek(meta_offset)
+    meta = json.loads(fid.read(meta_size).decode('utf8'))
+    if weights_size == 0:
+      weights = np.zeros((0,), dtype=np.uint8)
+    elif mmap_weights:
+      weights = np.memmap(path, dtype=np.uint8, mode='c',
+                          offset=weights_offset, shape=(weights_size,))
+    else:
+      fid.seek(weights_offset)
+      weights = np.frombuffer(bytearray(fid.read(weights_size)), dtype=np.uint8)
+  ugraph = uTensorGraph(output_nodes=meta['output_nodes'],
+                        backend=meta['backend'])
+  for op in meta['ops']:
+    OperationInfo.make_unchecked(
+      name=op['name'],
+      input_tensors=[_tensor_from_json(v, ugraph) for v in op['inputs']],
+      output_tensors=[_tensor_from_json(v, ugraph) for v in op['outputs']],
+      op_type=op['op_type'],
+      backend=op['backend'],
+      op_attr=dict((key, _attr_from_json(value, weights))
+                   for key, value in op['attrs'].items()),
+      ugraph=ugraph
+    )
+  ugraph.topo_order = [op['name'] for op in meta['ops']]
+  return ugraph
@@ -0,0 +1,95 @@
+# -*- coding: utf8 -*-
+r"""Click parameter types of the command line options
+
+Only click is imported, so the commands which never touch a graph (such
+as `utensor-cli show --stream`) do not pay for importing tensorflow.
+"""
+import re
+from ast import literal_eval
+
+from click.types import ParamType
+
+__all__ = ["NArgsParam", "NArgsKwargsParam", "TensorShapesParam"]
+
+
+class NArgsParam(ParamType):
+
+  def __init__(self, sep=','):
+    self._sep = sep
+
+  def convert(self, value, param, ctx):
+    value = str(value)
+    args = value.split(self._sep)
+    aug_args = [arg for arg in args if arg[:1] in ['+', '-']]
+    if aug_args:
+      if param is None or param.default is None:
+        self.fail('+ARG/-ARG without default: {}'.format(value), param, ctx)
+      final_args = param.default.split(self._sep)
+      for arg in aug_args:
+        if arg[0] == '+':
+          final_args.append(arg[1:])
+        elif arg[0] == '-' and arg[1:] in final_args:
+          final_args.remove(arg[1:])
+    else:
+      final_args = args
+    return final_args
+
+
+class NArgsKwargsParam(NArgsParam):
+
+  _trans_name_patrn = re.compile(r"(\w[\w]*)\(?")
+
+  def convert(self, value, param, ctx):
+    args = super().convert(value, param, ctx)
+    return [self._parse_kwargs(arg) for arg in args]
+  
+  def _parse_kwargs(self, arg):
+    trans_match = self._trans_name_patrn.match(arg)
+    if not trans_match:
+      raise ValueError("Invalid args detected: {}".format(arg))
+    trans_name = trans_match.group(1)
+    _, end = trans_match.span()
+    if end == len(arg):
+      kwargs = {}
+    else:
+      if not arg.endswith(")"):
+        raise ValueError("parentheses mismatch: {}".format(arg))
+      kwargs = self._get_kwargs(arg[end:-1])
+    return trans_name, kwargs
+  
+  def _get_kwargs(self, kws_str):
+    kw_arg_strs = [s.strip() for s in kws_str.split(',')]
+    kwargs = {}
+    for kw_str in kw_arg_strs:
+      name, v_str = kw_str.split('=')
+      value = literal_eval(v_str)
+      kwargs[name] = value
+    return kwargs
+
+
+class TensorShapesParam(ParamType):
+  """
+  NAME=DIM,DIM,...;NAME=DIM,... --> {NAME: [DIM, DIM, ...], ...}
+  """
+  name = 'tensor_shapes'
+
+  def __init__(self, sep=';'):
+    self._sep = sep
+
+  def convert(self, value, param, ctx):
+    if isinstance(value, dict):
+      return value
+    shapes = {}
+    for shape_str in str(value).split(self._sep):
+      shape_str = shape_str.strip()
+      if not shape_str:
+        continue
+      if '=' not in shape_str:
+        self.fail('invalid shape: {}'.format(shape_str), param, ctx)
+      name, dims_str = shape_str.split('=', 1)
+      try:
+        dims = [int(d) for d in dims_str.split(',') if d.strip()]
+      except ValueError:
+        self.fail('invalid shape: {}'.format(shape_str), param, ctx)
+      shapes[name.strip()] = dims
+    return shapes
@@ -0,0 +1,239 @@
+# -*- coding:utf8 -*-
+r"""Conversion Server
+
+A long-running process with tensorflow, the frontends and the templates
+loaded, serving conversion jobs over JSON-RPC 2.0. Messages are
+newline-delimited json, over a unix socket or stdin/stdout.
+
+Each job is run in a forked worker (see `utensor_cgen.batch`), so it
+starts warm, and a failing job does not take the server down.
+
+Methods
+-------
+convert(model, output_nodes, cwd=None, **options)
+    options are the same as a model in the manifest of
+    `utensor-cli convert-batch`. Relative paths are relative to `cwd`,
+    the working directory of the server by default. Return a dict with
+    keys `name`, `model_path`, `seconds` and `log`
+ping()
+    return "pong"
+shutdown()
+    stop the server after responding
+"""
+import inspect
+import json
+import os
+import shutil
+import socket
+import stat
+import sys
+import tempfile
+import traceback
+from contextlib import contextmanager
+
+from utensor_cgen.batch import make_job, preload, run_jobs
+from utensor_cgen.logger import logger
+
+__all__ = ['ConversionServer']
+
+# JSON-RPC error codes
+PARSE_ERROR = -32700
+INVALID_REQUEST = -32600
+METHOD_NOT_FOUND = -32601
+INVALID_PARAMS = -32602
+INTERNAL_ERROR = -32603
+CONVERSION_ERROR = -32000
+
+
+class _RPCError(Exception):
+
+  def __init__(self, code, message, data=None):
+    super(_RPCError, self).__init__(message)
+    self.code = code
+    self.message = message
+    self.data = data
+
+
+class ConversionServer(object):
+  """JSON-RPC conversion server
+  """
+
+  def __init__(self):
+    self.running = False
+    self._log_dir = None
+    self._methods = {
+      'convert': self.convert,
+      'ping': lambda: 'pong',
+      'shutdown': self.shutdown,
+    }
+
+  def convert(self, model, output_nodes, cwd=None, **options):
+    cwd = os.path.abspath(cwd or os.getcwd())
+    entry = dict(options, model=model, output_nodes=output_nodes, cwd=cwd)
+    try:
+      job = make_job(entry, cwd)
+    except ValueError as error:
+      raise _RPCError(INVALID_PARAMS, str(error))
+    result, = run_jobs([job], num_workers=1, log_dir=self._log_dir)
+    log_path = os.path.join(self._log_dir, '{}.log'.format(result.name))
+    log = ''
+    if os.path.exists(log_path):
+      with open(log_path) as fid:
+        log = fid.read()
+      os.remove(log_path)
+    if not result.ok:
+      raise _RPCError(CONVERSION_ERROR, 'conversion failed',
+                      {'traceback': result.error, 'log': log})
+    return {
+      'name': result.name,
+      'model_path': os.path.join(cwd, job.model_path),
+      'seconds': result.seconds,
+      'log': log,
+    }
+
+  def shutdown(self):
+    self.running = False
+
+  def handle_request(self, request):
+    """Handle a decoded request
+
+    Return the response, or None for notifications
+    """
+    if not isinstance(request, dict) or request.get('jsonrpc') != '2.0' or \
+      not isinstance(request.get('method', None), str):
+      return _error_response(None, INVALID_REQUEST, 'invalid request')
+    req_id = request.get('id', None)
+    params = request.get('params', {})
+    method = self._methods.get(request['method'], None)
+    try:
+      if method is None:
+        raise _RPCError(METHOD_NOT_FOUND, 'method not found: {}'.format(request['method']))
+      if isinstance(params, dict):
+        args, kwargs = [], params
+      elif isinstance(params, list):
+        args, kwargs = params, {}
+      else:
+        raise _RPCError(INVALID_PARAMS, 'params must be an object or an array')
+      try:
+        inspect.signature(method).bind(*args, **kwargs)
+      except TypeError as error:
+        # wrong arguments of the method
+        raise _RPCError(INVALID_PARAMS, str(error))
+      result = method(*args, **kwargs)
+    except _RPCError as error:
+      response = _error_response(req_id, error.code, error.message, error.data)
+    except Exception as error:
+      # a bad request must not take the server down
+      logger.exception('error in %s', request['method'])
+      response = _error_response(req_id, INTERNAL_ERROR, 'internal error: {}'.format(error),
+                                 {'traceback': traceback.format_exc()})
+    else:
+      response = {'jsonrpc': '2.0', 'id': req_id, 'result': result}
+    if 'id' not in request:
+      return None
+    return response
+
+  def handle_line(self, line):
+    """Handle a line of json, which is a request or a batch of requests
+
+    Return the encoded response, or None if there is nothing to respond
+    """
+    try:
+      message = json.loads(line)
+    except ValueError:
+      return _encode(_error_response(None, PARSE_ERROR, 'parse error'))
+    if isinstance(message, list):
+      if not message:
+        return _encode(_error_response(None, INVALID_REQUEST, 'empty batch'))
+      responses = [self.handle_request(request) for request in message]
+      responses = [response for response in responses if response is not None]
+      return _encode(responses) if responses else None
+    response = self.handle_request(message)
+    return None if response is None else _encode(response)
+
+  def _serve_stream(self, in_fid, out_fid):
+    for line in in_fid:
+      line = line.strip()
+      if not line:
+        continue
+      response = self.handle_line(line.decode('utf8'))
+      if response is not None:
+        out_fid.write(response.encode('utf8') + b'\n')
+        out_fid.flush()
+      if not self.running:
+        break
+
+  def serve_stdio(self):
+    """Serve the requests from stdin until EOF or shutdown
+    """
+    sys.stdout.flush()
+    # keep stdout for the responses, everything else printed goes to stderr
+    out_fid = os.fdopen(os.dup(1), 'wb')
+    os.dup2(2, 1)
+    with self._running():
+      self._serve_stream(os.fdopen(os.dup(0), 'rb'), out_fid)
+    out_fid.close()
+
+  def serve_unix(self, socket_path):
+    """Serve the requests on a unix socket until shutdown
+
+    The connections are served one at a time. The socket is only
+    accessible to the current user, as a request writes files with its
+    permissions. A socket left at `socket_path` by a previous server of
+    the same user is replaced, any other file is an error.
+    """
+    if os.path.lexists(socket_path):
+      path_stat = os.lstat(socket_path)
+      if not stat.S_ISSOCK(path_stat.st_mode) or path_stat.st_uid != os.getuid():
+        raise FileExistsError('{} exists and is not a socket of the current user'
+                              .format(socket_path))
+      os.remove(socket_path)
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    # the socket is created with the mode 0o600 from the start
+    umask = os.umask(0o077)
+    try:
+      sock.bind(socket_path)
+    finally:
+      os.umask(umask)
+    sock.listen(8)
+    logger.info('serving on %s', socket_path)
+    try:
+      with self._running():
+        while self.running:
+          conn, _ = sock.accept()
+          with conn:
+            fid = conn.makefile('rwb')
+            try:
+              self._serve_stream(fid, fid)
+            except (BrokenPipeError, ConnectionResetError):
+              pass
+            finally:
+              fid.close()
+    finally:
+      sock.close()
+      os.remove(socket_path)
+
+  @contextmanager
+  def _running(self):
+    """Load everything and keep a temporary log directory while serving
+    """
+    preload()
+    self._log_dir = tempfile.mkdtemp(prefix='utensor-serve-')
+    self.running = True
+    try:
+      yield
+    finally:
+      self.running = False
+      shutil.rmtree(self._log_dir)
+      self._log_dir = None
+
+
+def _error_response(req_id, code, message, data=None):
+  error = {'code': code, 'message': message}
+  if data is not None:
+    error['data'] = data
+  return {'jsonrpc': '2.0', 'id': req_id, 'error': error}
+
+
+def _encode(response):
+  return json.dumps(response)
@@ -3,4 +3,9 @@ from .ns_transformer import *
 from .optimizer import *
 from .quantize import *
 from .cmsis_nn import *
+from .const_fold import *
+from .schedule import *
+from .shape_inference import *
+from .fusion import *
+from .stats import *
 from .pipline import TransformerPipeline
@@ -20,11 +20,12 @@ from utensor_cgen.ir import OperationInfo, TensorInfo, uTensorGraph
 from utensor_cgen.ir.converter import AttrValueConverter  # hue hue hue hue hue
 from utensor_cgen.ir.converter import GenericTensorConverterMixin
 from utensor_cgen.ir.utils import graph_check
+from utensor_cgen.logger import logger
 from utensor_cgen.utils import parse_tensor_name, topologic_order_graph
 
 from .base import Transformer
 
-__all__ = ["CMSIS_NN_Transformer"]
+__all__ = ["CMSIS_NN_Transformer", "CMSIS_NN_WeightTransformer"]
 
 ## MatMul Only
 class CMSIS_NN_Transformer(Transformer):
@@ -158,3 +159,51 @@ class CMSIS_NN_Transformer(Transformer):
 
     graph_check(ugraph)
     return ugraph
+
+
+def _uint8_q7_origin(values, min_value, max_value):
+  """ The values of Uint8Q7OriginOp: the uint8 values are shifted so the
+  origin (real 0) is at q7 0 with the same scale, saturated to q7
+  """
+  scaled_min = min_value / (max_value - min_value) * 255.0
+  # rounding half away from zero, as roundf
+  offset = int(np.sign(scaled_min) * np.floor(np.abs(scaled_min) + 0.5))
+  q7_values = values.astype(np.int32) + offset
+  return np.clip(q7_values, -128, 127).astype(np.int8)
+
+
+class CMSIS_NN_WeightTransformer(Transformer):
+  """ Convert the constant weights of the CMSIS-NN ops to q7 offline
+
+  The Uint8Q7OriginOp ops reading constant tensors are replaced by Const
+  ops with the q7 values, so the conversion does not run on the device on
+  every inference. The weights are already in the layouts of the CMSIS-NN
+  kernels, see `transpose_offline`.
+
+  Should run after `cmsisnn` and before `inline`
+  """
+  METHOD_NAME = 'cmsisnn_weights'
+  KWARGS_NAMESCOPE = '_utensor_cmsisnn_weights'
+
+  def __init__(self, **kwargs):
+    self.prune_graph = True
+
+  def transform(self, ugraph):
+    num_folded = 0
+    for op_name in list(ugraph.topo_order):
+      op_info = ugraph.ops_info[op_name]
+      if op_info.op_type != "Uint8Q7OriginOp":
+        continue
+      in_ops = [ugraph.ops_info.get(t_info.op_name, None) for t_info in op_info.input_tensors]
+      if not all(in_op is not None and in_op.op_type == "Const" for in_op in in_ops):
+        continue
+      values, min_value, max_value = [in_op.op_attr['value'].value.np_array for in_op in in_ops]
+      q7_values = _uint8_q7_origin(values, float(min_value), float(max_value))
+      ugraph.drop_op(op_name)
+      Const_Op(op_name, q7_values, ugraph)
+      ugraph.ops_info[op_name].op_attr['dtype'] = AttrValueConverter.GenericType(
+        value_name='type', value=tf.int8.as_datatype_enum
+      )
+      num_folded += 1
+    logger.info('cmsis-nn weights: %d Uint8Q7OriginOp(s) on constants converted offline', num_folded)
+    return ugraph
@@ -0,0 +1,281 @@
+# -*- coding:utf8 -*-
+r"""Constant Folding Transformer
+
+Evaluate subgraphs whose inputs are all constants with NumPy at
+conversion time and replace them with a single Const/Inline op
+"""
+import numpy as np
+
+from utensor_cgen.ir import OperationInfo, TensorInfo
+from utensor_cgen.ir.converter import AttrValueConverter, TensorProtoConverter
+from utensor_cgen.logger import logger
+
+from .base import Transformer
+
+__all__ = ["ConstFoldTransformer", "register_evaluator", "evaluate_op"]
+
+_EVALUATORS = {}
+
+
+def register_evaluator(*op_types):
+  """Register a NumPy evaluator for given op types
+
+  An evaluator is a function with signature `func(op_info, in_arrays)`
+  which returns a list of numpy arrays, one for each output tensor of
+  the op, or None if the op can not be evaluated
+  """
+  def register(func):
+    for op_type in op_types:
+      _EVALUATORS[op_type] = func
+    return func
+  return register
+
+
+def evaluate_op(op_info, in_arrays):
+  """Evaluate the op with given input arrays
+
+  Return
+  ------
+  out_arrays : list or None
+      list of numpy arrays or None if the op type is not supported
+  """
+  evaluator = _EVALUATORS.get(op_info.op_type, None)
+  if evaluator is None:
+    return None
+  return evaluator(op_info, in_arrays)
+
+
+def _get_attr(op_info, key, default=None):
+  if key not in op_info.op_attr:
+    return default
+  return op_info.op_attr[key].value
+
+
+@register_evaluator('Identity')
+def _identity(op_info, in_arrays):
+  return [in_arrays[0]]
+
+
+@register_evaluator('Add', 'Sub', 'Mul', 'RealDiv', 'FloorDiv', 'Maximum', 'Minimum')
+def _binary_op(op_info, in_arrays):
+  np_func = {
+    'Add': np.add,
+    'Sub': np.subtract,
+    'Mul': np.multiply,
+    'RealDiv': np.true_divide,
+    'FloorDiv': np.floor_divide,
+    'Maximum': np.maximum,
+    'Minimum': np.minimum,
+  }[op_info.op_type]
+  x, y = in_arrays
+  return [np_func(x, y)]
+
+
+@register_evaluator('Sqrt', 'Rsqrt', 'Neg', 'Square')
+def _unary_op(op_info, in_arrays):
+  np_func = {
+    'Sqrt': np.sqrt,
+    'Rsqrt': lambda x: 1.0 / np.sqrt(x),
+    'Neg': np.negative,
+    'Square': np.square,
+  }[op_info.op_type]
+  return [np_func(in_arrays[0]).astype(in_arrays[0].dtype)]
+
+
+@register_evaluator('FusedBatchNorm', 'FusedBatchNormV2')
+def _fused_batch_norm(op_info, in_arrays):
+  if _get_attr(op_info, 'is_training', False):
+    return None
+  data_format = _get_attr(op_info, 'data_format', b'NHWC')
+  if isinstance(data_format, bytes):
+    data_format = data_format.decode('utf8')
+  if data_format != 'NHWC':
+    return None
+  x, scale, offset, mean, variance = in_arrays
+  epsilon = _get_attr(op_info, 'epsilon', 0.001)
+  y = (x - mean) / np.sqrt(variance + epsilon) * scale + offset
+  return [y.astype(x.dtype), mean, variance, mean, variance]
+
+
+@register_evaluator('Cast')
+def _cast(op_info, in_arrays):
+  return [in_arrays[0].astype(op_info.output_tensors[0].dtype)]
+
+
+@register_evaluator('Reshape')
+def _reshape(op_info, in_arrays):
+  x, shape = in_arrays
+  return [x.reshape(shape.tolist())]
+
+
+@register_evaluator('Pack')
+def _pack(op_info, in_arrays):
+  axis = _get_attr(op_info, 'axis', 0)
+  return [np.stack(in_arrays, axis=axis)]
+
+
+@register_evaluator('ConcatV2')
+def _concat(op_info, in_arrays):
+  axis = int(in_arrays[-1])
+  return [np.concatenate(in_arrays[:-1], axis=axis)]
+
+
+@register_evaluator('ExpandDims')
+def _expand_dims(op_info, in_arrays):
+  x, axis = in_arrays
+  return [np.expand_dims(x, int(axis))]
+
+
+@register_evaluator('Transpose')
+def _transpose(op_info, in_arrays):
+  x, perm = in_arrays
+  return [np.transpose(x, perm.tolist())]
+
+
+@register_evaluator('Fill')
+def _fill(op_info, in_arrays):
+  dims, value = in_arrays
+  return [np.full(dims.tolist(), value, dtype=value.dtype)]
+
+
+@register_evaluator('Range')
+def _range(op_info, in_arrays):
+  start, limit, delta = in_arrays
+  return [np.arange(start, limit, delta)]
+
+
+@register_evaluator('Max', 'Min', 'Sum', 'Prod', 'Mean')
+def _reduce(op_info, in_arrays):
+  np_func = {
+    'Max': np.max,
+    'Min': np.min,
+    'Sum': np.sum,
+    'Prod': np.prod,
+    'Mean': np.mean,
+  }[op_info.op_type]
+  x, axis = in_arrays
+  keep_dims = _get_attr(op_info, 'keep_dims', False)
+  axis = tuple(np.array(axis).flatten().tolist())
+  return [np_func(x, axis=axis, keepdims=keep_dims)]
+
+
+@register_evaluator('StridedSlice')
+def _strided_slice(op_info, in_arrays):
+  x, begin, end, strides = in_arrays
+  if _get_attr(op_info, 'ellipsis_mask', 0) or _get_attr(op_info, 'new_axis_mask', 0):
+    # not supported yet
+    return None
+  begin_mask = _get_attr(op_info, 'begin_mask', 0)
+  end_mask = _get_attr(op_info, 'end_mask', 0)
+  shrink_axis_mask = _get_attr(op_info, 'shrink_axis_mask', 0)
+  slices = []
+  for i, (b, e, s) in enumerate(zip(begin.tolist(), end.tolist(), strides.tolist())):
+    if shrink_axis_mask & (1 << i):
+      slices.append(b)
+      continue
+    if begin_mask & (1 << i):
+      b = None
+    if end_mask & (1 << i):
+      e = None
+    slices.append(slice(b, e, s))
+  return [np.asarray(x[tuple(slices)])]
+
+
+class ConstFoldTransformer(Transformer):
+  """Constant Folding
+
+  Ops with all inputs generated by Const/Inline ops are evaluated with
+  NumPy and replaced by a Const/Inline op with the same name, so the
+  consumers of the folded op are left untouched.
+  Shape-only ops (Shape, Size and Rank) are folded as long as the shape
+  of their input is fully known.
+  """
+  METHOD_NAME = 'constant_fold'
+  KWARGS_NAMESCOPE = '_utensor_constant_fold'
+  CONST_OP_TYPES = ('Const', 'Inline')
+  SHAPE_OP_TYPES = {
+    'Shape': lambda shape: shape,
+    'Size': lambda shape: int(np.prod(shape)),
+    'Rank': lambda shape: len(shape),
+  }
+
+  def transform(self, ugraph):
+    default_const_type = 'Const'
+    if any(op.op_type == 'Inline' for op in ugraph.ops_info.values()):
+      default_const_type = 'Inline'
+    folded_shapes = {}
+    for op_name in ugraph.topo_order:
+      op_info = ugraph.ops_info[op_name]
+      if op_name in ugraph.output_nodes or \
+        op_info.op_type in self.CONST_OP_TYPES or \
+        len(op_info.output_tensors) != 1:
+        continue
+      value, const_type = self._fold_value(ugraph, op_info)
+      if value is None:
+        continue
+      out_tensor = op_info.output_tensors[0]
+      value = np.asarray(value).astype(out_tensor.dtype)
+      self._replace_with_const(ugraph, op_info, value,
+                               const_type or default_const_type)
+      folded_shapes[out_tensor.name] = list(value.shape)
+    # keep the tensor infos of the consumers in sync
+    for op_info in ugraph.ops_info.values():
+      for t_info in op_info.input_tensors:
+        if t_info.name in folded_shapes:
+          t_info.shape = list(folded_shapes[t_info.name])
+    logger.info('constant folding: %d op(s) folded', len(folded_shapes))
+    return ugraph
+
+  def _fold_value(self, ugraph, op_info):
+    """Return (value, const_type)
+
+    value is None if the op can not be folded.
+    const_type is the op type of the const inputs if any, None otherwise
+    """
+    if op_info.op_type in self.SHAPE_OP_TYPES:
+      in_shape = op_info.input_tensors[0].shape
+      if in_shape is None or None in in_shape:
+        return None, None
+      return self.SHAPE_OP_TYPES[op_info.op_type](in_shape), None
+    if not op_info.input_tensors:
+      return None, None
+    in_arrays = []
+    const_type = None
+    for t_info in op_info.input_tensors:
+      in_op = ugraph.ops_info.get(t_info.op_name, None)
+      if in_op is None or in_op.op_type not in self.CONST_OP_TYPES:
+        return None, None
+      if const_type != 'Inline':
+        const_type = in_op.op_type
+      in_arrays.append(in_op.op_attr['value'].value.np_array)
+    out_arrays = evaluate_op(op_info, in_arrays)
+    if out_arrays is None:
+      return None, None
+    return out_arrays[0], const_type
+
+  @staticmethod
+  def _replace_with_const(ugraph, op_info, value, const_type):
+    out_tensor = op_info.output_tensors[0]
+    const_tensor = TensorInfo(name=out_tensor.name,
+                              op_name=op_info.name,
+                              dtype=value.dtype,
+                              shape=list(value.shape),
+                              ugraph=ugraph)
+    op_attr = {
+      'value': AttrValueConverter.GenericType(
+        value_name='tensor',
+        value=TensorProtoConverter.__utensor_generic_type__(np_array=value)
+      ),
+      'dtype': AttrValueConverter.GenericType(value_name='type',
+                                              value=value.dtype),
+      'tensorflow__device': op_info.op_attr.get('tensorflow__device', ''),
+    }
+    # OperationInfo registers itself to ugraph.ops_info, which replaces the
+    # folded op in place
+    OperationInfo(name=op_info.name,
+                  input_tensors=[],
+                  output_tensors=[const_tensor],
+                  op_type=const_type,
+                  backend=op_info.backend,
+                  op_attr=op_attr,
+                  ugraph=ugraph)
@@ -0,0 +1,185 @@
+# -*- coding:utf8 -*-
+r"""Fusion Transformer
+
+Fuse `Conv2D|MatMul -> Add -> Relu` chains into single ops so the
+intermediate tensors are never allocated
+"""
+from collections import defaultdict
+from copy import deepcopy
+
+from utensor_cgen.ir import OperationInfo
+from utensor_cgen.logger import logger
+
+from .base import Transformer
+
+__all__ = ["FusionTransformer"]
+
+
+class FusionTransformer(Transformer):
+  """Fuse linear op, bias add and relu
+
+  ======================================  ===============================
+  pattern                                 fused op type
+  ======================================  ===============================
+  Conv2D -> Add -> Relu                   FusedConv2DBiasRelu
+  MatMul -> Add -> Relu                   FusedMatMulBiasRelu
+  QuantizedConv2D -> QuantizedAdd ->      QuantizedFusedConv2DBiasRelu
+  QuantizedRelu
+  QuantizedMatMul -> QuantizedAdd ->      QuantizedFusedMatMulBiasRelu
+  QuantizedRelu
+  ======================================  ===============================
+
+  BiasAdd and QuantizedBiasAdd are matched as Add and QuantizedAdd.
+  The bias must be a 1D tensor and the intermediate tensors must have no
+  other consumers. The fused op takes the name and output tensors of the
+  relu op, with inputs of the linear op followed by the bias (and its
+  min/max for the quantized variants).
+
+  The quantized patterns are only fused with `quantized=True`. In
+  quantized graphs, the RequantizationRange/Requantize pairs between the
+  ops are fused as well, so the result differs from the unfused ops by
+  the rounding of the skipped requantization steps.
+
+  Kernel contract
+  ---------------
+  The fused ops are generated as the kernels of `uTensor/ops/FusedOps.hpp`,
+  which the runtime has to provide:
+
+  - `FusedConvBiasReluOp<T_in, T_filter, T_bias, T_out>(strides, padding)`
+    and `FusedMatMulBiasReluOp<T_x, T_w, T_bias, T_out>`: inputs are the
+    inputs of Conv2D/MatMul followed by the bias, the output is
+    `max(linear(x, w) + bias, 0)`, the bias is broadcast on the last axis
+  - `QntFusedConvBiasReluOp<T_in, T_filter, T_bias, T_out>(strides, padding)`
+    and `QntFusedMatMulBiasReluOp<T_x, T_w, T_bias, T_out>`: inputs are the
+    inputs of QuantizedConv2D/QuantizedMatMul (in the order of the uTensor
+    op) followed by the quantized bias and its min/max. The product is
+    accumulated in 32 bits, the bias is rescaled to the range of the
+    accumulator and added, and negative values are clamped to zero. The
+    result is requantized to `T_out` with the min/max of the actual values,
+    as RequantizationRange does, and the outputs are the value, min and max
+  """
+  METHOD_NAME = 'fusion'
+  KWARGS_NAMESCOPE = '_utensor_fusion'
+
+  # (linear op types, add op types, relu op type, fused op type)
+  PATTERNS = [
+    (('Conv2D',), ('Add', 'BiasAdd'), 'Relu', 'FusedConv2DBiasRelu'),
+    (('MatMul',), ('Add', 'BiasAdd'), 'Relu', 'FusedMatMulBiasRelu'),
+    (('QuantizedConv2D',), ('QuantizedAdd', 'QuantizedBiasAdd'),
+     'QuantizedRelu', 'QuantizedFusedConv2DBiasRelu'),
+    (('QuantizedMatMul',), ('QuantizedAdd', 'QuantizedBiasAdd'),
+     'QuantizedRelu', 'QuantizedFusedMatMulBiasRelu'),
+  ]
+
+  def __init__(self, quantized=False, **kwargs):
+    self.prune_graph = True
+    self.quantized = quantized
+
+  def transform(self, ugraph):
+    patterns = [
+      pattern for pattern in self.PATTERNS
+      if self.quantized or not pattern[-1].startswith('Quantized')
+    ]
+    # tensor name -> names of consumer ops
+    consumers = defaultdict(set)
+    for op_info in ugraph.ops_info.values():
+      for t_info in op_info.input_tensors:
+        consumers[t_info.name].add(op_info.name)
+    num_fused = 0
+    for op_name in list(ugraph.topo_order):
+      relu_op = ugraph.ops_info.get(op_name, None)
+      if relu_op is None:
+        continue
+      for linear_types, add_types, relu_type, fused_type in patterns:
+        if relu_op.op_type != relu_type:
+          continue
+        matched = self._match(ugraph, consumers, relu_op, linear_types, add_types)
+        if matched is None:
+          continue
+        linear_op, add_op, bias_tensors = matched
+        fused_op = self._fuse(ugraph, linear_op, bias_tensors, relu_op, fused_type)
+        for t_info in fused_op.input_tensors:
+          consumers[t_info.name].add(fused_op.name)
+        num_fused += 1
+        break
+    logger.info('fusion: %d op(s) fused', num_fused)
+    return ugraph
+
+  def _match(self, ugraph, consumers, relu_op, linear_types, add_types):
+    """Return (linear_op, add_op, bias_tensors) or None
+    """
+    add_op, skipped = self._skip_requantize(relu_op.input_tensors[0])
+    if add_op is None or add_op.op_type not in add_types:
+      return None
+    for value_idx, bias_idx in [(0, 1), (1, 0)]:
+      linear_op, linear_skipped = self._skip_requantize(add_op.input_tensors[value_idx])
+      if linear_op is None or linear_op.op_type not in linear_types:
+        continue
+      bias_tensor = add_op.input_tensors[bias_idx]
+      if bias_tensor.shape is None or len(bias_tensor.shape) != 1:
+        continue
+      fused = [linear_op, add_op] + skipped + linear_skipped
+      if not self._is_internal(ugraph, consumers, fused, relu_op):
+        continue
+      bias_tensors = [bias_tensor]
+      if len(add_op.input_tensors) == 6:
+        # quantized: x, y, min_x, max_x, min_y, max_y
+        bias_tensors.extend([add_op.input_tensors[2 + 2 * bias_idx],
+                             add_op.input_tensors[3 + 2 * bias_idx]])
+      return linear_op, add_op, bias_tensors
+    return None
+
+  @staticmethod
+  def _skip_requantize(t_info):
+    """Return the op generating the tensor, skipping a
+    RequantizationRange/Requantize pair, and the skipped ops
+    """
+    op_info = t_info.op
+    if op_info is None or op_info.op_type != 'Requantize' or \
+      t_info.name != op_info.output_tensors[0].name:
+      return op_info, []
+    src_op = op_info.input_tensors[0].op
+    range_op = op_info.input_tensors[3].op
+    if src_op is None or range_op is None or \
+      range_op.op_type != 'RequantizationRange' or \
+      range_op.input_tensors[0].op_name != src_op.name:
+      return op_info, []
+    return src_op, [op_info, range_op]
+
+  @staticmethod
+  def _is_internal(ugraph, consumers, op_infos, consumer):
+    """True if outputs of `op_infos` are only consumed by ops in
+    `op_infos` and `consumer`
+    """
+    names = set(op_info.name for op_info in op_infos)
+    if names.intersection(ugraph.output_nodes):
+      return False
+    names.add(consumer.name)
+    for op_info in op_infos:
+      for t_info in op_info.output_tensors:
+        if not consumers.get(t_info.name, set()).issubset(names):
+          return False
+    return True
+
+  @staticmethod
+  def _fuse(ugraph, linear_op, bias_tensors, relu_op, fused_type):
+    op_attr = deepcopy(linear_op.op_attr)
+    for key, value in relu_op.op_attr.items():
+      if key not in op_attr:
+        op_attr[key] = deepcopy(value)
+    input_tensors = [
+      deepcopy(t_info, {'ugraph': ugraph})
+      for t_info in linear_op.input_tensors + bias_tensors
+    ]
+    output_tensors = [
+      deepcopy(t_info, {'ugraph': ugraph})
+      for t_info in relu_op.output_tensors
+    ]
+    # registered to ugraph.ops_info, replacing the relu op
+    return OperationInfo(name=relu_op.name,
+                         input_tensors=input_tensors,
+                         output_tensors=output_tensors,
+                         op_type=fused_type,
+                         backend=relu_op.backend,
+                         op_attr=op_attr,
+                         ugraph=ugraph)
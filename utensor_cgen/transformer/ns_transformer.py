@@ -8,10 +8,15 @@ import re
 from collections import defaultdict
 from copy import deepcopy
 
-from utensor_cgen.ir import OperationInfo, uTensorGraph
+import numpy as np
+
+from utensor_cgen.ir import OperationInfo, TensorInfo, uTensorGraph
+from utensor_cgen.ir.converter import AttrValueConverter, TensorProtoConverter
+from utensor_cgen.logger import logger
 from utensor_cgen.utils import parse_tensor_name
 
 from .base import Transformer
+from .const_fold import evaluate_op
 
 __all__ = ["DropoutTransformer", "BatchNormTransformer", "InlineTransformer"]
 
@@ -82,13 +87,13 @@ class DropoutTransformer(Transformer):
           dropout_in_tensor = dropout_input_map[name_scope]
           in_t_infos.pop(i)
           in_t_infos.insert(i, dropout_in_tensor)
-      new_op_info = OperationInfo(name=op_info.name,
-                                  input_tensors=in_t_infos,
-                                  output_tensors=out_t_infos,
-                                  op_type=op_info.op_type,
-                                  backend=op_info.backend,
-                                  op_attr=op_attr,
-                                  ugraph=new_graph)
+      new_op_info = OperationInfo.make_unchecked(name=op_info.name,
+                                                 input_tensors=in_t_infos,
+                                                 output_tensors=out_t_infos,
+                                                 op_type=op_info.op_type,
+                                                 backend=op_info.backend,
+                                                 op_attr=op_attr,
+                                                 ugraph=new_graph)
       new_ops_info[node_name] = new_op_info
     new_graph.ops_info = new_ops_info
     new_graph._backend = ugraph._backend
@@ -128,12 +133,226 @@ class DropoutTransformer(Transformer):
 
 
 class BatchNormTransformer(Transformer):
-  """Replace Batch Norm namescope with uTensor Op
+  """Fold Batch Norm namescope into the preceding op
+
+  In inference, batch norm is a per-channel affine transformation,
+  `y = x * scale + offset`, which is evaluated with NumPy at conversion
+  time. If `x` is generated by a Conv2D or MatMul op with constant
+  weights (optionally followed by an Add/BiasAdd with constant bias), the
+  scale is folded into the weights and the offset into the bias.
+  Otherwise, the namescope is replaced with a Mul and an Add op.
+  The last op of the namescope is replaced with an Add op of the same
+  name so the consumers are left untouched.
   """
   METHOD_NAME = 'batch_norm'
   KWARGS_NAMESCOPE = '_batch_norm'
-  TARGET_NODENAME_PATTERN = re.compile(r'(BatchNorm[_\w\d]*)/.*')
+  TARGET_NODENAME_PATTERN = re.compile(
+    r'^((?:[^/]+/)*?(?:BatchNorm|batch_normalization|batchnorm)[_\d]*)/.*'
+  )
+  CONST_OP_TYPES = ('Const', 'Inline')
 
   def transform(self, ugraph):
-    # TODO: implement this!
-    pass
+    for name_scope, cluster in self._find_clusters(ugraph).items():
+      self._fold_cluster(ugraph, name_scope, cluster)
+    return ugraph
+
+  def _find_clusters(self, ugraph):
+    clusters = defaultdict(lambda: [])
+    for node_name in ugraph.topo_order:
+      match = self.TARGET_NODENAME_PATTERN.match(node_name)
+      if match:
+        clusters[match.group(1)].append(node_name)
+    return dict(clusters)
+
+  def _fold_cluster(self, ugraph, name_scope, cluster):
+    cluster_set = set(cluster)
+    in_tensor = None
+    for op_name in cluster:
+      for t_info in ugraph.ops_info[op_name].input_tensors:
+        if t_info.op_name in cluster_set or self._is_const(ugraph, t_info):
+          continue
+        if in_tensor is not None and in_tensor.name != t_info.name:
+          # more than one input
+          return False
+        in_tensor = t_info
+    out_tensors = set()
+    for op_info in ugraph.ops_info.values():
+      if op_info.name in cluster_set:
+        continue
+      for t_info in op_info.input_tensors:
+        if t_info.op_name in cluster_set:
+          out_tensors.add(t_info.name)
+    for op_name in ugraph.output_nodes:
+      if op_name in cluster_set:
+        out_tensors.update(t.name for t in ugraph.ops_info[op_name].output_tensors)
+    if in_tensor is None or len(out_tensors) != 1:
+      return False
+    out_tname = out_tensors.pop()
+    out_op_name, out_index = parse_tensor_name(out_tname)
+    if out_index != 0:
+      return False
+    scale_offset = self._get_scale_offset(ugraph, cluster, in_tensor, out_tname)
+    if scale_offset is None:
+      logger.warning('can not fold batch norm: %s', name_scope)
+      return False
+    scale, offset = scale_offset
+    out_tensor = ugraph.ops_info[out_op_name].output_tensors[0]
+    if not self._fold_into_weights(ugraph, name_scope, in_tensor,
+                                   out_tensor, scale, offset):
+      mul_tensor = self._make_op(ugraph,
+                                 '{}/scale'.format(name_scope),
+                                 'Mul',
+                                 [in_tensor,
+                                  self._make_const(ugraph,
+                                                   '{}/scale_value'.format(name_scope),
+                                                   scale)],
+                                 in_tensor.shape,
+                                 in_tensor.dtype)
+      self._make_op(ugraph,
+                    out_op_name,
+                    'Add',
+                    [mul_tensor,
+                     self._make_const(ugraph,
+                                      '{}/offset_value'.format(name_scope),
+                                      offset)],
+                    out_tensor.shape,
+                    out_tensor.dtype)
+    return True
+
+  def _get_scale_offset(self, ugraph, cluster, in_tensor, out_tname):
+    """Evaluate the cluster with probing inputs
+
+    Return (scale, offset) as 1D arrays of the last dimension or
+    None if the cluster is not a per-channel affine transformation
+    """
+    shape = in_tensor.shape
+    if not shape or shape[-1] is None:
+      return None
+    probe_shape = [1] * (len(shape) - 1) + [shape[-1]]
+    outputs = []
+    for probe in [0, 1, 2]:
+      values = {in_tensor.name: np.full(probe_shape, probe, dtype=in_tensor.dtype)}
+      for op_name in cluster:
+        op_info = ugraph.ops_info[op_name]
+        if op_info.op_type in self.CONST_OP_TYPES:
+          out_arrays = [op_info.op_attr['value'].value.np_array]
+        else:
+          in_arrays = []
+          for t_info in op_info.input_tensors:
+            if t_info.name not in values:
+              if not self._is_const(ugraph, t_info):
+                return None
+              values[t_info.name] = t_info.op.op_attr['value'].value.np_array
+            in_arrays.append(values[t_info.name])
+          out_arrays = evaluate_op(op_info, in_arrays)
+          if out_arrays is None:
+            return None
+        for t_info, value in zip(op_info.output_tensors, out_arrays):
+          values[t_info.name] = np.asarray(value)
+      out_value = values.get(out_tname, None)
+      if out_value is None or list(out_value.shape) != probe_shape:
+        return None
+      outputs.append(out_value.reshape(-1))
+    offset = outputs[0]
+    scale = outputs[1] - outputs[0]
+    if not np.allclose(outputs[2], 2 * scale + offset, rtol=1e-4, atol=1e-5):
+      return None
+    return scale, offset
+
+  def _fold_into_weights(self, ugraph, name_scope, in_tensor, out_tensor,
+                         scale, offset):
+    bias_value = np.zeros_like(offset)
+    producer = in_tensor.op
+    if producer.op_type in ('Add', 'BiasAdd'):
+      if len(producer.output_nodes) != 1:
+        return False
+      value_tensor, bias_tensor = producer.input_tensors
+      if not self._is_const(ugraph, bias_tensor):
+        value_tensor, bias_tensor = bias_tensor, value_tensor
+      if not self._is_const(ugraph, bias_tensor):
+        return False
+      bias_value = bias_tensor.op.op_attr['value'].value.np_array
+      if bias_value.size not in (1, offset.size):
+        return False
+      producer = value_tensor.op
+    if producer.op_type not in ('Conv2D', 'MatMul') or \
+      len(producer.output_nodes) != 1 or \
+      not self._is_const(ugraph, producer.input_tensors[1]):
+      return False
+    weight_tensor = producer.input_tensors[1]
+    weight = weight_tensor.op.op_attr['value'].value.np_array
+    if producer.op_type == 'Conv2D':
+      # weights: [height, width, in_channels, out_channels]
+      new_weight = weight * scale
+    elif producer.op_attr['transpose_b'].value:
+      # weights: [out_channels, in_channels]
+      new_weight = weight * scale[:, np.newaxis]
+    else:
+      # weights: [in_channels, out_channels]
+      new_weight = weight * scale
+    new_bias = bias_value * scale + offset
+    producer.input_tensors[1] = self._make_const(
+      ugraph,
+      '{}/folded_weight'.format(name_scope),
+      new_weight.astype(weight.dtype)
+    )
+    producer_out = producer.output_tensors[0]
+    self._make_op(ugraph,
+                  out_tensor.op_name,
+                  'Add',
+                  [deepcopy(producer_out, {'ugraph': ugraph}),
+                   self._make_const(ugraph,
+                                    '{}/folded_bias'.format(name_scope),
+                                    new_bias.astype(producer_out.dtype))],
+                  out_tensor.shape,
+                  out_tensor.dtype)
+    return True
+
+  @classmethod
+  def _is_const(cls, ugraph, t_info):
+    in_op = ugraph.ops_info.get(t_info.op_name, None)
+    return in_op is not None and in_op.op_type in cls.CONST_OP_TYPES
+
+  @staticmethod
+  def _make_const(ugraph, name, value):
+    value = np.asarray(value)
+    op_attr = {
+      'value': AttrValueConverter.GenericType(
+        value_name='tensor',
+        value=TensorProtoConverter.__utensor_generic_type__(np_array=value)
+      ),
+      'dtype': AttrValueConverter.GenericType(value_name='type',
+                                              value=value.dtype),
+    }
+    out_tensor = TensorInfo(name='{}:0'.format(name),
+                            op_name=name,
+                            dtype=value.dtype,
+                            shape=list(value.shape),
+                            ugraph=ugraph)
+    OperationInfo(name=name,
+                  input_tensors=[],
+                  output_tensors=[out_tensor],
+                  op_type='Const',
+                  backend=ugraph.backend,
+                  op_attr=op_attr,
+                  ugraph=ugraph)
+    return deepcopy(out_tensor, {'ugraph': ugraph})
+
+  @staticmethod
+  def _make_op(ugraph, name, op_type, input_tensors, shape, dtype):
+    out_tensor = TensorInfo(name='{}:0'.format(name),
+                            op_name=name,
+                            dtype=dtype,
+                            shape=shape and list(shape),
+                            ugraph=ugraph)
+    OperationInfo(name=name,
+                  input_tensors=input_tensors,
+                  output_tensors=[out_tensor],
+                  op_type=op_type,
+                  backend=ugraph.backend,
+                  op_attr={
+                    'T': AttrValueConverter.GenericType(value_name='type',
+                                                        value=dtype)
+                  },
+                  ugraph=ugraph)
+    return deepcopy(out_tensor, {'ugraph': ugraph})
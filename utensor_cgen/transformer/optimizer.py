@@ -1,10 +1,16 @@
 from abc import ABCMeta, abstractmethod
 from collections import defaultdict
 from copy import deepcopy
+from hashlib import sha1
+
+import numpy as np
+
+from utensor_cgen.logger import logger
 
 from .base import Transformer
 
-__all__ = ['RefCntOptimizer']
+__all__ = ['RefCntOptimizer', 'WeightDedupOptimizer', 'InPlaceOptimizer',
+           'QuantizePeepholeOptimizer']
 
 
 class RefCntOptimizer(Transformer):
@@ -74,3 +80,286 @@ class IdOpRemoveOptimizer(Transformer):
             new_input_tensors.append(tensor)
         out_node.input_tensors = new_input_tensors
     return ugraph
+
+
+class WeightDedupOptimizer(Transformer):
+  """Merge constants with identical content
+
+  Const/Inline ops are hashed by the dtype, shape and bytes of their
+  values. Consumers of duplicated constants are rewired to the first
+  one in topological order and the duplicates are pruned.
+  """
+  METHOD_NAME = 'dedup_weights'
+  KWARGS_NAMESCOPE = '_utensor_dedup_weights'
+  TARGET_OP_TYPES = ('Const', 'Inline')
+
+  def __init__(self, **kwargs):
+    self.prune_graph = True
+
+  def transform(self, ugraph):
+    # (op_type, digest) -> list of candidate op infos
+    candidates = defaultdict(list)
+    # tensor name -> tensor info to replace with
+    replace_map = {}
+    bytes_saved = 0
+    for op_name in ugraph.topo_order:
+      op_info = ugraph.ops_info[op_name]
+      if op_info.op_type not in self.TARGET_OP_TYPES or \
+        op_name in ugraph.output_nodes:
+        continue
+      value = op_info.op_attr['value'].value.np_array
+      key = (op_info.op_type, self._digest(value))
+      for other in candidates[key]:
+        other_value = other.op_attr['value'].value.np_array
+        if other_value.dtype == value.dtype and \
+          other_value.shape == value.shape and \
+          np.array_equal(other_value, value):
+          replace_map[op_info.output_tensors[0].name] = other.output_tensors[0]
+          bytes_saved += value.nbytes
+          break
+      else:
+        candidates[key].append(op_info)
+    for op_info in ugraph.ops_info.values():
+      op_info.input_tensors = [
+        deepcopy(replace_map[t_info.name], {'ugraph': ugraph})
+        if t_info.name in replace_map else t_info
+        for t_info in op_info.input_tensors
+      ]
+    logger.info('weight deduplication: %d constant(s) merged, %d bytes saved',
+                len(replace_map), bytes_saved)
+    return ugraph
+
+  @staticmethod
+  def _digest(value):
+    hasher = sha1()
+    hasher.update(value.dtype.str.encode('utf8'))
+    hasher.update(str(value.shape).encode('utf8'))
+    hasher.update(np.ascontiguousarray(value).tobytes())
+    return hasher.hexdigest()
+
+
+class InPlaceOptimizer(Transformer):
+  """Reuse the input buffer of element-wise ops
+
+  An op is marked in-place if it is the last consumer of its first
+  input in topological order, i.e. the ref count of the input drops to
+  zero at the op. Its snippet then writes the output into the input
+  tensor instead of allocating a new one. The consumers of the output
+  read the input tensor (see `CodeGenerator`), so the ref count of the
+  input, set by `RefCntOptimizer`, is increased by the ref count of the
+  output.
+
+  `Reshape` is not a target: the uTensor kernel only resizes an output
+  of size 0, so writing into the (already sized) input would keep the
+  shape of the input.
+
+  Should run after `refcnt`
+  """
+  METHOD_NAME = 'inplace'
+  KWARGS_NAMESCOPE = '_utensor_inplace'
+  TARGET_OP_TYPES = ('Relu', 'QuantizedRelu')
+  # the buffers of these ops are not owned by the graph
+  _SKIP_PRODUCER_TYPES = ('Const', 'Inline', 'Placeholder')
+
+  def __init__(self, **kwargs):
+    self.prune_graph = False
+
+  def transform(self, ugraph):
+    refcnt_key = '%s__ref_counts' % RefCntOptimizer.KWARGS_NAMESCOPE
+    if not any(refcnt_key in op_info.op_attr for op_info in ugraph.ops_info.values()):
+      logger.warning('no ref counts found, run %s before %s',
+                     RefCntOptimizer.METHOD_NAME, self.METHOD_NAME)
+      return ugraph
+    last_consumers = {}
+    for op_name in ugraph.topo_order:
+      for t_info in ugraph.ops_info[op_name].input_tensors:
+        last_consumers[t_info.name] = op_name
+    # aliased tensor name -> tensor info owning the buffer
+    roots = {}
+    num_inplace = 0
+    bytes_saved = 0
+    for op_name in ugraph.topo_order:
+      op_info = ugraph.ops_info[op_name]
+      if not self._is_inplace(ugraph, op_info, last_consumers):
+        continue
+      in_tensor = op_info.input_tensors[0]
+      out_tensor = op_info.output_tensors[0]
+      root = roots.get(in_tensor.name, in_tensor)
+      producer = ugraph.ops_info[root.op_name]
+      if refcnt_key not in producer.op_attr or refcnt_key not in op_info.op_attr:
+        continue
+      out_names = [t_info.name for t_info in producer.output_tensors]
+      ref_counts = list(producer.op_attr[refcnt_key])
+      ref_counts[out_names.index(root.name)] += op_info.op_attr[refcnt_key][0]
+      producer.op_attr[refcnt_key] = ref_counts
+      op_info.op_attr['%s__inplace' % self.KWARGS_NAMESCOPE] = True
+      roots[out_tensor.name] = root
+      num_inplace += 1
+      bytes_saved += out_tensor.nbytes or 0
+    logger.info('in-place: %d op(s) reuse their input buffer, %d bytes saved',
+                num_inplace, bytes_saved)
+    return ugraph
+
+  def _is_inplace(self, ugraph, op_info, last_consumers):
+    if op_info.op_type not in self.TARGET_OP_TYPES or \
+      op_info.name in ugraph.output_nodes:
+      return False
+    in_tensor = op_info.input_tensors[0]
+    out_tensor = op_info.output_tensors[0]
+    if in_tensor.dtype != out_tensor.dtype:
+      return False
+    if last_consumers.get(in_tensor.name) != op_info.name:
+      return False
+    if [t_info.name for t_info in op_info.input_tensors].count(in_tensor.name) > 1:
+      return False
+    producer = in_tensor.op
+    if producer is None or \
+      producer.op_type in self._SKIP_PRODUCER_TYPES or \
+      producer.name in ugraph.output_nodes:
+      return False
+    return True
+
+
+class QuantizePeepholeOptimizer(Transformer):
+  """Remove redundant quantization round trips
+
+  Two patterns are rewritten
+
+  1. `Dequantize -> QuantizeV2`, where the range of the `QuantizeV2` is
+     the `Min`/`Max` of the dequantized tensor (as inserted by the
+     `quantize_nodes` transform): the readers of the `QuantizeV2` read
+     the quantized inputs of the `Dequantize` instead, which encode the
+     same values exactly
+  2. `RequantizationRange -> Requantize -> RequantizationRange -> Requantize`:
+     the second `Requantize` reads the input of the first one with its
+     range instead, skipping the intermediate rounding
+
+  The ops no longer read are pruned and their count is logged
+  """
+  METHOD_NAME = 'quant_peephole'
+  KWARGS_NAMESCOPE = '_utensor_quant_peephole'
+
+  def __init__(self, **kwargs):
+    self.prune_graph = True
+
+  def transform(self, ugraph):
+    num_ops = len(ugraph.ops_info)
+    # tensor name -> tensor info to replace with
+    replace_map = {}
+    num_pairs = 0
+    num_chains = 0
+    for op_name in ugraph.topo_order:
+      op_info = ugraph.ops_info[op_name]
+      if op_info.op_type == 'QuantizeV2':
+        dequant_info = self._round_trip_dequantize(ugraph, op_info)
+        if dequant_info is not None:
+          for out_tensor, in_tensor in zip(op_info.output_tensors, dequant_info.input_tensors):
+            replace_map[out_tensor.name] = in_tensor
+          num_pairs += 1
+      elif op_info.op_type == 'Requantize':
+        requant_info = self._stacked_requantize(ugraph, op_info)
+        if requant_info is not None:
+          op_info.input_tensors = [
+            deepcopy(t_info, {'ugraph': ugraph}) for t_info in requant_info.input_tensors
+          ]
+          op_info.op_attr['Tinput'] = requant_info.op_attr['Tinput']
+          num_chains += 1
+    for op_info in ugraph.ops_info.values():
+      if any(t_info.name in replace_map for t_info in op_info.input_tensors):
+        op_info.input_tensors = [
+          deepcopy(replace_map[t_info.name], {'ugraph': ugraph})
+          if t_info.name in replace_map else t_info
+          for t_info in op_info.input_tensors
+        ]
+    num_removed = num_ops - len(self._ops_in_need(ugraph))
+    logger.info('quantization peephole: %d Dequantize/QuantizeV2 pair(s), '
+                '%d Requantize chain(s), %d op(s) removed',
+                num_pairs, num_chains, num_removed)
+    return ugraph
+
+  @classmethod
+  def _round_trip_dequantize(cls, ugraph, quant_info):
+    """The `Dequantize` op whose output is quantized again by `quant_info`
+    with its data range, or None
+    """
+    float_tensor = quant_info.input_tensors[0]
+    dequant_info = float_tensor.op
+    if dequant_info is None or dequant_info.op_type != 'Dequantize' or \
+      quant_info.name in ugraph.output_nodes:
+      return None
+    for attr_name in ['mode', 'T']:
+      if cls._attr_value(quant_info, attr_name) != cls._attr_value(dequant_info, attr_name):
+        return None
+    _, min_tensor, max_tensor = quant_info.input_tensors
+    if min_tensor.name == dequant_info.input_tensors[1].name and \
+      max_tensor.name == dequant_info.input_tensors[2].name:
+      return dequant_info
+    if cls._is_reduction_of(min_tensor, 'Min', float_tensor) and \
+      cls._is_reduction_of(max_tensor, 'Max', float_tensor):
+      return dequant_info
+    return None
+
+  @classmethod
+  def _stacked_requantize(cls, ugraph, requant_info):
+    """The `Requantize` op requantized again by `requant_info` with the
+    range of its output, or None
+    """
+    in_tensors = requant_info.input_tensors
+    prev_info = in_tensors[0].op
+    if prev_info is None or prev_info.op_type != 'Requantize' or \
+      [t_info.name for t_info in in_tensors[:3]] != \
+      [t_info.name for t_info in prev_info.output_tensors]:
+      return None
+    if not cls._is_requant_range_of(in_tensors[3:], prev_info.output_tensors) or \
+      not cls._is_requant_range_of(prev_info.input_tensors[3:], prev_info.input_tensors[:3]):
+      return None
+    return prev_info
+
+  @staticmethod
+  def _is_requant_range_of(range_tensors, tensors):
+    range_info = range_tensors[0].op
+    if range_info is None or range_info.op_type != 'RequantizationRange':
+      return False
+    if [t_info.name for t_info in range_tensors] != \
+      [t_info.name for t_info in range_info.output_tensors]:
+      return False
+    return [t_info.name for t_info in range_info.input_tensors] == \
+      [t_info.name for t_info in tensors]
+
+  @staticmethod
+  def _is_reduction_of(tensor, op_type, float_tensor):
+    """`tensor` is the `op_type` (Min/Max) of all the values of `float_tensor`
+    """
+    op_info = tensor.op
+    if op_info is None or op_info.op_type != op_type:
+      return False
+    reshape_info = op_info.input_tensors[0].op
+    if reshape_info is None or reshape_info.op_type != 'Reshape' or \
+      reshape_info.input_tensors[0].name != float_tensor.name:
+      return False
+    # reshaped to 1-D and reduced along the only axis
+    shape_info = reshape_info.input_tensors[1].op
+    axis_info = op_info.input_tensors[1].op
+    if shape_info is None or axis_info is None or \
+      shape_info.op_type != 'Const' or axis_info.op_type != 'Const':
+      return False
+    shape = shape_info.op_attr['value'].value.np_array
+    axis = axis_info.op_attr['value'].value.np_array
+    return shape.tolist() == [-1] and axis.flatten().tolist() in ([0], [-1])
+
+  @staticmethod
+  def _attr_value(op_info, attr_name):
+    value = op_info.op_attr.get(attr_name, None)
+    return getattr(value, 'value', value)
+
+  @staticmethod
+  def _ops_in_need(ugraph):
+    ops_in_need = set(ugraph.output_nodes)
+    queue = list(ugraph.output_nodes)
+    while queue:
+      op_info = ugraph.ops_info[queue.pop()]
+      for t_info in op_info.input_tensors:
+        if t_info.op_name not in ops_in_need:
+          ops_in_need.add(t_info.op_name)
+          queue.append(t_info.op_name)
+    return ops_in_need
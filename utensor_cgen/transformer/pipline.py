@@ -1,11 +1,18 @@
 from utensor_cgen.utils import NamescopedKWArgsParser
 
 from .base import Transformer
-from .cmsis_nn import CMSIS_NN_Transformer
+from .cmsis_nn import CMSIS_NN_Transformer, CMSIS_NN_WeightTransformer
+from .const_fold import ConstFoldTransformer
+from .fusion import FusionTransformer
 from .ns_transformer import (BatchNormTransformer, DropoutTransformer,
                              InlineTransformer, BiasAddTransformer)
-from .optimizer import IdOpRemoveOptimizer, RefCntOptimizer
+from .optimizer import (IdOpRemoveOptimizer, InPlaceOptimizer,
+                        QuantizePeepholeOptimizer, RefCntOptimizer,
+                        WeightDedupOptimizer)
 from .quantize import QuantizeTransformer
+from .schedule import MemoryScheduleTransformer
+from .shape_inference import ShapeInferenceTransformer
+from .stats import StatsTransformer
 from .graph_viz import GraphVizTransformer
 
 class TransformerPipeline(object):
@@ -18,8 +25,17 @@ class TransformerPipeline(object):
     InlineTransformer.METHOD_NAME: InlineTransformer,
     BiasAddTransformer.METHOD_NAME: BiasAddTransformer,
     CMSIS_NN_Transformer.METHOD_NAME: CMSIS_NN_Transformer,
+    CMSIS_NN_WeightTransformer.METHOD_NAME: CMSIS_NN_WeightTransformer,
     IdOpRemoveOptimizer.METHOD_NAME: IdOpRemoveOptimizer,
     GraphVizTransformer.METHOD_NAME: GraphVizTransformer,
+    ConstFoldTransformer.METHOD_NAME: ConstFoldTransformer,
+    MemoryScheduleTransformer.METHOD_NAME: MemoryScheduleTransformer,
+    ShapeInferenceTransformer.METHOD_NAME: ShapeInferenceTransformer,
+    FusionTransformer.METHOD_NAME: FusionTransformer,
+    WeightDedupOptimizer.METHOD_NAME: WeightDedupOptimizer,
+    InPlaceOptimizer.METHOD_NAME: InPlaceOptimizer,
+    QuantizePeepholeOptimizer.METHOD_NAME: QuantizePeepholeOptimizer,
+    StatsTransformer.METHOD_NAME: StatsTransformer,
   }
 
   def __init__(self, methods):
@@ -1,16 +1,101 @@
+import numpy as np
 from tensorflow.tools.graph_transforms import TransformGraph
 
-from utensor_cgen.ir.base import uTensorGraph
 from utensor_cgen.frontend.tensorflow import GraphDefParser
+from utensor_cgen.ir.base import TensorInfo, uTensorGraph
+from utensor_cgen.ir.converter import (AttrValueConverter,
+                                       GenericTensorConverterMixin)
+from utensor_cgen.logger import logger
 
 from .base import Transformer
 
-__all__ = ['QuantizeTransformer']
+__all__ = ['QuantizeTransformer', 'quantize_weights', 'dequantize_weights']
+
+_NUM_STEPS = 256
+
+
+def _round(values):
+  # half away from zero, as std::round
+  return np.sign(values) * np.floor(np.abs(values) + 0.5)
+
+
+def _weight_range(values, axis):
+  """ The ranges of TF `quantize_weights`, including 0.0 and not empty
+  """
+  reduce_axes = None
+  if axis is not None:
+    reduce_axes = tuple(i for i in range(values.ndim) if i != axis % values.ndim)
+  min_values = np.minimum(np.min(values, axis=reduce_axes), 0.0).astype(np.float32)
+  max_values = np.maximum(np.max(values, axis=reduce_axes), 0.0).astype(np.float32)
+  empty = min_values == max_values
+  max_values = np.where(empty & (np.abs(min_values) < 1e-6), min_values + 1.0, max_values)
+  max_values = np.where(empty & (min_values > 0), 2.0 * min_values, max_values)
+  max_values = np.where(empty & (min_values < 0), min_values / 2.0, max_values)
+  return min_values, max_values.astype(np.float32)
+
+
+def _broadcast(range_values, ndim, axis):
+  if axis is None:
+    return range_values
+  shape = [1] * ndim
+  shape[axis % ndim] = -1
+  return np.reshape(range_values, shape)
+
+
+def quantize_weights(values, axis=None):
+  """ Quantize float weights to uint8 as TF `quantize_weights` (MIN_FIRST)
+
+  values : numpy array of float
+  axis : int, the axis of the channels with a range for each channel, or
+      None for a single range of the tensor
+
+  Return
+  ------
+  (quantized values, min values, max values), the ranges are arrays of one
+  value per channel (0-D with `axis=None`)
+  """
+  values = np.asarray(values, dtype=np.float32)
+  min_values, max_values = _weight_range(values, axis)
+  range_min = _broadcast(min_values.astype(np.float64), values.ndim, axis)
+  range_max = _broadcast(max_values.astype(np.float64), values.ndim, axis)
+  range_scale = (_NUM_STEPS - 1.0) / (range_max - range_min)
+  quantized = _round(values * range_scale) - _round(range_min * range_scale)
+  quantized = np.clip(quantized, 0, _NUM_STEPS - 1).astype(np.uint8)
+  return quantized, min_values, max_values
+
+
+def dequantize_weights(quantized, min_values, max_values, axis=None):
+  """ The float values of weights quantized by `quantize_weights`
+  """
+  range_min = _broadcast(np.asarray(min_values, dtype=np.float64), quantized.ndim, axis)
+  range_max = _broadcast(np.asarray(max_values, dtype=np.float64), quantized.ndim, axis)
+  range_scale = (range_max - range_min) / (_NUM_STEPS - 1.0)
+  range_min_rounded = _round(range_min / range_scale) * range_scale
+  return (range_min_rounded + quantized.astype(np.float64) * range_scale).astype(np.float32)
+
 
 class QuantizeTransformer(Transformer):
+  """Quantize the graph with TF `quantize_weights` and `quantize_nodes`
+
+  With `per_channel=True`, the weights of QuantizedMatMul and
+  QuantizedConv2D are quantized again from the float weights with a range
+  for each output channel: the min/max tensors of the weights have one
+  value per channel and the ops are marked with `per_channel`. The RMS
+  error of the dequantized weights, with the single range and with the
+  ranges per channel, is logged for each weight
+  """
 
   METHOD_NAME = 'quantize'
   KWARGS_NAMESCOPE = '_quantize'
+  # op type -> function of the op returning the axis of the output
+  # channels of the weights (input 1), min/max of the weights are input 4/5
+  PER_CHANNEL_OP_TYPES = {
+    'QuantizedMatMul': lambda op_info: 0 if _attr_value(op_info, 'transpose_b', False) else 1,
+    'QuantizedConv2D': lambda op_info: 3,
+  }
+
+  def __init__(self, per_channel=False, **kwargs):
+    self.per_channel = per_channel
 
   def transform(self, ugraph):
     #import pdb; pdb.set_trace()
@@ -19,5 +104,109 @@ class QuantizeTransformer(Transformer):
                                      inputs=[],
                                      outputs=ugraph.output_nodes,
                                      transforms=["quantize_weights", "quantize_nodes"])
-    return GraphDefParser.parse(quant_graph_def,
-                                output_nodes=ugraph.output_nodes)
+    quant_ugraph = GraphDefParser.parse(quant_graph_def,
+                                        output_nodes=ugraph.output_nodes)
+    if self.per_channel:
+      self._quantize_per_channel(ugraph, quant_ugraph)
+    return quant_ugraph
+
+  def _quantize_per_channel(self, float_ugraph, quant_ugraph):
+    # weight name -> axis
+    weight_axes = {}
+    for op_info in quant_ugraph.ops_info.values():
+      get_axis = self.PER_CHANNEL_OP_TYPES.get(op_info.op_type, None)
+      if get_axis is None:
+        continue
+      weight_ops = self._weight_ops(float_ugraph, quant_ugraph, op_info)
+      if weight_ops is None:
+        continue
+      axis = get_axis(op_info)
+      name = weight_ops[0].name
+      if weight_axes.setdefault(name, axis) != axis:
+        logger.warning('%s is read on different channel axes, keep a single range', name)
+        weight_axes[name] = None
+    for op_info in quant_ugraph.ops_info.values():
+      if op_info.op_type not in self.PER_CHANNEL_OP_TYPES:
+        continue
+      weight_ops = self._weight_ops(float_ugraph, quant_ugraph, op_info)
+      if weight_ops is None or weight_axes.get(weight_ops[0].name, None) is None:
+        continue
+      op_info.op_attr['%s__per_channel' % self.KWARGS_NAMESCOPE] = True
+    for name, axis in weight_axes.items():
+      if axis is not None:
+        self._requantize_weight(float_ugraph, quant_ugraph, name, axis)
+
+  @staticmethod
+  def _weight_ops(float_ugraph, quant_ugraph, op_info):
+    """ (float weight op, quantized weight op, min op, max op) or None
+    """
+    weight_op = op_info.input_tensors[1].op
+    if weight_op is None or weight_op.op_type != 'Const' or \
+      not weight_op.name.endswith('_quantized_const'):
+      return None
+    name = weight_op.name[:-len('_quantized_const')]
+    float_op = float_ugraph.ops_info.get(name, None)
+    if float_op is None or float_op.op_type != 'Const':
+      return None
+    min_op = op_info.input_tensors[4].op
+    max_op = op_info.input_tensors[5].op
+    if min_op is None or max_op is None or \
+      min_op.name != name + '_quantized_min' or \
+      max_op.name != name + '_quantized_max':
+      return None
+    return float_op, weight_op, min_op, max_op
+
+  def _requantize_weight(self, float_ugraph, quant_ugraph, name, axis):
+    float_op = float_ugraph.ops_info[name]
+    weight_op = quant_ugraph.ops_info[name + '_quantized_const']
+    min_op = quant_ugraph.ops_info[name + '_quantized_min']
+    max_op = quant_ugraph.ops_info[name + '_quantized_max']
+    values = float_op.op_attr['value'].value.np_array
+    quantized, min_values, max_values = quantize_weights(values, axis)
+    # numpy reference of the accuracy delta
+    tensor_error = self._rms_error(values, *quantize_weights(values))
+    channel_error = self._rms_error(values, quantized, min_values, max_values, axis)
+    logger.info('per-channel quantization of %s (%d channels): rms error %.3g -> %.3g',
+                name, min_values.size, tensor_error, channel_error)
+    self._set_value(weight_op, quantized)
+    self._set_value(min_op, min_values)
+    self._set_value(max_op, max_values)
+
+  @staticmethod
+  def _rms_error(values, quantized, min_values, max_values, axis=None):
+    deq_values = dequantize_weights(quantized, min_values, max_values, axis)
+    return float(np.sqrt(np.mean(np.square(deq_values - values))))
+
+  @staticmethod
+  def _set_value(op_info, np_array):
+    """ Replace the value of a Const op and the shape of its output
+    tensor, in the tensor infos of the op and of its readers
+    """
+    ugraph = op_info.ugraph
+    op_info.op_attr['value'] = AttrValueConverter.GenericType(
+      value_name='tensor',
+      value=GenericTensorConverterMixin.GenericType(
+        np_array=np_array,
+        dtype=op_info.op_attr['value'].value.dtype
+      )
+    )
+    out_name = op_info.output_tensors[0].name
+    for other in [op_info] + op_info.output_nodes:
+      tensors_attr = 'output_tensors' if other is op_info else 'input_tensors'
+      setattr(other, tensors_attr, [
+        TensorInfo.make_unchecked(name=t_info.name,
+                                  op_name=t_info.op_name,
+                                  dtype=t_info.dtype,
+                                  shape=list(np_array.shape),
+                                  ugraph=t_info.ugraph)
+        if t_info.name == out_name else t_info
+        for t_info in getattr(other, tensors_attr)
+      ])
+      ugraph.mark_dirty(other.name)
+
+
+def _attr_value(op_info, attr_name, default=None):
+  value = op_info.op_attr.get(attr_name, None)
+  if value is None:
+    return default
+  return value.value
@@ -0,0 +1,258 @@
+# -*- coding:utf8 -*-
+r"""Memory Scheduling Transformer
+
+Reorder the ops of the graph so that the peak size of live activation
+tensors is minimized
+"""
+import heapq
+from collections import defaultdict
+
+from utensor_cgen.logger import logger
+from utensor_cgen.utils import parse_tensor_name
+
+from .base import Transformer
+
+__all__ = ["MemoryScheduleTransformer", "peak_memory"]
+
+# ops whose outputs are stored in ROM or loaded as weights,
+# which are not counted as activations
+_ROM_OP_TYPES = ('Const', 'Inline')
+
+
+class _MemoryModel(object):
+  """Bookkeeping of tensor sizes and consumers of a graph
+  """
+
+  def __init__(self, ugraph):
+    self.ops = list(ugraph.topo_order)
+    self.index = dict((name, i) for i, name in enumerate(self.ops))
+    # op index -> input op indices
+    self.deps = []
+    # op index -> indices of the ops reading its outputs
+    self.users = [[] for _ in self.ops]
+    # op index -> bytes allocated when the op is evaluated
+    self.alloc = []
+    # op index -> names of the input tensors
+    self.inputs = []
+    # tensor name -> bytes
+    self.tensor_bytes = {}
+    # tensor name -> indices of consumer ops
+    self.consumers = defaultdict(set)
+    for idx, name in enumerate(self.ops):
+      op_info = ugraph.ops_info[name]
+      in_tnames = []
+      for t_info in op_info.input_tensors:
+        if t_info.name not in in_tnames:
+          in_tnames.append(t_info.name)
+        self.consumers[t_info.name].add(idx)
+      self.inputs.append(in_tnames)
+      deps = set(self.index[parse_tensor_name(tname)[0]]
+                 for tname in in_tnames)
+      self.deps.append(deps)
+      for dep in deps:
+        self.users[dep].append(idx)
+      is_rom = op_info.op_type in _ROM_OP_TYPES
+      alloc = 0
+      for t_info in op_info.output_tensors:
+        nbytes = 0 if is_rom else (t_info.nbytes or 0)
+        self.tensor_bytes[t_info.name] = nbytes
+        alloc += nbytes
+      self.alloc.append(alloc)
+    # tensors of output nodes are never freed
+    self.pinned = set(
+      t_info.name
+      for name in ugraph.output_nodes
+      for t_info in ugraph.ops_info[name].output_tensors
+    )
+    # op index -> bytes of outputs never consumed, freed right after evaluation
+    self.unused = [
+      sum(self.tensor_bytes[t_info.name]
+          for t_info in ugraph.ops_info[name].output_tensors
+          if t_info.name not in self.consumers and
+          t_info.name not in self.pinned)
+      for name in self.ops
+    ]
+
+  def num_consumers(self):
+    """tensor name -> number of consumer ops, the counters of
+    `freed_bytes` and `consume`
+    """
+    return dict((tname, len(idxs)) for tname, idxs in self.consumers.items())
+
+  def freed_bytes(self, remaining, idx):
+    """Bytes freed by evaluating op `idx`, where `remaining` is the number
+    of consumers of each tensor not evaluated yet
+    """
+    freed = self.unused[idx]
+    for tname in self.inputs[idx]:
+      if remaining[tname] == 1 and tname not in self.pinned:
+        freed += self.tensor_bytes.get(tname, 0)
+    return freed
+
+  def consume(self, remaining, idx):
+    """Update the counters of `freed_bytes` after evaluating op `idx`
+
+    Return the tensors with only one consumer left
+    """
+    last_used = []
+    for tname in self.inputs[idx]:
+      remaining[tname] -= 1
+      if remaining[tname] == 1:
+        last_used.append(tname)
+    return last_used
+
+  def peak(self, order):
+    """Return the peak live bytes of evaluating ops in given order
+    """
+    remaining = self.num_consumers()
+    live = 0
+    peak = 0
+    for name in order:
+      idx = self.index[name]
+      peak = max(peak, live + self.alloc[idx])
+      live += self.alloc[idx] - self.freed_bytes(remaining, idx)
+      self.consume(remaining, idx)
+    return peak
+
+
+def peak_memory(ugraph, order=None):
+  """Peak live activation bytes of the graph
+
+  Tensors generated by Const/Inline ops are not counted and tensors of
+  output nodes are never freed.
+
+  Parameters
+  ----------
+  ugraph : uTensorGraph
+  order : list
+      the order of op names to evaluate, default to `ugraph.topo_order`
+  """
+  if order is None:
+    order = ugraph.topo_order
+  return _MemoryModel(ugraph).peak(order)
+
+
+class MemoryScheduleTransformer(Transformer):
+  """Memory Scheduling
+
+  Find a topological order of the ops minimizing the peak size of live
+  activation tensors. A greedy list scheduler, which picks the ready op
+  with the least memory growth, is always run. If the number of partial
+  schedules stays below `max_states`, an exact dynamic programming over
+  the sets of scheduled ops is run as well. The best order is saved as
+  `topo_order` of the graph, which will be followed by the later
+  transformers and the code generator.
+  """
+  METHOD_NAME = 'schedule'
+  KWARGS_NAMESCOPE = '_utensor_schedule'
+
+  def __init__(self, max_states=10000, **kwargs):
+    self.prune_graph = False
+    self.max_states = max_states
+
+  def transform(self, ugraph):
+    model = _MemoryModel(ugraph)
+    ori_peak = model.peak(model.ops)
+    best_order, best_peak = model.ops, ori_peak
+    candidates = [self._greedy_schedule(model)]
+    candidates.append(self._dp_schedule(model, self.max_states))
+    for order in candidates:
+      if order is None:
+        continue
+      peak = model.peak(order)
+      if peak < best_peak:
+        best_order, best_peak = order, peak
+    ugraph.topo_order = list(best_order)
+    logger.info('peak activation memory: %d bytes -> %d bytes',
+                ori_peak, best_peak)
+    return ugraph
+
+  @staticmethod
+  def _greedy_schedule(model):
+    num_deps = [len(deps) for deps in model.deps]
+    remaining = model.num_consumers()
+    scheduled = [False] * len(model.ops)
+    # ready op index -> its current key
+    keys = {}
+    ready = []
+
+    def push(idx):
+      # least memory growth first, ties broken by the original order
+      keys[idx] = model.alloc[idx] - model.freed_bytes(remaining, idx)
+      heapq.heappush(ready, (keys[idx], idx))
+
+    for idx, num in enumerate(num_deps):
+      if num == 0:
+        push(idx)
+    order = []
+    while ready:
+      key, idx = heapq.heappop(ready)
+      # skip the outdated entries
+      if scheduled[idx] or keys[idx] != key:
+        continue
+      scheduled[idx] = True
+      order.append(model.ops[idx])
+      # the last consumer of a tensor frees it, its key changes
+      for tname in model.consume(remaining, idx):
+        for other in model.consumers[tname]:
+          if not scheduled[other] and other in keys:
+            push(other)
+      for user in model.users[idx]:
+        num_deps[user] -= 1
+        if num_deps[user] == 0:
+          push(user)
+    return order
+
+  @staticmethod
+  def _dp_schedule(model, max_states):
+    """Dynamic programming over the sets of scheduled ops
+
+    Return None if the number of states exceeds `max_states`
+    """
+    # there is at least one state for each number of scheduled ops
+    if len(model.ops) + 1 > max_states:
+      logger.info('too many states for memory scheduling, fallback to greedy scheduling')
+      return None
+
+    def freed_bytes(scheduled, idx):
+      freed = model.unused[idx]
+      for tname in model.inputs[idx]:
+        if tname in model.pinned:
+          continue
+        if all(i == idx or i in scheduled for i in model.consumers[tname]):
+          freed += model.tensor_bytes.get(tname, 0)
+      return freed
+
+    init_ready = tuple(idx for idx, deps in enumerate(model.deps) if not deps)
+    # scheduled set -> (peak so far, live bytes, previous set, last op, ready ops)
+    states = {frozenset(): (0, 0, None, None, init_ready)}
+    history = []
+    n_states = 1
+    for _ in range(len(model.ops)):
+      new_states = {}
+      for scheduled, (peak, live, _, _, ready) in states.items():
+        for idx in ready:
+          new_peak = max(peak, live + model.alloc[idx])
+          new_scheduled = scheduled.union((idx,))
+          is_new = new_scheduled not in new_states
+          if is_new and n_states + len(new_states) >= max_states:
+            logger.info('too many states for memory scheduling, fallback to greedy scheduling')
+            return None
+          if is_new or new_states[new_scheduled][0] > new_peak:
+            new_live = live + model.alloc[idx] - freed_bytes(scheduled, idx)
+            new_ready = tuple(sorted(
+              [i for i in ready if i != idx] +
+              [user for user in model.users[idx] if model.deps[user] <= new_scheduled]
+            ))
+            new_states[new_scheduled] = (new_peak, new_live, scheduled, idx, new_ready)
+      n_states += len(new_states)
+      history.append(states)
+      states = new_states
+    # backtrack from the full set
+    _, _, prev, idx, _ = list(states.values())[0]
+    order = []
+    while prev is not None:
+      order.append(model.ops[idx])
+      states = history.pop()
+      _, _, prev, idx, _ = states[prev]
+    return order[::-1]
@@ -0,0 +1,384 @@
+# -*- coding:utf8 -*-
+r"""Shape Inference Transformer
+
+Propagate tensor shapes and dtypes through the graph with per-op
+inference rules, starting from the user-supplied input shapes
+"""
+import numpy as np
+
+from utensor_cgen.ir.converter import (AttrValueConverter,
+                                       TensorShapeConverter)
+from utensor_cgen.logger import logger
+
+from .base import Transformer
+
+__all__ = ["ShapeInferenceTransformer", "register_shape_rule"]
+
+_SHAPE_RULES = {}
+
+
+def register_shape_rule(*op_types):
+  """Register a shape inference rule for given op types
+
+  A rule is a function with signature `func(op_info, in_shapes, in_values)`
+  which returns a list of shapes, one for each output tensor. `in_values`
+  are the numpy arrays of constant inputs and None for others. A shape
+  may be None or contain None if it can not be inferred.
+  """
+  def register(func):
+    for op_type in op_types:
+      _SHAPE_RULES[op_type] = func
+    return func
+  return register
+
+
+def _get_attr(op_info, key, default=None):
+  if key not in op_info.op_attr:
+    return default
+  return op_info.op_attr[key].value
+
+
+def _get_str_attr(op_info, key, default=None):
+  value = _get_attr(op_info, key, default)
+  if isinstance(value, bytes):
+    value = value.decode('utf8')
+  return value
+
+
+def _broadcast(shape_a, shape_b):
+  if shape_a is None or shape_b is None:
+    return None
+  ndims = max(len(shape_a), len(shape_b))
+  shape_a = [1] * (ndims - len(shape_a)) + list(shape_a)
+  shape_b = [1] * (ndims - len(shape_b)) + list(shape_b)
+  shape = []
+  for a, b in zip(shape_a, shape_b):
+    if a == 1:
+      shape.append(b)
+    elif b == 1:
+      shape.append(a)
+    elif a is None:
+      shape.append(b)
+    else:
+      shape.append(a)
+  return shape
+
+
+@register_shape_rule(
+  'Identity', 'Relu', 'Relu6', 'Tanh', 'Sigmoid', 'Softmax', 'Neg', 'Exp',
+  'Sqrt', 'Rsqrt', 'Square', 'Cast', 'Dequantize', 'Dropout'
+)
+def _same_shape(op_info, in_shapes, in_values):
+  return [in_shapes[0]]
+
+
+@register_shape_rule('QuantizeV2', 'QuantizedRelu', 'QuantizedRelu6', 'Requantize')
+def _quantized_same_shape(op_info, in_shapes, in_values):
+  return [in_shapes[0], [], []]
+
+
+@register_shape_rule('RequantizationRange')
+def _requant_range(op_info, in_shapes, in_values):
+  return [[], []]
+
+
+@register_shape_rule('Add', 'Sub', 'Mul', 'RealDiv', 'FloorDiv', 'Maximum', 'Minimum')
+def _binary_op(op_info, in_shapes, in_values):
+  return [_broadcast(in_shapes[0], in_shapes[1])]
+
+
+@register_shape_rule('QuantizedAdd', 'QuantizedMul')
+def _quantized_binary_op(op_info, in_shapes, in_values):
+  return [_broadcast(in_shapes[0], in_shapes[1]), [], []]
+
+
+def _matmul_shape(op_info, in_shapes):
+  shape_a, shape_b = in_shapes[:2]
+  if shape_a is None or shape_b is None:
+    return None
+  m = shape_a[0]
+  if _get_attr(op_info, 'transpose_a', False):
+    m = shape_a[1]
+  n = shape_b[1]
+  if _get_attr(op_info, 'transpose_b', False):
+    n = shape_b[0]
+  return [m, n]
+
+
+@register_shape_rule('MatMul')
+def _matmul(op_info, in_shapes, in_values):
+  return [_matmul_shape(op_info, in_shapes)]
+
+
+@register_shape_rule('QuantizedMatMul')
+def _quantized_matmul(op_info, in_shapes, in_values):
+  return [_matmul_shape(op_info, in_shapes), [], []]
+
+
+def _conv_out_dim(in_dim, kernel, stride, padding):
+  if in_dim is None or kernel is None:
+    return None
+  if padding == 'SAME':
+    return (in_dim + stride - 1) // stride
+  return (in_dim - kernel + stride) // stride
+
+
+def _window_shape(op_info, in_shape, kernel_hw, out_channels):
+  if in_shape is None or len(in_shape) != 4:
+    return None
+  if _get_str_attr(op_info, 'data_format', 'NHWC') != 'NHWC':
+    return None
+  strides = _get_attr(op_info, 'strides').ints_value
+  padding = _get_str_attr(op_info, 'padding')
+  return [
+    in_shape[0],
+    _conv_out_dim(in_shape[1], kernel_hw[0], strides[1], padding),
+    _conv_out_dim(in_shape[2], kernel_hw[1], strides[2], padding),
+    out_channels,
+  ]
+
+
+def _conv_shape(op_info, in_shapes):
+  in_shape, filter_shape = in_shapes[:2]
+  if filter_shape is None:
+    return None
+  # filter: [height, width, in_channels, out_channels]
+  return _window_shape(op_info, in_shape, filter_shape[:2], filter_shape[3])
+
+
+@register_shape_rule('Conv2D')
+def _conv2d(op_info, in_shapes, in_values):
+  return [_conv_shape(op_info, in_shapes)]
+
+
+@register_shape_rule('QuantizedConv2D')
+def _quantized_conv2d(op_info, in_shapes, in_values):
+  return [_conv_shape(op_info, in_shapes), [], []]
+
+
+def _pool_shape(op_info, in_shapes):
+  in_shape = in_shapes[0]
+  ksize = _get_attr(op_info, 'ksize').ints_value
+  channels = in_shape[3] if in_shape is not None and len(in_shape) == 4 else None
+  return _window_shape(op_info, in_shape, ksize[1:3], channels)
+
+
+@register_shape_rule('MaxPool', 'AvgPool')
+def _pool(op_info, in_shapes, in_values):
+  return [_pool_shape(op_info, in_shapes)]
+
+
+@register_shape_rule('QuantizedMaxPool', 'QuantizedAvgPool')
+def _quantized_pool(op_info, in_shapes, in_values):
+  return [_pool_shape(op_info, in_shapes), [], []]
+
+
+def _reshape_shape(in_shape, new_shape):
+  if new_shape is None:
+    return None
+  new_shape = [int(d) for d in new_shape.flatten()]
+  if -1 in new_shape:
+    if in_shape is None or None in in_shape:
+      return [d if d != -1 else None for d in new_shape]
+    known = int(np.prod([d for d in new_shape if d != -1]))
+    size = int(np.prod(in_shape))
+    new_shape[new_shape.index(-1)] = size // known if known else 0
+  return new_shape
+
+
+@register_shape_rule('Reshape')
+def _reshape(op_info, in_shapes, in_values):
+  return [_reshape_shape(in_shapes[0], in_values[1])]
+
+
+@register_shape_rule('QuantizedReshape')
+def _quantized_reshape(op_info, in_shapes, in_values):
+  return [_reshape_shape(in_shapes[0], in_values[1]), [], []]
+
+
+def _normalize_axis(axis, ndims):
+  return [a + ndims if a < 0 else a for a in np.array(axis).flatten().tolist()]
+
+
+@register_shape_rule('Max', 'Min', 'Sum', 'Prod', 'Mean')
+def _reduce(op_info, in_shapes, in_values):
+  in_shape, axis = in_shapes[0], in_values[1]
+  if in_shape is None or axis is None:
+    return [None]
+  axis = _normalize_axis(axis, len(in_shape))
+  if _get_attr(op_info, 'keep_dims', False):
+    return [[1 if i in axis else d for i, d in enumerate(in_shape)]]
+  return [[d for i, d in enumerate(in_shape) if i not in axis]]
+
+
+@register_shape_rule('ArgMax', 'ArgMin')
+def _arg_reduce(op_info, in_shapes, in_values):
+  in_shape, axis = in_shapes[0], in_values[1]
+  if in_shape is None or axis is None:
+    return [None]
+  axis = _normalize_axis(axis, len(in_shape))
+  return [[d for i, d in enumerate(in_shape) if i not in axis]]
+
+
+@register_shape_rule('Shape')
+def _shape(op_info, in_shapes, in_values):
+  if in_shapes[0] is None:
+    return [[None]]
+  return [[len(in_shapes[0])]]
+
+
+@register_shape_rule('Size', 'Rank')
+def _scalar(op_info, in_shapes, in_values):
+  return [[]]
+
+
+@register_shape_rule('Pack')
+def _pack(op_info, in_shapes, in_values):
+  in_shape = in_shapes[0]
+  if in_shape is None:
+    return [None]
+  axis = _get_attr(op_info, 'axis', 0)
+  if axis < 0:
+    axis += len(in_shape) + 1
+  shape = list(in_shape)
+  shape.insert(axis, len(in_shapes))
+  return [shape]
+
+
+@register_shape_rule('ConcatV2')
+def _concat(op_info, in_shapes, in_values):
+  axis = in_values[-1]
+  in_shapes = in_shapes[:-1]
+  if axis is None or any(shape is None for shape in in_shapes):
+    return [None]
+  axis = _normalize_axis(axis, len(in_shapes[0]))[0]
+  shape = list(in_shapes[0])
+  dims = [s[axis] for s in in_shapes]
+  shape[axis] = None if None in dims else sum(dims)
+  return [shape]
+
+
+@register_shape_rule('ExpandDims')
+def _expand_dims(op_info, in_shapes, in_values):
+  in_shape, axis = in_shapes[0], in_values[1]
+  if in_shape is None or axis is None:
+    return [None]
+  axis = int(axis)
+  if axis < 0:
+    axis += len(in_shape) + 1
+  shape = list(in_shape)
+  shape.insert(axis, 1)
+  return [shape]
+
+
+@register_shape_rule('Squeeze')
+def _squeeze(op_info, in_shapes, in_values):
+  in_shape = in_shapes[0]
+  if in_shape is None:
+    return [None]
+  axis = _get_attr(op_info, 'squeeze_dims', None)
+  axis = axis.ints_value if axis is not None else []
+  if not axis:
+    if None in in_shape:
+      return [None]
+    return [[d for d in in_shape if d != 1]]
+  axis = _normalize_axis(axis, len(in_shape))
+  return [[d for i, d in enumerate(in_shape) if i not in axis]]
+
+
+@register_shape_rule('Transpose')
+def _transpose(op_info, in_shapes, in_values):
+  in_shape, perm = in_shapes[0], in_values[1]
+  if in_shape is None or perm is None:
+    return [None]
+  return [[in_shape[i] for i in perm.tolist()]]
+
+
+class ShapeInferenceTransformer(Transformer):
+  """Shape Inference
+
+  Infer the shapes of all tensors in topological order. The shapes of
+  placeholders can be given with `input_shapes`, a dict mapping the
+  placeholder (op or tensor) names to their shapes. Inferred dimensions
+  only fill in the unknown ones, and the input tensors of the consumers
+  are kept in sync with the output tensors of their producers.
+  """
+  METHOD_NAME = 'infer_shape'
+  KWARGS_NAMESCOPE = '_utensor_infer_shape'
+  CONST_OP_TYPES = ('Const', 'Inline')
+
+  def __init__(self, input_shapes=None, **kwargs):
+    self.prune_graph = False
+    self.input_shapes = dict(input_shapes or {})
+
+  def transform(self, ugraph):
+    # tensor name -> TensorInfo of its producer
+    out_tensors = {}
+    for op_name in ugraph.topo_order:
+      op_info = ugraph.ops_info[op_name]
+      # sync the input tensors with the outputs of their producers
+      for t_info in op_info.input_tensors:
+        src_tensor = out_tensors.get(t_info.name, None)
+        if src_tensor is not None:
+          t_info.shape = self._merge_shape(t_info.shape, src_tensor.shape)
+          t_info.dtype = src_tensor.dtype
+      for t_info, shape in zip(op_info.output_tensors,
+                               self._infer_shapes(ugraph, op_info)):
+        if op_info.op_type == 'Placeholder':
+          # user-supplied shapes override the shapes in the graph
+          t_info.shape = shape
+        else:
+          t_info.shape = self._merge_shape(t_info.shape, shape)
+        out_tensors[t_info.name] = t_info
+      if op_info.op_type == 'Placeholder' and 'shape' in op_info.op_attr:
+        # a new attr value, the cached NodeDef of the op is outdated
+        op_info.op_attr['shape'] = AttrValueConverter.GenericType(
+          value_name='shape',
+          value=TensorShapeConverter.GenericType(
+            list_view=op_info.output_tensors[0].shape
+          )
+        )
+    unknowns = [
+      t_info.name
+      for t_info in out_tensors.values()
+      if t_info.shape is None or None in t_info.shape
+    ]
+    if unknowns:
+      logger.warning('shape inference: unknown shapes remain for %s', unknowns)
+    return ugraph
+
+  def _infer_shapes(self, ugraph, op_info):
+    if op_info.op_type == 'Placeholder':
+      out_tensor = op_info.output_tensors[0]
+      shape = self.input_shapes.get(op_info.name,
+                                    self.input_shapes.get(out_tensor.name, None))
+      if shape is not None:
+        return [[int(d) for d in shape]]
+      return [out_tensor.shape]
+    if op_info.op_type in self.CONST_OP_TYPES:
+      return [list(op_info.op_attr['value'].value.np_array.shape)]
+    rule = _SHAPE_RULES.get(op_info.op_type, None)
+    if rule is None:
+      return [t_info.shape for t_info in op_info.output_tensors]
+    in_shapes = [t_info.shape for t_info in op_info.input_tensors]
+    in_values = [self._const_value(ugraph, t_info) for t_info in op_info.input_tensors]
+    return rule(op_info, in_shapes, in_values)
+
+  @classmethod
+  def _const_value(cls, ugraph, t_info):
+    in_op = ugraph.ops_info.get(t_info.op_name, None)
+    if in_op is None or in_op.op_type not in cls.CONST_OP_TYPES:
+      return None
+    return in_op.op_attr['value'].value.np_array
+
+  @staticmethod
+  def _merge_shape(shape, new_shape):
+    """Fill in the unknown dimensions of `shape` with `new_shape`
+    """
+    if new_shape is None:
+      return shape
+    new_shape = [int(d) if d is not None else None for d in new_shape]
+    if shape is None or len(shape) != len(new_shape):
+      return new_shape
+    return [d if d is not None else new_d
+            for d, new_d in zip(shape, new_shape)]
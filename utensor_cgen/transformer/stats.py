@@ -0,0 +1,261 @@
+# -*- coding:utf8 -*-
+r"""Graph Statistics
+
+A cost model over uTensorGraph: MACs/FLOPs, parameter bytes and
+activation bytes of each op and of the whole graph
+"""
+from collections import defaultdict
+
+import attr
+import numpy as np
+
+from utensor_cgen.logger import logger
+
+from .base import Transformer
+from .schedule import peak_memory
+
+__all__ = ["StatsTransformer", "OpStats", "GraphStats", "graph_stats",
+           "register_macs", "format_stats"]
+
+_MACS_COUNTERS = {}
+# ops whose outputs are weights
+_PARAM_OP_TYPES = ('Const', 'Inline')
+# ops costing one FLOP per output element
+_ELEMWISE_OP_TYPES = (
+  'Add', 'BiasAdd', 'Sub', 'Mul', 'RealDiv', 'Maximum', 'Minimum',
+  'Relu', 'Relu6', 'Sigmoid', 'Tanh', 'Sqrt', 'Rsqrt', 'Neg', 'Square',
+  'QuantizedAdd', 'QuantizedBiasAdd', 'QuantizedRelu', 'QuantizedRelu6',
+)
+
+
+def register_macs(*op_types):
+  """Register a MACs counter for given op types
+
+  A counter is a function with signature `func(op_info)` which returns
+  the number of multiply-accumulates of the op, or None if unknown.
+  Unknown dimensions are counted as 1
+  """
+  def register(func):
+    for op_type in op_types:
+      _MACS_COUNTERS[op_type] = func
+    return func
+  return register
+
+
+def _dims(t_info):
+  if t_info.shape is None:
+    return None
+  return [d if d is not None else 1 for d in t_info.shape]
+
+
+def _prod(values):
+  return int(np.prod(values, dtype=np.int64))
+
+
+def _get_attr(op_info, key, default=None):
+  if key not in op_info.op_attr:
+    return default
+  return op_info.op_attr[key].value
+
+
+@register_macs('Conv2D', 'QuantizedConv2D',
+               'FusedConv2DBiasRelu', 'QuantizedFusedConv2DBiasRelu')
+def _conv2d_macs(op_info):
+  out_dims = _dims(op_info.output_tensors[0])
+  filter_dims = _dims(op_info.input_tensors[1])
+  if out_dims is None or filter_dims is None:
+    return None
+  kernel_h, kernel_w, in_channels, _ = filter_dims
+  return _prod(out_dims) * kernel_h * kernel_w * in_channels
+
+
+@register_macs('DepthwiseConv2dNative')
+def _depthwise_conv2d_macs(op_info):
+  out_dims = _dims(op_info.output_tensors[0])
+  filter_dims = _dims(op_info.input_tensors[1])
+  if out_dims is None or filter_dims is None:
+    return None
+  kernel_h, kernel_w, _, _ = filter_dims
+  return _prod(out_dims) * kernel_h * kernel_w
+
+
+@register_macs('MatMul', 'QuantizedMatMul',
+               'FusedMatMulBiasRelu', 'QuantizedFusedMatMulBiasRelu')
+def _matmul_macs(op_info):
+  out_dims = _dims(op_info.output_tensors[0])
+  a_dims = _dims(op_info.input_tensors[0])
+  if out_dims is None or a_dims is None:
+    return None
+  inner = a_dims[0] if _get_attr(op_info, 'transpose_a', False) else a_dims[-1]
+  return _prod(out_dims) * inner
+
+
+@register_macs('CMSIS_NN_FC')
+def _cmsis_nn_fc_macs(op_info):
+  # the output is in1 * in0
+  out_dims = _dims(op_info.output_tensors[0])
+  in0_dims = _dims(op_info.input_tensors[0])
+  if out_dims is None or in0_dims is None:
+    return None
+  return _prod(out_dims) * in0_dims[0]
+
+
+@attr.s
+class OpStats(object):
+  """
+  name : str
+  op_type : str
+  macs : int, multiply-accumulates, None if unknown
+  flops : int, floating point (or fixed point) operations, None if unknown
+  param_bytes : dict, bytes of weights by data type
+  activation_bytes : int, bytes of the output tensors
+  """
+  name = attr.ib()
+  op_type = attr.ib()
+  macs = attr.ib(default=None)
+  flops = attr.ib(default=None)
+  param_bytes = attr.ib(factory=dict)
+  activation_bytes = attr.ib(default=0)
+
+
+@attr.s
+class GraphStats(object):
+  """
+  ops : list of OpStats, in topological order
+  peak_activation_bytes : int, see `utensor_cgen.transformer.schedule.peak_memory`
+  """
+  ops = attr.ib(factory=list)
+  peak_activation_bytes = attr.ib(default=0)
+
+  @property
+  def macs(self):
+    return sum(op.macs or 0 for op in self.ops)
+
+  @property
+  def flops(self):
+    return sum(op.flops or 0 for op in self.ops)
+
+  @property
+  def param_bytes(self):
+    """Total bytes of weights by data type
+    """
+    totals = defaultdict(int)
+    for op in self.ops:
+      for dtype, nbytes in op.param_bytes.items():
+        totals[dtype] += nbytes
+    return dict(totals)
+
+  @property
+  def activation_bytes(self):
+    return sum(op.activation_bytes for op in self.ops)
+
+  def to_dict(self):
+    return {
+      'macs': self.macs,
+      'flops': self.flops,
+      'param_bytes': self.param_bytes,
+      'activation_bytes': self.activation_bytes,
+      'peak_activation_bytes': self.peak_activation_bytes,
+      'ops': [attr.asdict(op) for op in self.ops],
+    }
+
+
+def _dtype_name(dtype):
+  """Name of the data type in generated code
+  """
+  # import here to avoid circular import with the backend
+  from utensor_cgen.backend.snippets._types import NP_TYPES_MAP
+
+  if dtype in NP_TYPES_MAP:
+    return NP_TYPES_MAP[dtype].tensor_type_str
+  return dtype.name
+
+
+def _op_stats(op_info):
+  stats = OpStats(name=op_info.name, op_type=op_info.op_type)
+  if op_info.op_type in _PARAM_OP_TYPES:
+    for t_info in op_info.output_tensors:
+      nbytes = t_info.nbytes
+      if nbytes is None or None in t_info.shape:
+        nbytes = op_info.op_attr['value'].value.np_array.nbytes
+      dtype = _dtype_name(t_info.dtype)
+      stats.param_bytes[dtype] = stats.param_bytes.get(dtype, 0) + nbytes
+    return stats
+  stats.activation_bytes = sum(t_info.nbytes or 0 for t_info in op_info.output_tensors)
+  counter = _MACS_COUNTERS.get(op_info.op_type, None)
+  if counter is not None:
+    stats.macs = counter(op_info)
+    if stats.macs is not None:
+      stats.flops = 2 * stats.macs
+      if 'BiasRelu' in op_info.op_type:
+        # bias add and relu
+        stats.flops += 2 * (op_info.output_tensors[0].size or 0)
+  elif op_info.op_type in _ELEMWISE_OP_TYPES:
+    stats.macs = 0
+    stats.flops = op_info.output_tensors[0].size
+  return stats
+
+
+def graph_stats(ugraph):
+  """Compute the statistics of the graph
+
+  Return
+  ------
+  stats : GraphStats
+  """
+  return GraphStats(
+    ops=[_op_stats(ugraph.ops_info[name]) for name in ugraph.topo_order],
+    peak_activation_bytes=peak_memory(ugraph)
+  )
+
+
+def format_stats(stats, per_op=False):
+  """Format the statistics as a text table
+  """
+  lines = []
+  if per_op:
+    tmpl = '{:<40} {:<24} {:>14} {:>14} {:>12} {:>12}'
+    lines.append(tmpl.format('op_name', 'op_type', 'MACs', 'FLOPs',
+                             'params(B)', 'act(B)'))
+    for op in stats.ops:
+      lines.append(tmpl.format(
+        op.name, op.op_type,
+        '-' if op.macs is None else op.macs,
+        '-' if op.flops is None else op.flops,
+        sum(op.param_bytes.values()), op.activation_bytes
+      ))
+    lines.append('')
+  lines.append('ops: {}'.format(len(stats.ops)))
+  lines.append('MACs: {}'.format(stats.macs))
+  lines.append('FLOPs: {}'.format(stats.flops))
+  param_bytes = stats.param_bytes
+  lines.append('parameter bytes: {} ({})'.format(
+    sum(param_bytes.values()),
+    ', '.join('{}: {}'.format(k, v) for k, v in sorted(param_bytes.items()))
+  ))
+  lines.append('activation bytes: {}'.format(stats.activation_bytes))
+  lines.append('peak activation bytes: {}'.format(stats.peak_activation_bytes))
+  return '\n'.join(lines)
+
+
+class StatsTransformer(Transformer):
+  """Graph Statistics
+
+  Log the statistics of the graph, which is returned unchanged.
+  Put it between the stages of the pipeline to see how each
+  transformation changes the numbers, e.g. `stats|>quantize|>stats`.
+  """
+  METHOD_NAME = 'stats'
+  KWARGS_NAMESCOPE = '_utensor_stats'
+
+  def __init__(self, label=None, per_op=False, **kwargs):
+    self.prune_graph = False
+    self.label = label
+    self.per_op = per_op
+
+  def transform(self, ugraph):
+    stats = graph_stats(ugraph)
+    logger.info('graph statistics%s:\n%s',
+                ' ({})'.format(self.label) if self.label else '',
+                format_stats(stats, per_op=self.per_op))
+    return ugraph
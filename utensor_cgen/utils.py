@@ -1,20 +1,24 @@
 # -*- coding: utf8 -*-
+import filecmp
 import os
 import re
-from ast import literal_eval
+import shutil
+import tempfile
 from copy import deepcopy
 
 import idx2numpy as idx2np
 import numpy as np
 import tensorflow as tf
-from click.types import ParamType
 from tensorflow.python.framework import graph_util
 from tensorflow.tools.graph_transforms import TransformGraph
 
 from utensor_cgen.logger import logger
+from utensor_cgen.params import (NArgsKwargsParam, NArgsParam,
+                                 TensorShapesParam)
 
 __all__ = ["save_idx", "save_consts", "save_graph", "log_graph",
-           "NamescopedKWArgsParser", "NArgsParam", "MUST_OVERWRITEN"]
+           "NamescopedKWArgsParser", "NArgsParam", "TensorShapesParam",
+           "OutputFile", "MUST_OVERWRITEN"]
 
 
 def log_graph(graph_or_graph_def, logdir):
@@ -41,6 +45,62 @@ def save_idx(arr, fname):
   logger.info("%s saved", fname)
 
 
+class OutputFile(object):
+  """Write a file atomically, and only if its content changes
+
+  The content is written to a temporary file next to `path`, which
+  replaces `path` if their contents differ and is removed otherwise, so
+  the timestamp of an unchanged file is kept and builds depending on it
+  are not triggered.
+
+  .. code-block:: python
+
+    output = OutputFile('model.cpp')
+    with output as fid:
+      fid.write(text)
+    output.changed  # False if model.cpp had the same content
+  """
+
+  def __init__(self, path, mode='w'):
+    self.path = path
+    self.mode = mode
+    self.changed = None
+    self._fid = None
+    self._tmp_path = None
+
+  def __enter__(self):
+    out_dir = os.path.dirname(os.path.abspath(self.path))
+    fd, self._tmp_path = tempfile.mkstemp(
+      dir=out_dir, prefix='.{}.'.format(os.path.basename(self.path)), suffix='.tmp'
+    )
+    self._fid = os.fdopen(fd, self.mode)
+    return self._fid
+
+  def __exit__(self, exc_type, exc_value, traceback):
+    self._fid.close()
+    if exc_type is not None:
+      os.remove(self._tmp_path)
+      return False
+    # filecmp compares the sizes first and then the bytes
+    self.changed = not (os.path.isfile(self.path) and
+                        filecmp.cmp(self._tmp_path, self.path, shallow=False))
+    if self.changed:
+      if os.path.exists(self.path):
+        shutil.copymode(self.path, self._tmp_path)
+      else:
+        os.chmod(self._tmp_path, 0o666 & ~_get_umask())
+      os.replace(self._tmp_path, self.path)
+    else:
+      os.remove(self._tmp_path)
+    return False
+
+
+def _get_umask():
+  umask = os.umask(0)
+  os.umask(umask)
+  return umask
+
+
 def save_consts(sess, out_dir="."):
   out_dir = os.path.expanduser(out_dir)
   if not os.path.exists(out_dir):
@@ -159,59 +219,6 @@ class NamescopedKWArgsParser:
       return self._shared_kwargs[argname]
 
 
-class NArgsParam(ParamType):
-
-  def __init__(self, sep=','):
-    self._sep = sep
-
-  def convert(self, value, param, ctx):
-    value = str(value)
-    args = value.split(self._sep)
-    aug_args = [arg for arg in args if arg[0] in ['+', '-']]
-    if aug_args:
-      final_args = param.default.split(self._sep)
-      for arg in aug_args:
-        if arg[0] == '+':
-          final_args.append(arg[1:])
-        elif arg[0] == '-' and arg[1:] in final_args:
-          final_args.remove(arg[1:])
-    else:
-      final_args = args
-    return final_args
-
-
-class NArgsKwargsParam(NArgsParam):
-
-  _trans_name_patrn = re.compile(r"(\w[\w]*)\(?")
-
-  def convert(self, value, param, ctx):
-    args = super().convert(value, param, ctx)
-    return [self._parse_kwargs(arg) for arg in args]
-  
-  def _parse_kwargs(self, arg):
-    trans_match = self._trans_name_patrn.match(arg)
-    if not trans_match:
-      raise ValueError("Invalid args detected: {}".format(arg))
-    trans_name = trans_match.group(1)
-    _, end = trans_match.span()
-    if end == len(arg):
-      kwargs = {}
-    else:
-      if not arg.endswith(")"):
-        raise ValueError("parentheses mismatch: {}".format(arg))
-      kwargs = self._get_kwargs(arg[end:-1])
-    return trans_name, kwargs
-  
-  def _get_kwargs(self, kws_str):
-    kw_arg_strs = [s.strip() for s in kws_str.split(',')]
-    kwargs = {}
-    for kw_str in kw_arg_strs:
-      name, v_str = kw_str.split('=')
-      value = literal_eval(v_str)
-      kwargs[name] = value
-    return kwargs
-
-
 class _MustOverwrite(object):
   _obj = None
 
@@ -249,4 +256,22 @@ def topologic_order_graph(ugraph):
   while queue:
     node_name = queue.pop(0)
     visit(node_name)
-  ugraph.topo_order = ops_torder[::-1]
+  ops_torder = ops_torder[::-1]
+  # keep the current order if it is still valid, so the order
+  # set by a scheduling pass is not discarded
+  if _is_topo_order(ugraph, ugraph.topo_order, ops_torder):
+    return
+  ugraph.topo_order = ops_torder
+
+
+def _is_topo_order(ugraph, order, ref_order):
+  if len(order) != len(ref_order) or set(order) != set(ref_order):
+    return False
+  done = set()
+  for op_name in order:
+    op_info = ugraph.ops_info[op_name]
+    for t_info in op_info.input_tensors:
+      if parse_tensor_name(t_info.name)[0] not in done:
+        return False
+    done.add(op_name)
+  return True